@@ -0,0 +1,113 @@
+# Zutrittsliste mit Hash-Index
+# Personalnummern (RFID-UIDs, 8 Hex-Zeichen) werden als 32-bit Integer
+# in einem Set gehalten - Lookup in konstanter Zeit statt linearer Suche
+
+UID_BITS = 32
+UID_MAX = (1 << UID_BITS) - 1
+HASH_MASK = (1 << 64) - 1
+HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+def uid_to_int(uid):
+    """Wandelt eine Personalnummer (Hex-String oder int) in einen 32-bit Integer um"""
+    if isinstance(uid, int):
+        value = uid
+    else:
+        uid = uid.strip()
+        # int(uid, 16) allein nähme auch "0x1234AB", "+1234567" oder "1_234567"
+        if len(uid) != 8 or not HEX_DIGITS.issuperset(uid):
+            raise ValueError(f"Personalnummer muss 8 Hex-Zeichen haben: {uid!r}")
+        value = int(uid, 16)
+    if not 0 <= value <= UID_MAX:
+        raise ValueError(f"Personalnummer außerhalb des 32-bit Bereichs: {uid!r}")
+    return value
+
+def int_to_uid(value):
+    """Wandelt einen 32-bit Integer zurück in die 8-stellige Hex-Personalnummer"""
+    return "%08X" % value
+
+def uid_hash(value):
+    """Mischt eine UID zu 64 Bit (splitmix64) für den Listen-Hash
+
+    Der Hash einer Liste ist die Summe der UID-Hashes modulo 2^64 - er hängt
+    nicht von der Reihenfolge ab und lässt sich bei jeder Änderung anpassen.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & HASH_MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & HASH_MASK
+    return value ^ (value >> 31)
+
+class AccessList:
+    """Zutrittsliste mit Lookup, Hinzufügen und Entfernen in O(1)"""
+
+    def __init__(self, uids=()):
+        self._uids = set()
+        for uid in uids:
+            self.add(uid)
+
+    def __contains__(self, uid):
+        try:
+            return uid_to_int(uid) in self._uids
+        except (ValueError, TypeError):
+            # Ungültige Personalnummern sind nie berechtigt
+            return False
+
+    def __len__(self):
+        return len(self._uids)
+
+    def __iter__(self):
+        """Liefert die Personalnummern sortiert als Hex-Strings"""
+        for value in sorted(self._uids):
+            yield int_to_uid(value)
+
+    def __repr__(self):
+        return f"<AccessList {len(self._uids)} Einträge>"
+
+    def add(self, uid):
+        """Fügt eine Personalnummer hinzu, gibt False zurück falls schon vorhanden"""
+        value = uid_to_int(uid)
+        if value in self._uids:
+            return False
+        self._uids.add(value)
+        return True
+
+    def remove(self, uid):
+        """Entfernt eine Personalnummer, gibt False zurück falls nicht vorhanden"""
+        value = uid_to_int(uid)
+        if value not in self._uids:
+            return False
+        self._uids.discard(value)
+        return True
+
+    def values(self):
+        """Liefert die Personalnummern als Integer (unsortiert)"""
+        return iter(self._uids)
+
+def benchmark(sizes=(10, 1000, 100000, 500000), lookups=200000):
+    """Misst die Lookup-Kosten für wachsende Listen (Liste vs. AccessList)"""
+    import random
+    import timeit
+
+    print(f"{'Einträge':>10} {'list (ns)':>12} {'AccessList (ns)':>16}")
+    for size in sizes:
+        uids = [int_to_uid(v) for v in random.sample(range(UID_MAX), size)]
+        access_list = AccessList(uids)
+        # Hälfte Treffer, Hälfte Fehlversuche
+        probes = [random.choice(uids) if i % 2 else int_to_uid(random.randrange(UID_MAX))
+                  for i in range(1000)]
+
+        t_set = timeit.timeit(lambda: [p in access_list for p in probes],
+                              number=lookups // len(probes))
+        ns_set = t_set / lookups * 1e9
+
+        # Lineare Suche nur für kleine Listen messen, sonst dauert es Minuten
+        if size <= 100000:
+            runs = max(1, lookups // len(probes) // max(1, size // 100))
+            t_list = timeit.timeit(lambda: [p in uids for p in probes], number=runs)
+            ns_list = f"{t_list / (runs * len(probes)) * 1e9:12.0f}"
+        else:
+            ns_list = f"{'-':>12}"
+
+        print(f"{size:>10} {ns_list} {ns_set:16.0f}")
+
+if __name__ == "__main__":
+    benchmark()
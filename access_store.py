@@ -0,0 +1,741 @@
+# Persistenter Speicher für die Zutrittsliste
+#
+# Basisdatei (access_list.<Version>.bin), wird per mmap eingeblendet statt geparst:
+#   Header: Magic b"ACL2", Listenversion (u32), Anzahl (u32),
+#           Inhalts-Hash (u64) - little-endian
+#   Danach Anzahl x UID (u32 little-endian), aufsteigend sortiert
+#   Jede neue Basisdatei bekommt einen eigenen Namen statt die alte zu
+#   ersetzen - eine eingeblendete Datei lässt sich unter Windows weder
+#   ersetzen noch löschen. Welche gilt, steht im Journal-Header; alte
+#   Dateien werden gelöscht, sobald sie niemand mehr eingeblendet hat.
+# Journal (access_list.journal), append-only seit der letzten Kompaktierung:
+#   Header: Magic b"JRN1", Version der Basisdatei auf die es aufsetzt (u32)
+#   je Eintrag 5 Byte: b"+" oder b"-" gefolgt von der UID (u32 little-endian)
+# Einstellungen (settings.json): Sperrzeitfenster usw.
+# Generationszähler (generation), per mmap von allen Prozessen geteilt:
+#   3 x u64 - Zutrittsliste, Einstellungen, Broadcast-Anforderungen
+#   Der schreibende Prozess erhöht den Zähler nach jeder Änderung, Leser
+#   (AccessReader in anderen Prozessen) holen dann nur das Neue nach.
+#
+# Jeder Stand der Liste ist eine unveränderliche Sicht (_View). Änderungen
+# bauen eine neue Sicht (copy-on-write) und tauschen sie mit einer einzigen
+# Zuweisung aus - Leser (Zutrittsentscheidungen) brauchen keine Sperre und
+# sehen immer einen vollständigen Stand. Nur Schreiber werden serialisiert.
+#
+# Beim Start wird nur die Basisdatei gemappt und das (kurze) Journal
+# eingelesen - die Größe der Liste spielt für den Kaltstart keine Rolle.
+#
+# Jede wirksame Änderung erhöht die Listenversion um 1: Eintrag i im Journal
+# ist Version Basisversion + i + 1. Daraus lassen sich Deltas für Clients
+# berechnen, die eine ältere Version melden.
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from heapq import merge
+
+try:
+    import fcntl  # nur Unix - verhindert zwei schreibende Prozesse
+except ImportError:
+    fcntl = None
+
+from access_list import uid_to_int, int_to_uid, uid_hash, HASH_MASK, UID_MAX
+
+MAGIC = b"ACL2"
+HEADER = struct.Struct("<4sIIQ")
+JOURNAL_MAGIC = b"JRN1"
+JOURNAL_HEADER = struct.Struct("<4sI")
+RECORD = struct.Struct("<cI")
+OP_ADD = b"+"
+OP_REMOVE = b"-"
+
+BASE_FILE = "access_list.%d.bin"   # % Version
+LEGACY_BASE_FILE = "access_list.bin"  # frühere, unversionierte Basisdatei
+JOURNAL_FILE = "access_list.journal"
+SETTINGS_FILE = "settings.json"
+GENERATION_FILE = "generation"
+LOCK_FILE = "writer.lock"
+
+GEN_LIST = 0        # Indizes im Generationszähler
+GEN_SETTINGS = 1
+GEN_BROADCAST = 2
+
+COMPACT_THRESHOLD = 50000   # Journal-Einträge bis zur automatischen Kompaktierung
+WRITE_CHUNK = 65536         # UIDs pro Schreibvorgang beim Kompaktieren
+
+class _BaseFile:
+    """Schreibgeschützte, per mmap eingeblendete sortierte UID-Datei"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.count, self.hash = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} ist keine Zutrittslisten-Datei")
+        end = HEADER.size + 4 * self.count
+        if len(self.mm) < end:
+            raise ValueError(f"{path} ist unvollständig")
+        if sys.byteorder == "little":
+            # UIDs direkt aus dem Mapping lesen - nichts wird geparst
+            self.uids = memoryview(self.mm)[HEADER.size:end].cast("I")
+        else:
+            self.uids = array("I", self.mm[HEADER.size:end])
+            self.uids.byteswap()
+
+    def __contains__(self, value):
+        # Binäre Suche in C (bisect) direkt auf dem Mapping
+        i = bisect_left(self.uids, value)
+        return i < self.count and self.uids[i] == value
+
+    def values(self):
+        """Liefert alle UIDs der Basisdatei aufsteigend als Integer"""
+        return iter(self.uids)
+
+class _View:
+    """Unveränderlicher Stand: Basisdatei plus Änderungen aus dem Journal
+
+    Wird nach dem Veröffentlichen nie mehr verändert. Das Journal (bytearray)
+    teilen sich aufeinanderfolgende Sichten; jede sieht nur ihre ersten
+    journal_size Bytes, angehängt wird immer nur hinten.
+    """
+    __slots__ = ("base", "added", "removed", "journal", "journal_size", "hash")
+
+    def __init__(self, base, added=None, removed=None, journal=None, journal_size=0, list_hash=None):
+        self.base = base
+        self.added = added if added is not None else set()      # UIDs (int) seit der Basisdatei
+        self.removed = removed if removed is not None else set()
+        self.journal = journal if journal is not None else bytearray()   # wirksame Einträge
+        self.journal_size = journal_size
+        self.hash = base.hash if list_hash is None else list_hash
+
+    @property
+    def version(self):
+        return self.base.version + self.journal_size // RECORD.size
+
+    def records(self, start=0):
+        """Journal-Einträge dieser Sicht ab Byte start"""
+        return bytes(self.journal[start:self.journal_size])
+
+    def __contains__(self, value):
+        if value in self.removed:
+            return False
+        if value in self.added:
+            return True
+        return value in self.base
+
+    def __len__(self):
+        return self.base.count + len(self.added) - len(self.removed)
+
+    def extend(self, records):
+        """Neue Sicht mit zusätzlichen Journal-Einträgen - diese Sicht bleibt unverändert"""
+        added = set(self.added)
+        removed = set(self.removed)
+        list_hash = self.hash
+        for op, value in RECORD.iter_unpack(records):
+            if op == OP_ADD:
+                if value in removed:
+                    removed.discard(value)
+                else:
+                    added.add(value)
+                list_hash = (list_hash + uid_hash(value)) & HASH_MASK
+            elif op == OP_REMOVE:
+                if value in added:
+                    added.discard(value)
+                else:
+                    removed.add(value)
+                list_hash = (list_hash - uid_hash(value)) & HASH_MASK
+        journal = self.journal
+        if len(journal) != self.journal_size:
+            # Nicht der neueste Stand - eigenes Journal statt das geteilte zu überschreiben
+            journal = journal[:self.journal_size]
+        journal += records
+        return _View(self.base, added, removed, journal, self.journal_size + len(records), list_hash)
+
+class Generation:
+    """Prozessübergreifende Änderungszähler in einer kleinen mmap-Datei"""
+
+    def __init__(self, path, writable=False):
+        if writable and not os.path.exists(path):
+            with open(path + ".tmp", "wb") as f:
+                f.write(bytes(8 * 3))
+            os.replace(path + ".tmp", path)
+        with open(path, "r+b" if writable else "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0,
+                                access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        # 8-Byte-Zugriffe auf ausgerichtete Adressen sind atomar
+        self.counters = memoryview(self.mm).cast("Q")
+
+    def __getitem__(self, index):
+        return self.counters[index]
+
+    def bump(self, index):
+        self.counters[index] = self.counters[index] + 1
+
+def base_path(directory, version):
+    """Pfad der Basisdatei mit dieser Version"""
+    return os.path.join(directory, BASE_FILE % version)
+
+def base_versions(directory):
+    """Versionen aller Basisdateien im Ordner, aufsteigend"""
+    prefix, suffix = BASE_FILE.split("%d")
+    versions = []
+    for name in os.listdir(directory):
+        number = name[len(prefix):-len(suffix)]
+        if name.startswith(prefix) and name.endswith(suffix) and number.isdigit():
+            versions.append(int(number))
+    return sorted(versions)
+
+def write_base_file(path, values, version=0, list_hash=None):
+    """Schreibt aufsteigend sortierte UIDs atomar als neue Basisdatei"""
+    tmp_path = path + ".tmp"
+    count = 0
+    compute_hash = list_hash is None
+    if compute_hash:
+        list_hash = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, version, 0, 0))
+            chunk = array("I")
+            last = -1
+            for value in values:
+                if value <= last:
+                    raise ValueError("UIDs müssen aufsteigend sortiert und eindeutig sein")
+                last = value
+                chunk.append(value)
+                if len(chunk) >= WRITE_CHUNK:
+                    if compute_hash:
+                        list_hash = (list_hash + sum(map(uid_hash, chunk))) & HASH_MASK
+                    count += _write_chunk(f, chunk)
+                    chunk = array("I")
+            if compute_hash:
+                list_hash = (list_hash + sum(map(uid_hash, chunk))) & HASH_MASK
+            count += _write_chunk(f, chunk)
+            # Anzahl und Hash erst zum Schluss eintragen
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, version, count, list_hash))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+def _write_chunk(f, chunk):
+    if sys.byteorder == "big":
+        chunk.byteswap()
+    f.write(chunk.tobytes())
+    return len(chunk)
+
+class AccessReader:
+    """Nur-Lese-Zugriff auf die Zutrittsliste, z. B. aus einem Worker-Prozess
+
+    Sieht Änderungen des schreibenden Prozesses (AccessStore) nach refresh():
+    neue Journal-Einträge werden nachgelesen, nach einer Kompaktierung wird
+    die neue Basisdatei eingeblendet. Die Sicht wird nur als Ganzes getauscht.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._journal_path = os.path.join(directory, JOURNAL_FILE)
+        self._settings_path = os.path.join(directory, SETTINGS_FILE)
+        self._generation = Generation(os.path.join(directory, GENERATION_FILE))
+        self._seen = self._generation[GEN_LIST]
+        # Neueste Basisdatei - passt das Journal noch zu einer älteren, wird umgeschaltet
+        versions = base_versions(directory)
+        if not versions:
+            raise FileNotFoundError(f"Keine Zutrittsliste in {directory}")
+        self._view = _View(_BaseFile(base_path(directory, versions[-1])))
+        self._offset = 0   # gelesene Bytes des Journals
+        self._load_journal()
+
+    def _load_journal(self):
+        """Liest neue Journal-Einträge, gibt False zurück wenn der Stand gerade nicht passt"""
+        view = self._view
+        try:
+            with open(self._journal_path, "rb") as f:
+                header = f.read(JOURNAL_HEADER.size)
+                if len(header) < JOURNAL_HEADER.size:
+                    return False
+                magic, base_version = JOURNAL_HEADER.unpack(header)
+                if magic != JOURNAL_MAGIC:
+                    return False
+                if base_version < view.base.version:
+                    return False   # Journal zur neuen Basisdatei noch nicht geschrieben
+                if base_version != view.base.version:
+                    # Kompaktiert - neue Basisdatei einblenden und von vorn lesen
+                    # (fehlt die Datei, ist sie schon überholt - beim nächsten Mal)
+                    base = _BaseFile(base_path(self.directory, base_version))
+                    view = _View(base)
+                    offset = 0
+                else:
+                    offset = self._offset
+                f.seek(JOURNAL_HEADER.size + offset)
+                data = f.read()
+        except (OSError, ValueError):
+            return False
+        # Nur vollständige Einträge übernehmen, neue Sicht erst dann veröffentlichen
+        data = data[:len(data) - len(data) % RECORD.size]
+        view = view.extend(data)
+        self._offset = view.journal_size
+        self._view = view
+        return True
+
+    def stale(self):
+        """True, wenn der schreibende Prozess seit dem letzten refresh() geändert hat"""
+        return self._generation[GEN_LIST] != self._seen
+
+    def refresh(self):
+        """Holt Änderungen des schreibenden Prozesses nach (billig wenn nichts passiert ist)"""
+        generation = self._generation[GEN_LIST]
+        if generation == self._seen:
+            return False
+        if self._load_journal():
+            self._seen = generation
+            return True
+        return False
+
+    def generation(self, index):
+        """Stand eines Änderungszählers (GEN_LIST, GEN_SETTINGS, GEN_BROADCAST)"""
+        return self._generation[index]
+
+    def __contains__(self, uid):
+        try:
+            value = uid_to_int(uid)
+        except (ValueError, TypeError):
+            # Ungültige Personalnummern sind nie berechtigt
+            return False
+        return value in self._view
+
+    def __len__(self):
+        return len(self._view)
+
+    def __iter__(self):
+        """Liefert die Personalnummern sortiert als Hex-Strings"""
+        for value in self.values():
+            yield int_to_uid(value)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.directory!r} {len(self)} Einträge>"
+
+    def snapshot(self):
+        """Aktueller Stand als unveränderliche Sicht (für mehrere zusammenhängende Abfragen)
+
+        Unterstützt "uid in snapshot" mit UIDs als Integer sowie len().
+        """
+        return self._view
+
+    def values(self):
+        """Liefert alle UIDs aufsteigend als Integer"""
+        view = self._view
+        removed = view.removed
+        base = view.base.values()
+        if removed:
+            base = (v for v in base if v not in removed)
+        return merge(base, sorted(view.added))
+
+    def values_array(self):
+        """Alle UIDs aufsteigend als array - ohne Journal eine reine Speicherkopie"""
+        view = self._view
+        if not view.added and not view.removed:
+            uids = array("I")
+            uids.frombytes(memoryview(view.base.uids).cast("B"))
+            return uids
+        return array("I", self.values())
+
+    @property
+    def version(self):
+        """Aktuelle Listenversion (steigt mit jeder Änderung)"""
+        return self._view.version
+
+    @property
+    def hash(self):
+        """Reihenfolgeunabhängiger 64-bit Hash über den Listeninhalt"""
+        return self._view.hash
+
+    def diff_since(self, version, list_hash):
+        """Berechnet (hinzugefügt, entfernt) seit einem Client-Stand
+
+        Gibt None zurück, wenn der Stand nicht mehr im Journal liegt oder
+        nicht zu dieser Liste gehört - dann muss die ganze Liste gesendet werden.
+        """
+        view = self._view
+        if list_hash == view.hash:
+            return [], []
+        if not view.base.version <= version <= view.version:
+            return None
+        start = (version - view.base.version) * RECORD.size
+        net = {}
+        # Wirksame Änderungen einer UID wechseln sich immer ab (+ - + ...),
+        # zwei aufeinanderfolgende heben sich also auf
+        for op, value in RECORD.iter_unpack(view.records(start)):
+            if value in net:
+                del net[value]
+            else:
+                net[value] = op
+        added = sorted(v for v, op in net.items() if op == OP_ADD)
+        removed = sorted(v for v, op in net.items() if op == OP_REMOVE)
+        # Hash des Client-Stands zurückrechnen - passt er nicht, ist der Stand fremd
+        old_hash = (view.hash - sum(map(uid_hash, added)) + sum(map(uid_hash, removed))) & HASH_MASK
+        if old_hash != list_hash:
+            return None
+        return added, removed
+
+    def load_settings(self):
+        """Lädt die gespeicherten Einstellungen (leeres dict falls keine)"""
+        try:
+            with open(self._settings_path, "r") as f:
+                return json.load(f)
+        except OSError:
+            return {}
+        except ValueError as e:
+            print(f"[ERROR] Einstellungen konnten nicht gelesen werden: {e}")
+            return {}
+
+    def close(self):
+        pass
+
+class AccessStore(AccessReader):
+    """Persistente Zutrittsliste mit derselben Schnittstelle wie AccessList
+
+    Es gibt genau einen schreibenden Prozess; andere Prozesse lesen über AccessReader.
+    """
+
+    def __init__(self, directory, default_uids=()):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._journal_path = os.path.join(directory, JOURNAL_FILE)
+        self._settings_path = os.path.join(directory, SETTINGS_FILE)
+
+        # Nur ein schreibender Prozess (Server oder Import-Werkzeug) pro Ordner
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), "a")
+        if fcntl:
+            try:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise RuntimeError(f"{directory} wird bereits von einem anderen Prozess beschrieben")
+
+        versions = base_versions(directory)
+        legacy_path = os.path.join(directory, LEGACY_BASE_FILE)
+        if not versions and os.path.exists(legacy_path):
+            # Unversionierte Basisdatei einer älteren Version übernehmen
+            with open(legacy_path, "rb") as f:
+                versions = [HEADER.unpack(f.read(HEADER.size))[1]]
+            os.replace(legacy_path, base_path(directory, versions[0]))
+        elif not versions:
+            # Erster Start: Standardliste als Basisdatei anlegen
+            values = sorted({uid_to_int(uid) for uid in default_uids})
+            write_base_file(base_path(directory, 0), values)
+            versions = [0]
+
+        # Schreiber (Eingabe-Thread, Admin-Schnittstelle, Import) nacheinander
+        self._write_lock = threading.RLock()
+        # Die neueste Basisdatei gilt - ein Journal zu einer älteren stammt von
+        # einem Absturz beim Austausch und wird verworfen
+        self._view = _View(_BaseFile(base_path(directory, versions[-1])))
+        self._replay_journal()
+        self._remove_old_bases()
+        self._journal = open(self._journal_path, "ab")
+        self._generation = Generation(os.path.join(directory, GENERATION_FILE), writable=True)
+        self._generation.bump(GEN_LIST)
+
+    def _replay_journal(self):
+        """Spielt das Journal seit der letzten Kompaktierung ein"""
+        view = self._view
+        try:
+            with open(self._journal_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        valid = False
+        if len(data) >= JOURNAL_HEADER.size:
+            magic, base_version = JOURNAL_HEADER.unpack_from(data, 0)
+            # Journal einer älteren Basisdatei (Absturz beim Kompaktieren) verwerfen
+            valid = magic == JOURNAL_MAGIC and base_version == view.base.version
+        if valid:
+            # Unvollständiger letzter Eintrag (Absturz beim Schreiben) wird ignoriert
+            records = data[JOURNAL_HEADER.size:]
+            records = records[:len(records) - len(records) % RECORD.size]
+            view = self._view = view.extend(records)
+            if len(records) + JOURNAL_HEADER.size == len(data):
+                return
+        # Journal fehlt, ist veraltet oder beschädigt - sauber neu schreiben
+        self._write_journal(view)
+
+    def _write_journal(self, view):
+        os.replace(self._prepare_journal(view), self._journal_path)
+
+    def _prepare_journal(self, view):
+        """Schreibt das Journal einer Sicht in eine temporäre Datei, gibt ihren Pfad zurück"""
+        tmp_path = self._journal_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, view.base.version))
+                f.write(view.records())
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def stale(self):
+        return False
+
+    def refresh(self):
+        """Der schreibende Prozess ist immer aktuell"""
+        return False
+
+    def add(self, uid):
+        """Fügt eine Personalnummer hinzu, gibt False zurück falls schon vorhanden"""
+        return self.apply(adds=(uid,))[0] == 1
+
+    def remove(self, uid):
+        """Entfernt eine Personalnummer, gibt False zurück falls nicht vorhanden"""
+        return self.apply(removes=(uid,))[1] == 1
+
+    def apply(self, adds=(), removes=()):
+        """Viele Änderungen als ein Schritt: ein Journal-Schreibvorgang, ein Austausch
+
+        Erst werden alle Personalnummern geprüft (ValueError vor jeder Änderung),
+        dann erst entfernt, dann hinzugefügt. Gibt (hinzugefügt, entfernt) zurück.
+        """
+        removes = [uid_to_int(uid) for uid in removes]
+        adds = [uid_to_int(uid) for uid in adds]
+        with self._write_lock:
+            view = self._view
+            present = {}   # Zustand nach den bisherigen Einträgen dieses Schritts
+            records = bytearray()
+            n_added = n_removed = 0
+            for value in removes:
+                if present[value] if value in present else value in view:
+                    records += RECORD.pack(OP_REMOVE, value)
+                    present[value] = False
+                    n_removed += 1
+            for value in adds:
+                if not (present[value] if value in present else value in view):
+                    records += RECORD.pack(OP_ADD, value)
+                    present[value] = True
+                    n_added += 1
+            if records:
+                records = bytes(records)
+                self._journal.write(records)
+                self._journal.flush()
+                # Neue Sicht komplett aufbauen, dann mit einer Zuweisung veröffentlichen
+                self._view = view.extend(records)
+                if self._view.journal_size >= COMPACT_THRESHOLD * RECORD.size:
+                    self.compact()
+                # Erst nach dem Schreiben melden - Leser finden die Einträge dann sicher vor
+                self._generation.bump(GEN_LIST)
+            return n_added, n_removed
+
+    def compact(self):
+        """Schreibt Basisdatei und Journal zu einer neuen Basisdatei zusammen"""
+        with self._write_lock:
+            view = self._view
+            if view.version == view.base.version:
+                return   # Journal leer - die Basisdatei ist schon aktuell
+            write_base_file(base_path(self.directory, view.version), self.values(), view.version, view.hash)
+            self._swap_base(view.version)
+
+    def replace(self, values):
+        """Ersetzt die ganze Liste durch aufsteigend sortierte UIDs (Integer)
+
+        Die neue Basisdatei wird im aufrufenden Thread geschrieben; Entscheidungen
+        laufen solange auf dem alten Stand weiter. Die Version steigt um 1, Clients
+        bekommen danach die komplette Liste. Gibt die Anzahl der Einträge zurück.
+        """
+        with self._write_lock:
+            version = self._view.version + 1
+            count = write_base_file(base_path(self.directory, version), values, version)
+            self._swap_base(version)
+            return count
+
+    def install(self, path, expected_version=None):
+        """Übernimmt eine fertige Basisdatei (z. B. aus einem anderen Prozess) als neue Liste
+
+        Die Datei muss im selben Ordner liegen. Nur der Header wird angepasst,
+        der Austausch kostet also unabhängig von der Größe fast nichts.
+        Gibt False zurück (und löscht die Datei), wenn der Inhalt gleich ist.
+        Mit expected_version wird abgebrochen (ValueError), wenn sich die Liste
+        seit diesem Stand geändert hat - die Datei beruht dann auf alten Daten.
+        """
+        with self._write_lock:
+            if expected_version is not None and expected_version != self._view.version:
+                os.remove(path)
+                raise ValueError("Zutrittsliste wurde zwischenzeitlich geändert")
+            version = self._view.version + 1
+            with open(path, "r+b") as f:
+                magic, _, count, list_hash = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC:
+                    raise ValueError(f"{path} ist keine Zutrittslisten-Datei")
+                if list_hash == self._view.hash and count == len(self._view):
+                    unchanged = True
+                else:
+                    unchanged = False
+                    f.seek(0)
+                    f.write(HEADER.pack(MAGIC, version, count, list_hash))
+                    f.flush()
+                    os.fsync(f.fileno())
+            if unchanged:
+                # Gleicher Inhalt - keine neue Version, Clients müssen nichts laden
+                os.remove(path)
+                return False
+            os.replace(path, base_path(self.directory, version))
+            self._swap_base(version)
+            return True
+
+    def _swap_base(self, version):
+        # Neue Sicht und neues Journal erst komplett aufbauen, dann austauschen.
+        # Scheitert etwas, bleiben Sicht und Journal-Handle die alten und die
+        # neue Basisdatei wird wieder gelöscht (sonst gälte sie beim Neustart).
+        path = base_path(self.directory, version)
+        try:
+            new_view = _View(_BaseFile(path))
+            tmp_path = self._prepare_journal(new_view)
+        except BaseException:
+            self._discard_base(path)
+            raise
+        # Unter Windows lässt sich eine offene Datei nicht ersetzen - erst schließen
+        self._journal.close()
+        try:
+            os.replace(tmp_path, self._journal_path)
+        except BaseException:
+            self._journal = open(self._journal_path, "ab")   # altes Journal ist unverändert
+            os.remove(tmp_path)
+            del new_view
+            self._discard_base(path)
+            raise
+        self._view = new_view
+        self._journal = open(self._journal_path, "ab")
+        self._generation.bump(GEN_LIST)
+        self._remove_old_bases()
+
+    def _discard_base(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _remove_old_bases(self):
+        """Löscht überholte Basisdateien
+
+        Unter Windows scheitert das, solange ein Prozess die Datei noch
+        eingeblendet hat - dann beim nächsten Austausch oder Start erneut.
+        """
+        for version in base_versions(self.directory):
+            if version < self._view.base.version:
+                try:
+                    os.remove(base_path(self.directory, version))
+                except OSError:
+                    pass
+
+    def save_settings(self, settings):
+        """Speichert die Einstellungen atomar"""
+        tmp_path = self._settings_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(settings, f, indent=2)
+        os.replace(tmp_path, self._settings_path)
+        self._generation.bump(GEN_SETTINGS)
+
+    def request_broadcast(self):
+        """Fordert alle Worker-Prozesse auf, ihre Clients zu aktualisieren"""
+        self._generation.bump(GEN_BROADCAST)
+
+    def close(self):
+        self._journal.close()
+        self._lock_file.close()
+
+def stress_test(duration=3.0, readers=2, list_size=200000):
+    """Lese-Threads fragen ohne Pause ab, während ein Schreiber ändert und ganze Listen tauscht
+
+    Prüft, dass jeder Leser nur vollständige Stände sieht: UID 1 und 2 werden
+    immer in einem Schritt gegeneinander getauscht, es ist also stets genau
+    eine von beiden enthalten, und die Länge bleibt gleich. Die Dauer der
+    Leseschleife wird einmal ohne und einmal mit Schreiber gemessen - Ausreißer
+    kommen vom GIL-Wechsel (5 ms), nicht von der Größe der ersetzten Liste.
+    """
+    import random
+    import tempfile
+    import time
+
+    def report(name, samples, reads):
+        samples.sort()
+        n = len(samples)
+        print(f"{name:>16}: {reads / duration / 1e6:5.2f} Mio. Lesevorgänge/s, "
+              f"p50 {samples[n // 2] * 1e6:6.2f} µs, p99 {samples[int(n * 0.99)] * 1e6:6.2f} µs, "
+              f"max {samples[-1] * 1000:6.2f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = AccessStore(directory)
+        # Zwei große Listen zum Austauschen, beide ohne 1 und 2
+        lists = [sorted(random.sample(range(3, UID_MAX), list_size)) for _ in range(2)]
+        store.replace([1] + lists[0])
+        probes = [random.choice(lists[0]) for _ in range(1000)] + \
+                 [random.randrange(UID_MAX) for _ in range(1000)]
+        errors = []
+
+        def phase(with_writer):
+            stop = threading.Event()
+            samples = [[] for _ in range(readers)]
+            counts = [0] * readers
+            stats = {"Tausch": 0, "Liste ersetzt": 0}
+
+            def reader(index):
+                clock = time.perf_counter
+                own = samples[index]
+                n = 0
+                while not stop.is_set():
+                    started = clock()
+                    snapshot = store.snapshot()
+                    if (1 in snapshot) == (2 in snapshot) or len(snapshot) != list_size + 1:
+                        errors.append(f"Unvollständiger Stand v{snapshot.version}")
+                    for value in probes[n % 20::20]:
+                        value in snapshot
+                    own.append(clock() - started)
+                    n += 1
+                counts[index] = n * (len(probes) // 20 + 2)
+
+            def writer():
+                while not stop.is_set():
+                    if 1 in store.snapshot():
+                        store.apply(adds=(2,), removes=(1,))
+                    else:
+                        store.apply(adds=(1,), removes=(2,))
+                    stats["Tausch"] += 1
+                    if stats["Tausch"] % 500 == 0:
+                        # Ganze Liste ersetzen, die getauschte UID bleibt erhalten
+                        keep = 1 if 1 in store.snapshot() else 2
+                        store.replace([keep] + lists[stats["Liste ersetzt"] % 2])
+                        stats["Liste ersetzt"] += 1
+
+            threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+            if with_writer:
+                threads.append(threading.Thread(target=writer))
+            for thread in threads:
+                thread.start()
+            time.sleep(duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            report("mit Schreiber" if with_writer else "ohne Schreiber",
+                   [x for own in samples for x in own], sum(counts))
+            return stats
+
+        phase(False)
+        stats = phase(True)
+        print(f"Schreiber: {stats['Tausch']} Tauschvorgänge, {stats['Liste ersetzt']} x "
+              f"{list_size} Einträge ersetzt, Version {store.version}")
+        store.close()
+        print(f"{len(errors)} inkonsistente Stände gesehen" if errors else "Keine inkonsistenten Stände")
+        return not errors
+
+if __name__ == "__main__":
+    stress_test()
@@ -0,0 +1,270 @@
+# Lokale Admin-Schnittstelle für Skripte (statt Befehle im Terminal)
+#
+# Der Server lauscht auf einem UNIX-Socket im Datenordner (data/admin.sock,
+# nur für den Besitzer les- und schreibbar; ohne UNIX-Sockets auf
+# 127.0.0.1:9151). Pro Anfrage eine JSON-Zeile mit einer Liste von
+# Operationen, die als eine Transaktion ausgeführt werden:
+#
+#   {"ops": [{"op": "add", "uids": ["F39A370E", "20047935"]},
+#            {"op": "remove", "uid": "00220394"},
+#            {"op": "add_holiday", "date": "2026-12-24"},
+#            {"op": "sync"}]}
+#
+# Antwort ebenfalls als JSON-Zeile:
+#   {"ok": true, "added": 2, "removed": 1, "version": 7, "count": 12345, ...}
+#   {"ok": false, "error": "Operation 2: Personalnummer muss 8 Hex-Zeichen haben"}
+#
+# Erst werden alle Operationen geprüft - ein Fehler verwirft den ganzen Batch.
+# Danach gehen alle Listenänderungen in einem Schritt in den Speicher
+# (AccessStore.apply: ein Journal-Schreibvorgang, ein Austausch der Sicht),
+# alle Sperrzeiten-Änderungen werden zu einem neuen Plan kompiliert und
+# "sync" verteilt die Liste einmal am Ende an die Clients.
+#
+# Operationen:
+#   add / remove          uid oder uids (Personalnummern als Text)
+#   set_lock              start und/oder end ("HH:MM"), tägliches Sperrfenster
+#   clear_lock            tägliches Sperrfenster entfernen
+#   add_lock_window       days ("Mo-Fr"), start, end
+#   add_holiday           date ("JJJJ-MM-TT")
+#   remove_holiday        date
+#   add_exception         date, start, end, state ("offen"/"gesperrt")
+#   clear_schedule        alle Sperrzeiten entfernen
+#   sync                  Liste danach an alle Clients senden
+#   status                nur Stand abfragen (Version, Einträge)
+#
+# Kommandozeile:
+#   python admin_api.py add F39A370E 20047935 remove 00220394 sync
+#   python admin_api.py --file batch.jsonl     (eine Operation pro Zeile)
+#   python admin_api.py --add-file neue.txt    (eine Personalnummer pro Zeile)
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from access_list import uid_to_int
+from lock_schedule import make_window, make_exception, parse_date, parse_hhmm
+
+SOCKET_FILE = "admin.sock"
+FALLBACK_ADDRESS = ("127.0.0.1", 9151)
+MAX_REQUEST_BYTES = 64 * 1024 * 1024   # etwa 3 Mio. Personalnummern pro Batch
+
+class Batch:
+    """Geprüfte Operationen einer Anfrage
+
+    uids hält nur den Endzustand je Personalnummer (True = danach in der
+    Liste) - spätere Operationen überschreiben frühere, wie bei einzelnen
+    Befehlen nacheinander.
+    """
+
+    def __init__(self, ops):
+        if not isinstance(ops, list):
+            raise ValueError("ops muss eine Liste sein")
+        self.uids = {}
+        self.schedule = []       # (Operation, geprüfte Werte) in Reihenfolge
+        self.sync = False
+        for number, op in enumerate(ops, 1):
+            try:
+                self._parse(op)
+            except (ValueError, KeyError, TypeError) as e:
+                text = f"fehlt {e}" if isinstance(e, KeyError) else str(e)
+                raise ValueError(f"Operation {number}: {text}") from None
+
+    def _parse(self, op):
+        name = op["op"]
+        if name in ("add", "remove"):
+            uids = op["uids"] if "uids" in op else [op["uid"]]
+            state = name == "add"
+            for uid in uids:
+                if not isinstance(uid, str):
+                    raise ValueError(f"Personalnummer muss Text sein: {uid!r}")
+                self.uids[uid_to_int(uid)] = state
+        elif name == "set_lock":
+            if "start" not in op and "end" not in op:
+                raise ValueError("start oder end angeben")
+            self.schedule.append((name, (parse_hhmm(op["start"]) if "start" in op else None,
+                                         parse_hhmm(op["end"]) if "end" in op else None)))
+        elif name == "add_lock_window":
+            self.schedule.append((name, make_window(op["days"], op["start"], op["end"])))
+        elif name in ("add_holiday", "remove_holiday"):
+            self.schedule.append((name, parse_date(op["date"])))
+        elif name == "add_exception":
+            self.schedule.append((name, make_exception(op["date"], op["start"], op["end"], op["state"])))
+        elif name in ("clear_lock", "clear_schedule"):
+            self.schedule.append((name, None))
+        elif name == "sync":
+            self.sync = True
+        elif name != "status":
+            raise ValueError(f"Unbekannte Operation {name!r}")
+
+    @property
+    def adds(self):
+        return [value for value, state in self.uids.items() if state]
+
+    @property
+    def removes(self):
+        return [value for value, state in self.uids.items() if not state]
+
+    def apply_schedule(self, config, daily):
+        """Wendet die Sperrzeiten-Operationen auf einen Plan an
+
+        config wie LockSchedule.to_config(), daily = (Beginn, Ende) des
+        täglichen Fensters in Minuten oder None. Gibt (config, daily) zurück.
+        """
+        config = {key: list(config.get(key, [])) for key in ("windows", "holidays", "exceptions")}
+        start, end = daily
+        for name, value in self.schedule:
+            if name == "set_lock":
+                start = value[0] if value[0] is not None else start
+                end = value[1] if value[1] is not None else end
+            elif name == "clear_lock":
+                start = end = None
+            elif name == "add_lock_window":
+                config["windows"].append(value)
+            elif name == "add_holiday":
+                config["holidays"].append(value)
+            elif name == "remove_holiday":
+                config["holidays"] = [day for day in config["holidays"] if day != value]
+            elif name == "add_exception":
+                config["exceptions"].append(value)
+            elif name == "clear_schedule":
+                config = {"windows": [], "holidays": [], "exceptions": []}
+                start = end = None
+        return config, (start, end)
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+            if not line:
+                return
+            if len(line) > MAX_REQUEST_BYTES:
+                self._reply({"ok": False, "error": "Anfrage zu groß"})
+                return
+            try:
+                request = json.loads(line)
+                ops = request["ops"] if isinstance(request, dict) else request
+                response = self.server.apply(Batch(ops))
+            except (ValueError, KeyError, TypeError) as e:
+                response = {"ok": False, "error": str(e)}
+            except (OSError, RuntimeError) as e:
+                # Speichern oder Verteilen fehlgeschlagen - Verbindung bleibt bestehen
+                print(f"[ERROR] Admin-Batch fehlgeschlagen: {e!r}")
+                response = {"ok": False, "error": f"Server-Fehler: {e}"}
+            self._reply(response)
+
+    def _reply(self, response):
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def start_admin_server(directory, apply):
+    """Startet die Admin-Schnittstelle in einem eigenen Thread
+
+    apply(batch) führt einen geprüften Batch aus und gibt die Antwort als dict
+    zurück. Gibt (Server, Adresse) zurück.
+    """
+    if hasattr(socket, "AF_UNIX"):
+        path = os.path.join(directory, SOCKET_FILE)
+        if os.path.exists(path):
+            os.remove(path)   # übrig vom letzten Lauf - der Schreib-Lock schützt vor zwei Servern
+        old_umask = os.umask(0o177)   # Socket nur für den Besitzer
+        try:
+            server = _UnixServer(path, _Handler)
+        finally:
+            os.umask(old_umask)
+        address = path
+    else:
+        server = _TCPServer(FALLBACK_ADDRESS, _Handler)
+        address = "%s:%d" % FALLBACK_ADDRESS
+    server.apply = apply
+    threading.Thread(target=server.serve_forever, name="admin-api", daemon=True).start()
+    return server, address
+
+def send_batch(ops, directory=None, address=None):
+    """Schickt einen Batch an den laufenden Server und gibt die Antwort zurück"""
+    if address is None and hasattr(socket, "AF_UNIX"):
+        address = os.path.join(directory, SOCKET_FILE)
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        address = address or FALLBACK_ADDRESS
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    with sock:
+        sock.connect(address)
+        sock.sendall(json.dumps({"ops": ops}).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("Server hat die Verbindung ohne Antwort geschlossen")
+    return json.loads(line)
+
+def parse_words(words):
+    """Kurzform der Kommandozeile: "add A B remove C holiday 2026-12-24 sync" """
+    ops = []
+    current = None
+    for word in words:
+        if word in ("add", "remove"):
+            current = {"op": word, "uids": []}
+            ops.append(current)
+        elif word in ("sync", "status", "clear_lock", "clear_schedule"):
+            current = None
+            ops.append({"op": word})
+        elif word.startswith("holiday="):
+            current = None
+            ops.append({"op": "add_holiday", "date": word[8:]})
+        elif current is not None:
+            current["uids"].append(word)
+        else:
+            raise ValueError(f"Unerwartetes Wort: {word}")
+    return ops
+
+def read_uid_file(path):
+    """Personalnummern aus einer Textdatei (eine pro Zeile, # Kommentare)"""
+    with open(path, encoding="utf-8-sig") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+def main():
+    default_dir = os.environ.get("ACCESS_DATA_DIR") or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    parser = argparse.ArgumentParser(description="Änderungen als ein Batch an den Server senden")
+    parser.add_argument("words", nargs="*", help="z. B. add F39A370E remove 20047935 sync")
+    parser.add_argument("--data", default=default_dir, help="Datenordner des Servers (für den Socket)")
+    parser.add_argument("--file", help="JSON-Lines-Datei mit einer Operation pro Zeile")
+    parser.add_argument("--add-file", help="Textdatei mit hinzuzufügenden Personalnummern")
+    parser.add_argument("--remove-file", help="Textdatei mit zu entfernenden Personalnummern")
+    args = parser.parse_args()
+
+    try:
+        ops = parse_words(args.words)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            ops[:0] = [json.loads(line) for line in f if line.strip()]
+    if args.remove_file:
+        ops.insert(0, {"op": "remove", "uids": read_uid_file(args.remove_file)})
+    if args.add_file:
+        ops.insert(0, {"op": "add", "uids": read_uid_file(args.add_file)})
+    if not ops:
+        ops = [{"op": "status"}]
+
+    try:
+        response = send_batch(ops, args.data)
+    except OSError as e:
+        raise SystemExit(f"[ERROR] Server nicht erreichbar: {e}")
+    print(json.dumps(response, indent=2, ensure_ascii=False))
+    if not response.get("ok"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
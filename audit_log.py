@@ -0,0 +1,191 @@
+# Audit-Log für Zutrittsentscheidungen
+#
+# Die Entscheidung selbst legt nur ein Tupel (Zeit, UID, Ergebnis, Grund) in
+# einen Ringpuffer im Speicher - keine Formatierung, kein print, kein Datei-I/O.
+# Ein Hintergrund-Thread holt die Einträge in Paketen ab und hängt sie als
+# JSON-Zeilen an die Logdatei an (eine Zeile pro Zutrittsversuch):
+#   {"ts": "2025-01-31T12:00:00.123", "uid": "F39A370E", "result": "DENY", "reason": "..."}
+# Optional gibt er dieselben Einträge gesammelt im Terminal aus.
+#
+# Wird die Datei größer als max_bytes, wird rotiert:
+#   audit.log -> audit.log.1 -> audit.log.2 ... (höchstens backups Dateien)
+#
+# Ist der Ringpuffer voll (Platte hängt), werden neue Einträge verworfen und
+# gezählt - die Zutrittsentscheidung wartet nie auf das Log.
+
+import collections
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from access_list import int_to_uid
+
+LOG_FILE = "audit.log"
+
+class AuditLog:
+    """Ringpuffer + Schreib-Thread für Zutrittsversuche"""
+
+    def __init__(self, directory, capacity=65536, batch_size=256, flush_interval=0.5,
+                 max_bytes=10 * 1024 * 1024, backups=5, echo=True):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, LOG_FILE)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.echo = echo
+        self.written = 0
+        # Verworfene Einträge: je Zähler schreibt nur ein Thread, dropped summiert
+        self._dropped_full = 0     # Puffer voll (Thread der Entscheidung)
+        self._dropped_write = 0    # Schreibfehler (Schreib-Thread)
+        self.last_flush = 0.0    # Dauer des letzten Schreibvorgangs in Sekunden
+        # deque.append/popleft sind atomar - kein Lock im Entscheidungspfad
+        self._buffer = collections.deque()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        """Anzahl noch nicht geschriebener Einträge"""
+        return len(self._buffer)
+
+    @property
+    def dropped(self):
+        """Anzahl verworfener Einträge (Puffer voll oder Schreibfehler)"""
+        return self._dropped_full + self._dropped_write
+
+    def log(self, uid, result, reason=""):
+        """Merkt einen Zutrittsversuch vor (O(1), nie blockierend)"""
+        buffer = self._buffer
+        if len(buffer) >= self.capacity:
+            self._dropped_full += 1
+            return
+        buffer.append((time.time(), uid, result, reason))
+        if len(buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Schreibt alle vorgemerkten Einträge (läuft im Schreib-Thread)"""
+        buffer = self._buffer
+        while buffer:
+            started = time.perf_counter()
+            batch = []
+            try:
+                for _ in range(self.batch_size * 16):
+                    batch.append(buffer.popleft())
+            except IndexError:
+                pass
+            lines = []
+            echo = []
+            for ts, uid, result, reason in batch:
+                if isinstance(uid, int):
+                    uid = int_to_uid(uid)
+                moment = datetime.fromtimestamp(ts)
+                lines.append(json.dumps({"ts": moment.isoformat(timespec="milliseconds"),
+                                         "uid": uid, "result": result, "reason": reason}))
+                if self.echo:
+                    text = f"[{moment.strftime('%Y-%m-%d %H:%M:%S')}] Personalnummer: {uid} -> {result}"
+                    echo.append(f"{text} ({reason})" if reason else text)
+            try:
+                if self._file.closed:
+                    # Wiederöffnen nach einer gescheiterten Rotation
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write("\n".join(lines) + "\n")
+                self._file.flush()
+                self.written += len(batch)
+            except (OSError, ValueError) as e:
+                self._dropped_write += len(batch)
+                print(f"[ERROR] Audit-Log konnte nicht geschrieben werden: {e}")
+            else:
+                try:
+                    if self._file.tell() >= self.max_bytes:
+                        self._rotate()
+                except (OSError, ValueError) as e:
+                    print(f"[ERROR] Audit-Log konnte nicht rotiert werden: {e}")
+            if echo:
+                sys.stdout.write("\n".join(echo) + "\n")
+                sys.stdout.flush()
+            self.last_flush = time.perf_counter() - started
+
+    def _rotate(self):
+        """audit.log -> audit.log.1 -> ... -> audit.log.<backups>"""
+        self._file.close()
+        try:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            if self.backups > 0:
+                os.replace(self.path, self.path + ".1")
+            else:
+                os.remove(self.path)
+        finally:
+            # Auch wenn das Umbenennen scheitert, weiter in eine offene Datei schreiben
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        """Beendet den Schreib-Thread und schreibt den Rest"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+        self._file.close()
+
+def benchmark(calls=200000):
+    """Misst die Kosten pro Zutrittsentscheidung: print im Pfad vs. AuditLog.log()
+
+    Die Ausreißer bei AuditLog.log() entstehen, wenn der Schreib-Thread gerade
+    das GIL hält - sie sind durch sys.getswitchinterval() (5 ms) begrenzt.
+    """
+    import tempfile
+
+    def report(name, samples):
+        samples.sort()
+        n = len(samples)
+        print(f"{name:>20}: p50 {samples[n // 2] * 1e9:7.0f} ns, "
+              f"p99 {samples[int(n * 0.99)] * 1e9:7.0f} ns, "
+              f"p99.9 {samples[int(n * 0.999)] * 1e9:8.0f} ns, "
+              f"max {samples[-1] * 1e6:8.1f} µs")
+
+    clock = time.perf_counter
+    uids = [0xF39A370E, 0x20047935, 0x00220394]
+
+    # Bisher: Zeitstempel formatieren + print (hier in eine Datei statt ins Terminal)
+    with tempfile.TemporaryFile("w") as out:
+        samples = []
+        for i in range(calls):
+            t0 = clock()
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            print(f"[{timestamp}] Personalnummer: {int_to_uid(uids[i % 3])} -> DENY (Personalnummer nicht berechtigt)",
+                  file=out, flush=True)
+            samples.append(clock() - t0)
+        report("print im Pfad", samples)
+
+    with tempfile.TemporaryDirectory() as directory:
+        audit = AuditLog(directory, capacity=calls, echo=False)
+        samples = []
+        for i in range(calls):
+            t0 = clock()
+            audit.log(uids[i % 3], "DENY", "Personalnummer nicht berechtigt")
+            samples.append(clock() - t0)
+        audit.close()
+        report("AuditLog.log()", samples)
+        print(f"{audit.written} geschrieben, {audit.dropped} verworfen")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,215 @@
+# Ausgangswarteschlangen und Broadcast an viele Clients
+#
+# Jede Verbindung bekommt eine begrenzte Outbox mit eigenem Sende-Task.
+# Ein Broadcast legt die Nachricht nur in die Outboxen und kehrt sofort
+# zurück - ein langsamer oder halbtoter ESP32 hält keinen anderen auf.
+#
+# Nachrichten mit gleichem Schlüssel (z. B. "list") ersetzen eine noch
+# wartende ältere Nachricht: ein neues Listen-Update macht das alte überflüssig.
+# Ist die Outbox trotzdem voll, greift die Policy:
+#   drop_oldest - älteste wartende Nachricht verwerfen
+#   drop_new    - neue Nachricht verwerfen
+#   disconnect  - Verbindung trennen
+# Hängt ein Schreibvorgang länger als send_timeout, wird die Verbindung getrennt.
+#
+# "Zugestellt" heißt: vollständig an den Socket des Betriebssystems übergeben.
+
+import asyncio
+import collections
+import time
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DROP_NEW = "drop_new"
+POLICY_DISCONNECT = "disconnect"
+POLICIES = (POLICY_DROP_OLDEST, POLICY_DROP_NEW, POLICY_DISCONNECT)
+
+def percentile(sorted_values, q):
+    """Wert am Quantil q (0..1) einer aufsteigend sortierten Liste"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+class BroadcastTracker:
+    """Sammelt die Zustelldauer eines Broadcasts über alle Clients"""
+
+    def __init__(self, name, on_complete=None):
+        self.name = name
+        self.started = time.monotonic()
+        self.expected = 0
+        self.latencies = []
+        self.failures = collections.Counter()
+        self.finished = None
+        self._sealed = False
+        self._on_complete = on_complete
+
+    def add_target(self):
+        self.expected += 1
+
+    def delivered(self, latency):
+        self.latencies.append(latency)
+        self._check_done()
+
+    def failed(self, reason):
+        self.failures[reason] += 1
+        self._check_done()
+
+    def seal(self):
+        """Alle Ziele sind eingetragen - ab jetzt kann der Broadcast fertig werden"""
+        self._sealed = True
+        self._check_done()
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+    def _check_done(self):
+        if self._sealed and not self.done and \
+                len(self.latencies) + sum(self.failures.values()) >= self.expected:
+            self.finished = time.monotonic()
+            if self._on_complete:
+                self._on_complete(self)
+
+    def summary(self):
+        """Einzeilige Zusammenfassung für das Terminal"""
+        values = sorted(self.latencies)
+        end = self.finished if self.finished is not None else time.monotonic()
+        text = (f"{self.name}: {len(values)}/{self.expected} zugestellt in "
+                f"{(end - self.started) * 1000:.0f} ms "
+                f"(p50 {percentile(values, 0.5) * 1000:.1f} ms, "
+                f"p99 {percentile(values, 0.99) * 1000:.1f} ms, "
+                f"max {(values[-1] if values else 0) * 1000:.1f} ms)")
+        if self.failures:
+            text += ", " + ", ".join(f"{n} {reason}" for reason, n in self.failures.items())
+        return text
+
+class _Message:
+    __slots__ = ("data", "key", "queued_at", "tracker", "on_delivered")
+
+    def __init__(self, data, key, tracker, on_delivered):
+        self.data = data
+        self.key = key
+        self.queued_at = time.monotonic()
+        self.tracker = tracker
+        self.on_delivered = on_delivered
+
+class Outbox:
+    """Begrenzte Ausgangswarteschlange einer Verbindung mit eigenem Sende-Task"""
+
+    def __init__(self, writer, max_messages=8, max_bytes=16 * 1024 * 1024,
+                 policy=POLICY_DROP_OLDEST, send_timeout=10.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unbekannte Policy: {policy}")
+        self.writer = writer
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self.closed = False
+        self._queue = collections.deque()
+        self._bytes = 0
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    @property
+    def depth(self):
+        """Anzahl wartender Nachrichten"""
+        return len(self._queue)
+
+    @property
+    def queued_bytes(self):
+        return self._bytes
+
+    def push(self, data, key=None, tracker=None, on_delivered=None):
+        """Reiht eine Nachricht ein (nie blockierend), gibt False zurück wenn verworfen"""
+        if self.closed:
+            self._fail(_Message(data, key, tracker, None), "getrennt")
+            return False
+        message = _Message(data, key, tracker, on_delivered)
+        if key is not None:
+            # Ältere Nachricht mit gleichem Schlüssel ist überholt
+            for old in self._queue:
+                if old.key == key:
+                    self._queue.remove(old)
+                    self._bytes -= len(old.data)
+                    self._fail(old, "ersetzt")
+                    break
+        if len(self._queue) >= self.max_messages or \
+                self._bytes + len(data) > self.max_bytes:
+            if self.policy == POLICY_DISCONNECT:
+                self._fail(message, "getrennt")
+                self.close(abort=True)
+                return False
+            if self.policy == POLICY_DROP_NEW or not self._queue:
+                self.dropped += 1
+                self._fail(message, "verworfen")
+                return False
+            old = self._queue.popleft()
+            self._bytes -= len(old.data)
+            self.dropped += 1
+            self._fail(old, "verworfen")
+        self._queue.append(message)
+        self._bytes += len(data)
+        self._wakeup.set()
+        return True
+
+    def cancel(self, key):
+        """Entfernt eine wartende Nachricht mit diesem Schlüssel"""
+        for old in self._queue:
+            if old.key == key:
+                self._queue.remove(old)
+                self._bytes -= len(old.data)
+                self._fail(old, "ersetzt")
+                return True
+        return False
+
+    @staticmethod
+    def _fail(message, reason):
+        if message.tracker:
+            message.tracker.failed(reason)
+
+    async def _run(self):
+        message = None
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self._queue:
+                    message = self._queue.popleft()
+                    self._bytes -= len(message.data)
+                    # write() blockiert nie, drain() wartet bis der Puffer leer ist
+                    self.writer.write(message.data)
+                    await asyncio.wait_for(self.writer.drain(), self.send_timeout)
+                    latency = time.monotonic() - message.queued_at
+                    if message.on_delivered:
+                        message.on_delivered()
+                    if message.tracker:
+                        message.tracker.delivered(latency)
+                    message = None
+        except asyncio.TimeoutError:
+            # Client nimmt nichts mehr an - Verbindung hart trennen
+            if message:
+                self._fail(message, "Timeout")
+                message = None
+            self.close(abort=True)
+        except (ConnectionError, OSError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if message:
+                self._fail(message, "getrennt")
+            self.closed = True
+            while self._queue:
+                self._fail(self._queue.popleft(), "getrennt")
+            self._bytes = 0
+
+    def close(self, abort=False):
+        """Beendet den Sende-Task, wartende Nachrichten gelten als nicht zugestellt"""
+        if self.closed:
+            return
+        self.closed = True
+        if abort:
+            self.writer.transport.abort()
+        self._task.cancel()
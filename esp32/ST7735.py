@@ -35,6 +35,10 @@ def TFTColor( aR, aG, aB ) :
 
 ScreenSize = (128, 160)
 
+#Bytes of RAM for pre-rendered scaled glyphs (least recently used are
+# dropped first). A size 2 sysfont glyph takes 10x16x2 = 320 bytes.
+GLYPH_CACHE_BYTES = 8192
+
 class TFT(object) :
   """Sainsmart TFT 7735 display driver."""
 
@@ -120,6 +124,10 @@ class TFT(object) :
     self.spi = spi
     self.colorData = bytearray(2)
     self.windowLocData = bytearray(4)
+    self.glyphCacheBytes = GLYPH_CACHE_BYTES
+    self._glyphs = {}                  #key -> [rgb565 buffer, last use]
+    self._glyphSize = 0                #bytes held in _glyphs
+    self._glyphTick = 0
 
   def size( self ) :
     return self._size
@@ -161,11 +169,12 @@ class TFT(object) :
       self._pushcolor(aColor)
 
 #   @micropython.native
-  def text( self, aPos, aString, aColor, aFont, aSize = 1, nowrap = False ) :
+  def text( self, aPos, aString, aColor, aFont, aSize = 1, nowrap = False, aBackground = None ) :
     '''Draw a text at the given position.  If the string reaches the end of the
        display it is wrapped to aPos[0] on the next line.  aSize may be an integer
        which will size the font uniformly on w,h or a or any type that may be
-       indexed with [0] or [1].'''
+       indexed with [0] or [1].  With aBackground scaled characters are drawn
+       opaque from the glyph cache (see char).'''
 
     if aFont == None:
       return
@@ -179,7 +188,7 @@ class TFT(object) :
     px, py = aPos
     width = wh[0] * aFont["Width"] + 1
     for c in aString:
-      self.char((px, py), c, aColor, aFont, wh)
+      self.char((px, py), c, aColor, aFont, wh, aBackground)
       px += width
       #We check > rather than >= to let the right (blank) edge of the
       # character print off the right of the screen.
@@ -191,10 +200,13 @@ class TFT(object) :
           px = aPos[0]
 
 #   @micropython.native
-  def char( self, aPos, aChar, aColor, aFont, aSizes ) :
+  def char( self, aPos, aChar, aColor, aFont, aSizes, aBackground = None ) :
     '''Draw a character at the given position using the given font and color.
        aSizes is a tuple with x, y as integer scales indicating the
-       # of pixels to draw for each pixel in the character.'''
+       # of pixels to draw for each pixel in the character.
+       Scaled characters with aBackground are pre-rendered once per
+       character/scale/colors and sent with a single image() call.
+       Without aBackground only the set pixels are drawn (transparent).'''
 
     if aFont == None:
       return
@@ -221,16 +233,64 @@ class TFT(object) :
               buf[pos + 1] = aColor & 0xff
             c >>= 1
         self.image(aPos[0], aPos[1], aPos[0] + fontw - 1, aPos[1] + fonth - 1, buf)
+      elif aBackground is not None and self._fits(aPos, fontw * aSizes[0], fonth * aSizes[1]):
+        key = (id(aFont), ci, aSizes[0], aSizes[1], aColor, aBackground)
+        buf = self._glyph(key, charA, fonth, aSizes, aColor, aBackground)
+        self.image(aPos[0], aPos[1], aPos[0] + fontw * aSizes[0] - 1,
+                   aPos[1] + fonth * aSizes[1] - 1, buf)
       else:
         for c in charA :
           py = aPos[1]
-          for r in range(fonth) :
+          #One fillrect per vertical run of set pixels.
+          while c :
             if c & 0x01 :
-              self.fillrect((px, py), aSizes, aColor)
-            py += aSizes[1]
-            c >>= 1
+              run = 0
+              while c & 0x01 :
+                run += 1
+                c >>= 1
+              self.fillrect((px, py), (aSizes[0], aSizes[1] * run), aColor)
+              py += aSizes[1] * run
+            else:
+              py += aSizes[1]
+              c >>= 1
           px += aSizes[0]
 
+  def _fits( self, aPos, aWidth, aHeight ) :
+    '''True if the area lies completely on the screen.'''
+    return (0 <= aPos[0] and aPos[0] + aWidth <= self._size[0] and
+            0 <= aPos[1] and aPos[1] + aHeight <= self._size[1])
+
+  def _glyph( self, aKey, aColumns, aHeight, aSizes, aColor, aBackground ) :
+    '''Return the rgb565 buffer of a scaled character, from the cache if possible.'''
+    self._glyphTick += 1
+    entry = self._glyphs.get(aKey)
+    if entry :
+      entry[1] = self._glyphTick
+      return entry[0]
+
+    sx, sy = aSizes
+    fg = bytes((aColor >> 8 & 0xFF, aColor & 0xFF)) * sx
+    bg = bytes((aBackground >> 8 & 0xFF, aBackground & 0xFF)) * sx
+    buf = bytearray()
+    for r in range(aHeight) :
+      line = b"".join(fg if (c >> r) & 0x01 else bg for c in aColumns)
+      for _ in range(sy) :
+        buf.extend(line)
+
+    if len(buf) <= self.glyphCacheBytes :
+      #Drop least recently used glyphs until the new one fits.
+      while self._glyphSize + len(buf) > self.glyphCacheBytes :
+        oldest = min(self._glyphs, key = lambda k: self._glyphs[k][1])
+        self._glyphSize -= len(self._glyphs.pop(oldest)[0])
+      self._glyphs[aKey] = [buf, self._glyphTick]
+      self._glyphSize += len(buf)
+    return buf
+
+  def clearglyphs( self ) :
+    '''Free the glyph cache.'''
+    self._glyphs = {}
+    self._glyphSize = 0
+
 #   @micropython.native
   def line( self, aStart, aEnd, aColor ) :
     '''Draws a line from aStart to aEnd in the given color.  Vertical or horizontal
@@ -333,8 +393,8 @@ class TFT(object) :
 #   @micropython.native
   def circle( self, aPos, aRadius, aColor ) :
     '''Draw a hollow circle with the given radius and color with aPos as center.'''
-    self.colorData[0] = aColor >> 8
-    self.colorData[1] = aColor
+    self.colorData[0] = aColor >> 8 & 0xFF
+    self.colorData[1] = aColor & 0xFF
     xend = int(0.7071 * aRadius) + 1
     rsq = aRadius * aRadius
     for x in range(xend) :
@@ -412,8 +472,8 @@ class TFT(object) :
     
 #   @micropython.native
   def _setColor( self, aColor ) :
-    self.colorData[0] = aColor >> 8
-    self.colorData[1] = aColor
+    self.colorData[0] = aColor >> 8 & 0xFF
+    self.colorData[1] = aColor & 0xFF
     self.buf = bytes(self.colorData) * 32
 
 #   @micropython.native
@@ -489,8 +549,8 @@ class TFT(object) :
   #@micropython.native
   def _pushcolor( self, aColor ) :
     '''Push given color to the device.'''
-    self.colorData[0] = aColor >> 8
-    self.colorData[1] = aColor
+    self.colorData[0] = aColor >> 8 & 0xFF
+    self.colorData[1] = aColor & 0xFF
     self._writedata(self.colorData)
 
   #@micropython.native
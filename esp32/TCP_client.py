@@ -1,8 +1,11 @@
+import select
 import socket
 import time
 import eeprom_storage
 import tft_display as display
 import rfid_reader
+import protocol
+import tap_filter
 
 # Verbindungsstatus
 MODE_ONLINE = "ONLINE"
@@ -12,6 +15,9 @@ MODE_OFFLINE = "OFFLINE"
 MAX_CONNECT_RETRIES = 3        # Anzahl Verbindungsversuche beim Start
 RECONNECT_INTERVAL = 60        # Sekunden zwischen Reconnect-Versuchen im Offline-Modus
 RFID_POLL_INTERVAL = 0.2       # Sekunden zwischen RFID-Polls
+USE_BINARY_PROTOCOL = True     # Binärprotokoll mit Frames statt Textprotokoll
+LIST_CHUNK_SIZE = 512          # Empfangspuffer für Listen (Vielfaches von 4 Bytes)
+TEXT_LIST_TIMEOUT = 0.5        # Textprotokoll: Liste ist zu Ende, wenn so lange nichts kommt
 
 def try_connect(host, port, silent=False):
     """Versucht eine Verbindung zum Server herzustellen"""
@@ -31,7 +37,7 @@ def initial_connect(host, port):
     for attempt in range(1, MAX_CONNECT_RETRIES + 1):
         print(f"[VERBINDUNG] Versuch {attempt}/{MAX_CONNECT_RETRIES}...")
         display.show_connection_status(attempt, MAX_CONNECT_RETRIES)
-        sock = try_connect(host, port)
+        sock = connect_and_sync(host, port)
         if sock:
             return sock
         if attempt < MAX_CONNECT_RETRIES:
@@ -40,17 +46,254 @@ def initial_connect(host, port):
     return None
 
 def check_local_access(personalnummer):
-    """Prüft Zugang gegen lokale EEPROM-Liste"""
-    local_list = eeprom_storage.load_local_list()
-    if not local_list:
+    """Prüft Zugang gegen lokale EEPROM-Liste (liegt nach dem ersten Aufruf im RAM)"""
+    if not eeprom_storage.local_list_size():
         print("[OFFLINE] Keine lokale Liste vorhanden - Zugang verweigert")
         return False
-    return personalnummer in local_list
+    return eeprom_storage.check_local_access(personalnummer)
+
+def log_decision_time(started):
+    """Gibt die Zeit von der gelesenen Karte bis zur Entscheidung aus"""
+    elapsed = time.ticks_diff(time.ticks_us(), started)
+    print("[ZEIT] Karte -> Entscheidung: %d.%d ms" % (elapsed // 1000, elapsed % 1000 // 100))
+
+def list_saved():
+    """Anzeige nach einer gespeicherten Liste"""
+    display.show_list_updated()
+    display.show_waiting(offline=False)
+
+def receive_full_list(sock, length):
+    """Empfängt UPDATE_LIST in Blöcken und schreibt sie direkt in den Flash
+
+    Nur ein Puffer von LIST_CHUNK_SIZE Bytes - der RAM-Bedarf hängt nicht von
+    der Listengröße ab. Umgeschaltet wird erst, wenn alles angekommen ist.
+    """
+    version, list_hash = protocol.decode_list_info(protocol.recv_exact(sock, protocol.LIST_INFO_SIZE))
+    remaining = length - protocol.LIST_INFO_SIZE
+    if remaining < 0 or remaining % 4:
+        raise OSError("UPDATE_LIST hat ungültige Länge")
+    buf = memoryview(bytearray(LIST_CHUNK_SIZE))
+    writer = eeprom_storage.begin_local_list(version, list_hash)
+    try:
+        while remaining:
+            chunk = buf[:min(remaining, LIST_CHUNK_SIZE)]
+            protocol.recv_into_exact(sock, chunk)
+            writer.write_packed(chunk)
+            remaining -= len(chunk)
+        count = writer.commit()
+    except:
+        writer.abort()
+        raise
+    print("[ONLINE] Neue lokale Liste empfangen:", count, "Einträge, Version", version)
+
+HEX_DIGITS = b"0123456789abcdefABCDEF"
+TEXT_REPLIES = (b"ALLOW", b"DENY")
+
+def _is_hex(token):
+    for c in token:
+        if c not in HEX_DIGITS:
+            return False
+    return True
+
+def receive_text_list(sock, data):
+    """Textprotokoll: UPDATE_LIST:id1,id2,... ohne Längenangabe blockweise in den Flash
+
+    data ist der schon empfangene Anfang. Die Liste hat kein Endzeichen: sie
+    endet am ersten Teil, der keine Personalnummer (8 Hex-Zeichen) ist - das
+    ist der Anfang der nächsten Nachricht (z. B. ALLOW, im selben recv
+    angehängt) - oder wenn TEXT_LIST_TIMEOUT lang nichts mehr kommt.
+    Bis zum ersten Eintrag wird mit dem normalen Timeout weitergelesen.
+    Gibt (Einträge, Rest nach der Liste) zurück, Rest b"" wenn keiner. Eine
+    Liste ohne einen einzigen Eintrag wird nicht gespeichert (Einträge 0).
+    """
+    writer = eeprom_storage.begin_local_list()
+    buf = data[12:]   # "UPDATE_LIST:" entfernen
+    tail = None
+    count = 0
+    try:
+        sock.settimeout(5.0)
+        while tail is None:
+            pos = 0
+            while True:
+                token = buf[pos:pos + 8]
+                if not _is_hex(token):
+                    tail = buf[pos:]   # keine Personalnummer - Liste zu Ende
+                    break
+                if len(buf) - pos < 9:
+                    break              # Nummer oder Trennzeichen noch unvollständig
+                writer.add(int(token, 16))
+                count += 1
+                if buf[pos + 8:pos + 9] != b",":
+                    tail = buf[pos + 8:]
+                    break
+                pos += 9
+            if tail is not None:
+                break
+            buf = buf[pos:]
+            if count:
+                sock.settimeout(TEXT_LIST_TIMEOUT)
+            try:
+                data = sock.recv(LIST_CHUNK_SIZE)
+            except OSError:
+                data = b""   # Timeout - Liste vollständig
+            if not data:
+                # Ende: Rest ist die letzte Nummer oder schon die nächste Nachricht
+                if len(buf) == 8:
+                    writer.add(int(buf, 16))
+                    count += 1
+                    tail = b""
+                else:
+                    tail = buf
+                break
+            buf += data
+        if count:
+            writer.commit()
+        else:
+            writer.abort()
+    except:
+        writer.abort()
+        raise
+    if count:
+        print("[ONLINE] Neue lokale Liste empfangen:", count, "Einträge")
+    else:
+        print("[ONLINE] Leere Liste empfangen - lokale Liste bleibt")
+    return count, bytes(tail)
+
+LIST_PREFIX = b"UPDATE_LIST:"
+
+def complete_list_prefix(sock, data):
+    """Liest weiter, solange data nur der Anfang von UPDATE_LIST: ist (TCP teilt beliebig)"""
+    while data and len(data) < len(LIST_PREFIX) and LIST_PREFIX.startswith(data):
+        more = sock.recv(LIST_CHUNK_SIZE)
+        if not more:
+            raise OSError("Verbindung verloren")
+        data += more
+    return data
+
+def complete_text_reply(sock, data):
+    """Liest weiter, solange data nur der Anfang von ALLOW/DENY ist"""
+    while data and data not in TEXT_REPLIES and \
+            any(reply.startswith(data) for reply in TEXT_REPLIES):
+        more = sock.recv(1024)
+        if not more:
+            break
+        data += more
+    return data
+
+def recv_message(sock):
+    """Liest den nächsten Frame - UPDATE_LIST geht dabei direkt in den Flash"""
+    msg_type, request_id, length = protocol.recv_header(sock)
+    if msg_type == protocol.MSG_UPDATE_LIST:
+        receive_full_list(sock, length)
+        return msg_type, request_id, None
+    return msg_type, request_id, protocol.recv_payload(sock, length)
+
+def request_full_list(sock):
+    """SYNC ohne Listenstand: der Server schickt die komplette Liste und setzt
+    seinen gemerkten Stand für diesen Client zurück (Antwort kommt später)"""
+    print("[ONLINE] Fordere komplette Liste an")
+    sock.send(protocol.encode_sync(None, None, protocol.next_request_id()))
+
+def handle_list_frame(msg_type, payload, sock):
+    """Verarbeitet UPDATE_LIST, LIST_DELTA und LIST_CURRENT, gibt False bei anderen Typen"""
+    if msg_type == protocol.MSG_UPDATE_LIST:
+        # Schon beim Empfang gespeichert (recv_message)
+        list_saved()
+    elif msg_type == protocol.MSG_LIST_DELTA:
+        version, list_hash, added, removed = protocol.decode_delta(payload)
+        print(f"[ONLINE] Listen-Delta v{version}: +{len(added)} -{len(removed)}")
+        if eeprom_storage.apply_delta(added, removed, version, list_hash):
+            list_saved()
+        else:
+            request_full_list(sock)
+    elif msg_type == protocol.MSG_LIST_CURRENT:
+        # Nichts zu tun - kein Schreibzugriff auf den Flash
+        print("[ONLINE] Lokale Liste ist aktuell (v%d)" % protocol.decode_list_info(payload)[0])
+    else:
+        return False
+    return True
+
+def sync_local_list(sock):
+    """Meldet den eigenen Listenstand, der Server schickt nur die Änderungen"""
+    version, list_hash = eeprom_storage.load_list_version()
+    request_id = protocol.next_request_id()
+    sock.send(protocol.encode_sync(version, list_hash, request_id))
+    sock.settimeout(5.0)
+    while True:
+        msg_type, reply_id, payload = recv_message(sock)
+        if handle_list_frame(msg_type, payload, sock) and reply_id == request_id:
+            return
+
+def request_access_binary(sock, personalnummer):
+    """Fragt den Server per Binärprotokoll an und gibt ALLOW oder DENY zurück"""
+    request_id = protocol.next_request_id()
+    sock.send(protocol.encode_check(personalnummer, request_id))
+    sock.settimeout(5.0)
+    while True:
+        msg_type, reply_id, payload = recv_message(sock)
+        if handle_list_frame(msg_type, payload, sock):
+            # Vom Server gepushte Liste - gehört nicht zu unserer Anfrage
+            continue
+        elif reply_id != request_id:
+            # Antwort auf eine ältere, bereits abgelaufene Anfrage
+            continue
+        elif msg_type == protocol.MSG_ALLOW:
+            return "ALLOW"
+        elif msg_type == protocol.MSG_DENY:
+            return "DENY"
+        else:
+            print("[ONLINE] Fehler vom Server:", bytes(payload))
+            return "DENY"
+
+def receive_pushed(sock):
+    """Liest vom Server gepushte Nachrichten, während keine Karte anliegt
+
+    Wird in der Leerlauf-Schleife aufgerufen und wartet nicht: nur was schon
+    im Socket liegt, wird gelesen und nach Typ verarbeitet. So landet eine
+    neue Liste sofort im Flash und nicht erst bei der nächsten Karte (wo sie
+    sonst vor der eigentlichen Antwort gelesen würde).
+    Löst OSError aus, wenn die Verbindung verloren ist.
+    """
+    poller = select.poll()
+    poller.register(sock, select.POLLIN)
+    while poller.poll(0):
+        if USE_BINARY_PROTOCOL:
+            sock.settimeout(5.0)
+            msg_type, request_id, payload = recv_message(sock)
+            if not handle_list_frame(msg_type, payload, sock):
+                print("[ONLINE] Unerwartete Nachricht vom Server: Typ", msg_type)
+            continue
+        sock.settimeout(5.0)
+        data = sock.recv(LIST_CHUNK_SIZE)
+        if not data:
+            raise OSError("Verbindung verloren")
+        data = complete_list_prefix(sock, data)
+        if data.startswith(LIST_PREFIX):
+            count, tail = receive_text_list(sock, data)
+            if count:
+                list_saved()
+            if tail:
+                print("[ONLINE] Unerwartete Nachricht vom Server:", tail[:32])
+        else:
+            print("[ONLINE] Unerwartete Nachricht vom Server:", data[:32])
+
+def connect_and_sync(host, port, silent=False):
+    """Verbindet zum Server und gleicht danach die lokale Liste ab"""
+    sock = try_connect(host, port, silent)
+    if sock and USE_BINARY_PROTOCOL:
+        try:
+            sync_local_list(sock)
+        except OSError as e:
+            print(f"[VERBINDUNG] Listenabgleich fehlgeschlagen: {e}")
+            sock.close()
+            return None
+    return sock
 
 def tcp_client(host, port):
     current_mode = MODE_OFFLINE
     sock = None
     last_reconnect_attempt = 0
+    taps = tap_filter.TapFilter()
     
     print("=" * 40)
     print("  RFID-Zutrittskontrolle Client")
@@ -105,7 +348,7 @@ def tcp_client(host, port):
                         continue
                 
                 # Jetzt versuche Server-Verbindung
-                sock = try_connect(host, port)
+                sock = connect_and_sync(host, port)
                 if sock:
                     current_mode = MODE_ONLINE
                     print(f"[STATUS] Modus gewechselt: {current_mode} - Server wieder erreichbar!")
@@ -117,22 +360,54 @@ def tcp_client(host, port):
         # RFID-Karte lesen
         personalnummer = rfid_reader.read_uid()
         
-        if personalnummer is None:
-            # Keine Karte erkannt - kurz warten und erneut versuchen
+        if personalnummer is None or not taps.accept(personalnummer):
+            # Keine neue Karte - gepushte Nachrichten lesen, kurz warten, erneut versuchen
+            if current_mode == MODE_ONLINE and sock:
+                try:
+                    receive_pushed(sock)
+                except OSError as e:
+                    print(f"[ONLINE] Verbindungsfehler: {e}")
+                    print(f"[STATUS] Wechsle zu OFFLINE-Modus...")
+                    print(f"[INFO] Reconnect-Versuch alle {RECONNECT_INTERVAL} Sekunden")
+                    current_mode = MODE_OFFLINE
+                    try:
+                        sock.close()
+                    except:
+                        pass
+                    sock = None
+                    last_reconnect_attempt = time.time()
+                    display.show_offline_mode()
+                    display.show_waiting(offline=True)
             time.sleep(RFID_POLL_INTERVAL)
             continue
         
+        started = time.ticks_us()
         print(f"\n[{current_mode}] RFID gelesen: {personalnummer}")
         
         if current_mode == MODE_ONLINE and sock:
             # Online-Modus: Server anfragen
             try:
-                sock.send(personalnummer.encode("utf-8"))
-                sock.settimeout(5.0)
-                data = sock.recv(1024)
+                if USE_BINARY_PROTOCOL:
+                    data = request_access_binary(sock, personalnummer)
+                else:
+                    sock.send(personalnummer.encode("utf-8"))
+                    sock.settimeout(5.0)
+                    data = complete_list_prefix(sock, sock.recv(1024))
+                    if data.startswith(LIST_PREFIX):
+                        # Liste blockweise in den Flash, nicht als Strings in den RAM
+                        count, data = receive_text_list(sock, data)
+                        if count:
+                            list_saved()
+                        # Die Liste kam vor der Antwort - Rest nach der Liste ist
+                        # der Anfang der Antwort, sonst die Antwort jetzt lesen
+                        sock.settimeout(5.0)
+                        if not data:
+                            data = sock.recv(1024)
+                    data = complete_text_reply(sock, data).decode("utf-8")
                 
                 if data:
-                    response = data.decode("utf-8")
+                    response = data
+                    log_decision_time(started)
                     print(f"[ONLINE] Server Antwort: {response}")
                     
                     if response == "ALLOW":
@@ -143,13 +418,6 @@ def tcp_client(host, port):
                         print(">>> ZUGANG VERWEIGERT (Server) <<<")
                         display.show_access_denied()
                         display.show_waiting(offline=False)
-                    elif response.startswith("UPDATE_LIST:"):
-                        # Lokale Liste vom Server empfangen und in EEPROM speichern
-                        liste = response[12:].split(",")
-                        print("[ONLINE] Neue lokale Liste empfangen:", liste)
-                        eeprom_storage.save_local_list(liste)
-                        display.show_list_updated()
-                        display.show_waiting(offline=False)
                 else:
                     # Keine Daten = Verbindung verloren
                     raise OSError("Verbindung verloren")
@@ -168,7 +436,9 @@ def tcp_client(host, port):
                 last_reconnect_attempt = time.time()
                 display.show_offline_mode()
                 # Sofort lokal prüfen nach Verbindungsverlust
-                if check_local_access(personalnummer):
+                allowed = check_local_access(personalnummer)
+                log_decision_time(started)
+                if allowed:
                     print(">>> ZUGANG ERLAUBT (Lokal) <<<")
                     display.show_access_granted()
                 else:
@@ -178,7 +448,9 @@ def tcp_client(host, port):
         
         else:
             # Offline-Modus: Lokale Liste prüfen
-            if check_local_access(personalnummer):
+            allowed = check_local_access(personalnummer)
+            log_decision_time(started)
+            if allowed:
                 print(">>> ZUGANG ERLAUBT (Lokal) <<<")
                 display.show_access_granted()
                 display.show_waiting(offline=True)
@@ -187,8 +459,8 @@ def tcp_client(host, port):
                 display.show_access_denied()
                 display.show_waiting(offline=True)
         
-        # Kurze Pause nach Kartenlesung um Mehrfachlesung zu vermeiden
-        time.sleep(2)
+        # Während der Anzeige wurde nicht gelesen - Hold-off ab jetzt
+        taps.restart(personalnummer)
 
 # main
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+# Benchmark für den Glyphen-Cache in ST7735.char (läuft auf dem PC)
+#
+# Ersetzt das machine-Modul durch eine Attrappe, deren SPI nur zählt:
+# SPI-Transaktionen (ein write pro CS-Zyklus), Fenster (RAMWR-Befehle)
+# und gesendete Bytes. Gemessen werden die Texte der Statusbildschirme
+# in Größe 2:
+#
+#   bisher       ein fillrect pro gesetztem Pixel (alte Version von char)
+#   transparent  ohne Hintergrundfarbe: ein fillrect pro senkrechter Folge
+#   Cache kalt   mit Hintergrundfarbe, Glyphe wird erst gerendert
+#   Cache warm   Glyphe liegt im Cache - ein image() pro Zeichen
+#
+# Danach die Trefferquote des LRU-Caches über wiederholte Bildschirmwechsel
+# bei verschiedenen Größen (GLYPH_CACHE_BYTES).
+#
+#   python bench_glyphs.py
+
+import sys
+import time
+
+class _Pin:
+    OUT = 1
+    IN = 0
+    PULL_DOWN = 2
+
+    def __init__(self, *args, **kwargs):
+        self.level = 0
+
+    def __call__(self, level=None):
+        if level is None:
+            return self.level
+        self.level = level
+
+    value = __call__
+
+class _SPI:
+    """Zählt, was an das Display ginge"""
+
+    def __init__(self, *args, **kwargs):
+        self.dc = None
+        self.reset()
+
+    def reset(self):
+        self.writes = 0
+        self.windows = 0
+        self.bytes = 0
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+        if self.dc is not None and self.dc.level == 0 and data[0] == 0x2C:   # RAMWR
+            self.windows += 1
+
+class _Machine:
+    Pin = _Pin
+    SPI = _SPI
+
+sys.modules["machine"] = _Machine
+if not hasattr(time, "sleep_us"):
+    time.sleep_us = lambda us: None
+
+import ST7735
+from ST7735 import TFT
+from sysfont import sysfont
+
+# Texte in Größe 2 aus tft_display.py mit Vorder- und Hintergrundfarbe
+SCREENS = [
+    [("Bitte Karte", TFT.WHITE, TFT.BLACK), ("auflegen", TFT.WHITE, TFT.BLACK)],
+    [("ZUTRITT", TFT.BLACK, TFT.GREEN), ("GEWAEHRT", TFT.BLACK, TFT.GREEN)],
+    [("ZUTRITT", TFT.WHITE, TFT.RED), ("VERWEIGERT", TFT.WHITE, TFT.RED)],
+    [("OFFLINE", TFT.BLUE, TFT.BLACK), ("MODUS", TFT.BLUE, TFT.BLACK)],
+    [("SERVER", TFT.GREEN, TFT.BLACK), ("VERBUNDEN", TFT.GREEN, TFT.BLACK)],
+    [("Liste", TFT.YELLOW, TFT.BLACK), ("Verbinde...", TFT.YELLOW, TFT.BLACK)],
+]
+
+def per_pixel_char(tft, pos, ch, color, font, sizes):
+    """char() vor dem Cache: ein fillrect (eigenes Fenster) pro gesetztem Pixel"""
+    fontw = font["Width"]
+    ci = (ord(ch) - font["Start"]) * fontw
+    px = pos[0]
+    for c in font["Data"][ci:ci + fontw]:
+        py = pos[1]
+        for r in range(font["Height"]):
+            if c & 0x01:
+                tft.fillrect((px, py), sizes, color)
+            py += sizes[1]
+            c >>= 1
+        px += sizes[0]
+
+def make_tft():
+    tft = TFT(_SPI(), _Pin(), _Pin(), _Pin())
+    tft.spi.dc = tft.dc
+    return tft
+
+def measure(tft, draw, text):
+    tft.spi.reset()
+    started = time.perf_counter()
+    draw(text)
+    elapsed = (time.perf_counter() - started) * 1000
+    return tft.spi.writes, tft.spi.windows, tft.spi.bytes, elapsed
+
+def bench_strings():
+    tft = make_tft()
+    print("%-12s %-12s %8s %8s %8s %9s" % ("Text", "Variante", "SPI", "Fenster", "Bytes", "ms (PC)"))
+    for text, color, background in [line for screen in SCREENS for line in screen][:6]:
+        def old(text):
+            px = 0
+            for ch in text:
+                per_pixel_char(tft, (px, 40), ch, color, sysfont, (2, 2))
+                px += 11
+
+        variants = [
+            ("bisher", old),
+            ("transparent", lambda text: tft.text((0, 40), text, color, sysfont, 2)),
+            ("Cache kalt", lambda text: (tft.clearglyphs(), tft.text((0, 40), text, color, sysfont, 2,
+                                                                     aBackground=background))),
+            ("Cache warm", lambda text: tft.text((0, 40), text, color, sysfont, 2, aBackground=background)),
+        ]
+        for name, draw in variants:
+            print("%-12s %-12s %8d %8d %8d %9.2f" % ((text, name) + measure(tft, draw, text)))
+        print()
+
+def bench_lru(rounds=20):
+    """Trefferquote über wiederholte Bildschirmwechsel je Cache-Größe"""
+    glyphs = set()
+    for screen in SCREENS:
+        for text, color, background in screen:
+            glyphs.update((ch, color, background) for ch in text)
+    print("Verschiedene Glyphen auf allen Bildschirmen: %d (%d Bytes bei Größe 2)" % (
+        len(glyphs), len(glyphs) * 5 * 2 * 8 * 2 * 2))
+    for budget in (2048, 4096, 8192, 16384, 20480):
+        tft = make_tft()
+        tft.glyphCacheBytes = budget
+        rendered = [0]
+        render = tft._glyph
+
+        def counting(key, *args):
+            if key not in tft._glyphs:
+                rendered[0] += 1
+            return render(key, *args)
+        tft._glyph = counting
+        lookups = 0
+        for i in range(rounds):
+            # Abwechselnd Warte-Bildschirm und ein anderer, wie im Betrieb
+            for screen in (SCREENS[0], SCREENS[1 + i % (len(SCREENS) - 1)]):
+                for text, color, background in screen:
+                    tft.text((0, 40), text, color, sysfont, 2, aBackground=background)
+                    lookups += len(text)
+        print("Cache %5d Bytes: %3d%% Treffer, %d Glyphen gehalten (%d Bytes)" % (
+            budget, 100 * (lookups - rendered[0]) // lookups, len(tft._glyphs), tft._glyphSize))
+
+if __name__ == "__main__":
+    bench_strings()
+    bench_lru()
+    print("Standard: GLYPH_CACHE_BYTES = %d" % ST7735.GLYPH_CACHE_BYTES)
@@ -0,0 +1,442 @@
+# Asynchroner Client (uasyncio): Karte lesen, Server, Anzeige und
+# Verbindungsaufbau laufen als eigene Tasks nebeneinander
+#
+#   card_task        fragt den RFID-Leser ab und reiht gelesene Karten ein
+#   access_task      entscheidet: Server mit kurzem Timeout, sonst lokale Liste
+#   Feedback.run     Zustandsautomat für Anzeige und LEDs (Dauer per Deadline)
+#   connection_task  hält WLAN und Serververbindung, gleicht die Liste ab
+#   receive_task     liest alles, was vom Server kommt, solange verbunden
+#
+# Nur receive_task liest vom Socket. Es verarbeitet Listen sofort nach Typ
+# (auch vom Server gepushte, ohne auf eine Karte zu warten) und ordnet
+# Antworten über die Request-ID der wartenden Anfrage in pending zu.
+#
+# Keiner blockiert die anderen: eine hängende Verbindung kostet eine Karte
+# höchstens ONLINE_TIMEOUT, danach wird lokal entschieden und die Verbindung
+# im Hintergrund neu aufgebaut. Während eine komplette Liste empfangen wird,
+# wird ebenfalls lokal entschieden - die Antwort käme erst danach. Nur Binärprotokoll - das Textprotokoll
+# bleibt beim blockierenden TCP_client.tcp_client.
+
+import time
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+import eeprom_storage
+import protocol
+import rfid_reader
+import tap_filter
+import tft_display as display
+import TCP_client
+
+# Konfiguration
+RFID_POLL_INTERVAL = 0.1    # Sekunden zwischen RFID-Polls
+NEXT_TAP_DELAY = 0          # zusätzliche Pause nach einer Karte (Mehrfachlesungen filtert TapFilter)
+ONLINE_TIMEOUT = 1.0        # so lange wartet eine Karte höchstens auf den Server
+CONNECT_TIMEOUT = 5.0
+SYNC_TIMEOUT = 60.0         # Listenabgleich inkl. kompletter Liste
+MAX_CONNECT_RETRIES = 3     # schnelle Versuche, danach alle RECONNECT_INTERVAL
+RETRY_DELAY = 2
+RECONNECT_INTERVAL = 60
+WLAN_TIMEOUT = 10.0
+RESULT_TIME = 2.0           # Anzeige von ZUTRITT GEWAEHRT / VERWEIGERT (LED an)
+STATUS_TIME = 1.0           # Anzeige von Statusmeldungen
+QUEUE_SIZE = 4
+
+class Queue:
+    """Kleine Warteschlange (uasyncio hat keine), älteste Einträge fallen raus"""
+
+    def __init__(self, maxlen=QUEUE_SIZE):
+        self.items = []
+        self.maxlen = maxlen
+        self._event = asyncio.Event()
+
+    def put(self, item):
+        if len(self.items) >= self.maxlen:
+            self.items.pop(0)
+        self.items.append(item)
+        self._event.set()
+
+    async def get(self):
+        while not self.items:
+            self._event.clear()
+            await self._event.wait()
+        return self.items.pop(0)
+
+# Zustände der Anzeige
+IDLE = 0       # Warte-Bildschirm
+RESULT = 1     # Ergebnis einer Karte, LED an
+STATUS = 2     # Statusmeldung (Liste aktualisiert, Offline, ...)
+
+class Feedback:
+    """Zustandsautomat für Anzeige und LEDs - blockiert nie
+
+    Jeder Bildschirm bekommt eine Deadline. Ist sie abgelaufen, gehen die
+    LEDs aus und der Warte-Bildschirm erscheint. Ein neues Ergebnis ersetzt
+    sofort, was gerade angezeigt wird - die nächste Person wartet nicht auf
+    die Anzeige der vorherigen. Statusmeldungen unterbrechen kein Ergebnis,
+    sondern folgen ihm (nur die neueste).
+    """
+
+    def __init__(self, offline, ready=None):
+        self.state = IDLE
+        self.deadline = 0
+        self.next_status = None
+        self.offline = offline        # Funktion: True = Warte-Bildschirm "OFFLINE"
+        self.ready = ready            # Funktion: aufgerufen, wenn wieder der Warte-Bildschirm steht
+        self._changed = asyncio.Event()
+
+    def result(self, allowed):
+        if allowed:
+            display.show_access_granted()
+        else:
+            display.show_access_denied()
+        self._enter(RESULT, RESULT_TIME)
+
+    def status(self, show):
+        if self.state == RESULT:
+            self.next_status = show
+            return
+        show()
+        self._enter(STATUS, STATUS_TIME)
+
+    def _enter(self, state, seconds):
+        self.state = state
+        self.deadline = time.ticks_add(time.ticks_ms(), int(seconds * 1000))
+        self._changed.set()
+
+    def _expire(self):
+        display.leds_off()
+        show, self.next_status = self.next_status, None
+        if show is not None:
+            show()
+            self._enter(STATUS, STATUS_TIME)
+        else:
+            self.state = IDLE
+            display.show_waiting(offline=self.offline())
+            if self.ready is not None:
+                self.ready()
+
+    async def run(self):
+        display.show_waiting(offline=self.offline())
+        while True:
+            self._changed.clear()
+            if self.state == IDLE:
+                await self._changed.wait()
+                continue
+            remaining = time.ticks_diff(self.deadline, time.ticks_ms())
+            if remaining <= 0:
+                self._expire()
+                continue
+            try:
+                # Aufwachen bei neuer Anzeige (neue Deadline) oder Ablauf
+                await asyncio.wait_for(self._changed.wait(), remaining / 1000)
+            except asyncio.TimeoutError:
+                pass
+
+class DoorClient:
+    """Zustand einer Tür: Verbindung, Warteschlangen, Tasks"""
+
+    def __init__(self, host, port, ssid=None, key=None):
+        self.host = host
+        self.port = port
+        self.ssid = ssid
+        self.key = key
+        self.reader = None
+        self.writer = None
+        self.write_lock = asyncio.Lock()
+        self.lost = asyncio.Event()      # Verbindung abgebrochen
+        self.pending = {}                # Request-ID -> [Event, (Typ, Payload) oder None]
+        self.receiving_list = False      # komplette Liste wird gerade empfangen
+        self.taps = Queue()              # (Personalnummer, ticks_us beim Lesen)
+        self.tap_filter = tap_filter.TapFilter()
+        self.feedback = Feedback(lambda: not self.online, lambda: self.log_ready("Warte-Bildschirm"))
+        self.shown_tap = None            # ticks_us der zuletzt angezeigten Karte, bis sie gemessen ist
+
+    @property
+    def online(self):
+        return self.writer is not None
+
+    @property
+    def mode(self):
+        return TCP_client.MODE_ONLINE if self.online else TCP_client.MODE_OFFLINE
+
+    # --- Verbindung ---
+
+    async def wlan_up(self):
+        """Stellt die WLAN-Verbindung ohne Scan wieder her (blockiert nicht)"""
+        try:
+            import network
+        except ImportError:
+            return True   # Test auf dem PC
+        wlan = network.WLAN()
+        if wlan.isconnected():
+            return True
+        if not self.ssid:
+            return False
+        print("[WLAN] Nicht verbunden - versuche Reconnect...")
+        try:
+            wlan.active(True)
+            wlan.connect(self.ssid, self.key)
+        except OSError as e:
+            print(f"[WLAN] Reconnect fehlgeschlagen: {e}")
+            return False
+        waited = 0
+        while not wlan.isconnected():
+            if waited >= WLAN_TIMEOUT:
+                print("[WLAN] Reconnect fehlgeschlagen: Timeout")
+                return False
+            await asyncio.sleep(0.2)
+            waited += 0.2
+        print(f"[WLAN] Verbunden! IP: {wlan.ifconfig()[0]}")
+        # RFID nach WLAN-Aktivität neu initialisieren (wie bisher)
+        rfid_reader.reset_and_init()
+        return True
+
+    async def connect(self):
+        """Verbindet zum Server und gleicht die lokale Liste ab"""
+        print(f"\n[VERBINDUNG] Versuche Verbindung zu {self.host}:{self.port}...")
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as e:
+            print(f"[VERBINDUNG] Server nicht erreichbar: {e!r}")
+            self.reader = self.writer = None
+            return False
+        self.lost.clear()
+        asyncio.create_task(self.receive_task())
+        try:
+            await self.sync_list()
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            print(f"[VERBINDUNG] Listenabgleich fehlgeschlagen: {e!r}")
+            self.disconnect()
+            return False
+        return True
+
+    def disconnect(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+        self.lost.set()
+        # Wartende Anfragen sofort aufwecken - ohne Antwort
+        for waiter in self.pending.values():
+            waiter[0].set()
+
+    async def request(self, frame, request_id, timeout):
+        """Sendet eine Anfrage und wartet, bis receive_task die Antwort zuordnet
+
+        Gibt (Typ, Payload) der Antwort zurück. OSError bei Verbindungsverlust,
+        TimeoutError wenn nach timeout Sekunden keine Antwort da ist.
+        """
+        waiter = [asyncio.Event(), None]
+        self.pending[request_id] = waiter
+        try:
+            async with self.write_lock:
+                if self.writer is None:
+                    raise OSError("Keine Verbindung")
+                self.writer.write(frame)
+                await self.writer.drain()
+            await asyncio.wait_for(waiter[0].wait(), timeout)
+        finally:
+            self.pending.pop(request_id, None)
+        if waiter[1] is None:
+            raise OSError("Verbindung verloren")
+        return waiter[1]
+
+    async def receive_task(self):
+        """Liest Frames, solange die Verbindung steht, und verteilt sie nach Typ"""
+        reader = self.reader
+        try:
+            while reader is self.reader:
+                msg_type, request_id, payload = await self.read_message(reader)
+                self.handle_list_frame(msg_type, payload)
+                waiter = self.pending.get(request_id)
+                if waiter is not None:
+                    waiter[1] = (msg_type, payload)
+                    waiter[0].set()
+                elif request_id != protocol.PUSH_REQUEST_ID:
+                    # Antwort auf eine bereits abgelaufene Anfrage
+                    print("[ONLINE] Verspätete Antwort verworfen: Typ", msg_type)
+        except (OSError, ValueError) as e:
+            if reader is self.reader:
+                print(f"[ONLINE] Verbindungsfehler: {e!r}")
+                self.disconnect()
+
+    async def read_message(self, reader):
+        """Liest den nächsten Frame - UPDATE_LIST geht dabei direkt in den Flash"""
+        msg_type, request_id, length = await protocol.read_header(reader)
+        if msg_type == protocol.MSG_UPDATE_LIST:
+            await self.receive_full_list(reader, length)
+            return msg_type, request_id, None
+        return msg_type, request_id, await protocol.read_payload(reader, length)
+
+    async def receive_full_list(self, reader, length):
+        """Wie TCP_client.receive_full_list, andere Tasks laufen zwischen den Blöcken weiter"""
+        version, list_hash = protocol.decode_list_info(
+            await protocol.read_exact(reader, protocol.LIST_INFO_SIZE))
+        remaining = length - protocol.LIST_INFO_SIZE
+        if remaining < 0 or remaining % 4:
+            raise OSError("UPDATE_LIST hat ungültige Länge")
+        buf = memoryview(bytearray(TCP_client.LIST_CHUNK_SIZE))
+        writer = eeprom_storage.begin_local_list(version, list_hash)
+        self.receiving_list = True
+        try:
+            while remaining:
+                chunk = buf[:min(remaining, len(buf))]
+                await protocol.read_into(reader, chunk)
+                writer.write_packed(chunk)
+                remaining -= len(chunk)
+            count = writer.commit()
+        except:
+            writer.abort()
+            raise
+        finally:
+            self.receiving_list = False
+        print("[ONLINE] Neue lokale Liste empfangen:", count, "Einträge, Version", version)
+
+    def handle_list_frame(self, msg_type, payload):
+        """Verarbeitet UPDATE_LIST, LIST_DELTA und LIST_CURRENT, gibt False bei anderen Typen"""
+        if msg_type == protocol.MSG_UPDATE_LIST:
+            # Schon beim Empfang gespeichert (read_message)
+            self.show_status(display.show_list_updated)
+        elif msg_type == protocol.MSG_LIST_DELTA:
+            version, list_hash, added, removed = protocol.decode_delta(payload)
+            print(f"[ONLINE] Listen-Delta v{version}: +{len(added)} -{len(removed)}")
+            if eeprom_storage.apply_delta(added, removed, version, list_hash):
+                self.show_status(display.show_list_updated)
+            else:
+                asyncio.create_task(self.request_full_list())
+        elif msg_type == protocol.MSG_LIST_CURRENT:
+            print("[ONLINE] Lokale Liste ist aktuell (v%d)" % protocol.decode_list_info(payload)[0])
+        else:
+            return False
+        return True
+
+    async def sync_list(self):
+        """Meldet den eigenen Listenstand, der Server schickt nur die Änderungen"""
+        version, list_hash = eeprom_storage.load_list_version()
+        request_id = protocol.next_request_id()
+        # Verarbeitet hat die Antwort schon receive_task
+        await self.request(protocol.encode_sync(version, list_hash, request_id), request_id, SYNC_TIMEOUT)
+
+    async def request_full_list(self):
+        """SYNC ohne Listenstand: der Server schickt die komplette Liste und setzt
+        seinen gemerkten Stand für diesen Client zurück"""
+        print("[ONLINE] Fordere komplette Liste an")
+        request_id = protocol.next_request_id()
+        try:
+            await self.request(protocol.encode_sync(None, None, request_id), request_id, SYNC_TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as e:
+            # Beim nächsten Verbindungsaufbau meldet der Client "Stand unbekannt"
+            print(f"[ONLINE] Komplette Liste nicht erhalten ({e!r})")
+
+    async def request_access(self, personalnummer):
+        """Fragt den Server, gibt True (ALLOW) oder False (DENY) zurück"""
+        request_id = protocol.next_request_id()
+        msg_type, payload = await self.request(protocol.encode_check(personalnummer, request_id),
+                                               request_id, ONLINE_TIMEOUT)
+        if msg_type == protocol.MSG_ALLOW:
+            return True
+        elif msg_type != protocol.MSG_DENY:
+            print("[ONLINE] Fehler vom Server:", bytes(payload))
+        return False
+
+    # --- Tasks ---
+
+    async def connection_task(self):
+        """Baut die Verbindung auf und nach einem Abbruch wieder auf"""
+        attempt = 0
+        while True:
+            if self.online:
+                await self.lost.wait()
+                print("[STATUS] Wechsle zu OFFLINE-Modus...")
+                self.show_status(display.show_offline_mode)
+                attempt = 0
+                continue
+            attempt += 1
+            if await self.wlan_up() and await self.connect():
+                print(f"[STATUS] Modus: {self.mode} - Verbunden mit Server")
+                self.show_status(display.show_reconnected)
+                continue
+            if attempt == MAX_CONNECT_RETRIES:
+                print(f"[STATUS] Modus: {self.mode} - Nutze lokale Liste aus EEPROM")
+                print(f"[INFO] Reconnect-Versuch alle {RECONNECT_INTERVAL} Sekunden")
+                self.show_status(display.show_offline_mode)
+            await asyncio.sleep(RETRY_DELAY if attempt < MAX_CONNECT_RETRIES else RECONNECT_INTERVAL)
+
+    async def card_task(self):
+        """Fragt den RFID-Leser ab - läuft auch während Anzeige und Netzwerk weiter"""
+        while True:
+            personalnummer = rfid_reader.read_uid()
+            # Liegende Karte nur einmal - andere Karten sofort
+            if personalnummer is None or not self.tap_filter.accept(personalnummer):
+                await asyncio.sleep(RFID_POLL_INTERVAL)
+                continue
+            self.log_ready("nächste Karte")
+            started = time.ticks_us()
+            self.taps.put((personalnummer, started))
+            print(f"\n[{self.mode}] RFID gelesen: {personalnummer}")
+            if NEXT_TAP_DELAY:
+                # Optionale feste Pause - die Anzeige läuft unabhängig davon weiter
+                await asyncio.sleep(NEXT_TAP_DELAY)
+
+    def log_ready(self, what):
+        """Gibt die Zeit von der letzten angezeigten Karte bis zur Bereitschaft aus (einmal pro Karte)"""
+        if self.shown_tap is None:
+            return
+        elapsed = time.ticks_diff(time.ticks_us(), self.shown_tap)
+        self.shown_tap = None
+        print("[ZEIT] Karte -> %s: %d ms" % (what, elapsed // 1000))
+
+    async def access_task(self):
+        while True:
+            personalnummer, started = await self.taps.get()
+            await self.decide(personalnummer, started)
+
+    async def decide(self, personalnummer, started):
+        """Entscheidet über eine Karte und zeigt das Ergebnis sofort an"""
+        allowed = None
+        source = "Server"
+        # Während eine komplette Liste ankommt, nicht warten - lokal entscheiden
+        if self.online and not self.receiving_list:
+            try:
+                allowed = await self.request_access(personalnummer)
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"[ONLINE] Keine Antwort vom Server ({e!r}) - entscheide lokal")
+                self.disconnect()
+        if allowed is None:
+            allowed = TCP_client.check_local_access(personalnummer)
+            source = "Lokal"
+        TCP_client.log_decision_time(started)
+        if allowed:
+            print(f">>> ZUGANG ERLAUBT ({source}) <<<")
+        else:
+            print(f">>> ZUGANG VERWEIGERT ({source}) <<<")
+        self.shown_tap = started
+        self.feedback.result(allowed)
+        return allowed
+
+    def show_status(self, show):
+        self.feedback.status(show)
+
+    async def run(self):
+        # Anzeigen warten nicht selbst - das übernimmt Feedback
+        display.BLOCKING = False
+        print("=" * 40)
+        print("  RFID-Zutrittskontrolle Client (asynchron)")
+        print("=" * 40)
+        print("[RFID] Initialisiere Reader...")
+        if not rfid_reader.init():
+            print("[RFID] WARNUNG: Reader konnte nicht initialisiert werden!")
+        display.show_connecting()
+        await asyncio.gather(self.connection_task(), self.card_task(),
+                             self.access_task(), self.feedback.run())
+
+def run(host, port, ssid=None, key=None):
+    """Startet den asynchronen Client (kehrt nicht zurück)"""
+    asyncio.run(DoorClient(host, port, ssid, key).run())
@@ -2,9 +2,11 @@
 import time
 import wlan_connect
 import TCP_client as client
+import client_async
 import tft_display as display
 import rfid_reader
 import eeprom_storage
+import tap_filter
 
 # Benötigte Daten - Hotspot Konfiguration
 ap_ssid = 'Alexxx'
@@ -17,6 +19,7 @@ server_port = 5050
 # Konfiguration
 MAX_WLAN_RETRIES = 3
 RECONNECT_INTERVAL = 60
+USE_ASYNC_CLIENT = True   # Tasks statt einer blockierenden Schleife (client_async.py)
 
 def try_wifi_connect():
     """Versucht WLAN-Verbindung mit Retry-Logik"""
@@ -36,14 +39,6 @@ def try_wifi_connect():
                 time.sleep(1)
     return None
 
-def check_local_access(personalnummer):
-    """Prüft Zugang gegen lokale EEPROM-Liste"""
-    local_list = eeprom_storage.load_local_list()
-    if not local_list:
-        print("[OFFLINE] Keine lokale Liste vorhanden - Zugang verweigert")
-        return False
-    return personalnummer in local_list
-
 def run_offline_mode():
     """Betreibt das System komplett offline (ohne WiFi)"""
     print("\n" + "=" * 40)
@@ -59,6 +54,7 @@ def run_offline_mode():
     display.show_waiting(offline=True)
     
     last_reconnect = time.time()
+    taps = tap_filter.TapFilter()
     
     print(f"[INFO] Reconnect-Versuch alle {RECONNECT_INTERVAL} Sekunden")
     
@@ -92,14 +88,18 @@ def run_offline_mode():
         # RFID-Karte lesen
         personalnummer = rfid_reader.read_uid()
         
-        if personalnummer is None:
+        # Liegende Karte nur einmal verarbeiten, andere Karten sofort
+        if personalnummer is None or not taps.accept(personalnummer):
             time.sleep(0.2)
             continue
         
+        started = time.ticks_us()
         print(f"\n[OFFLINE] RFID gelesen: {personalnummer}")
         
         # Zugang gegen lokale Liste prüfen
-        if check_local_access(personalnummer):
+        allowed = client.check_local_access(personalnummer)
+        client.log_decision_time(started)
+        if allowed:
             print(">>> ZUGANG ERLAUBT (Lokal) <<<")
             display.show_access_granted()
         else:
@@ -107,20 +107,33 @@ def run_offline_mode():
             display.show_access_denied()
         
         display.show_waiting(offline=True)
-        time.sleep(2)  # Pause um Mehrfachlesung zu vermeiden
+        # Während der Anzeige wurde nicht gelesen - Hold-off ab jetzt
+        taps.restart(personalnummer)
 
 def main():
     print("\n" + "=" * 40)
     print("  RFID-Zutrittskontrolle Startup")
     print("=" * 40)
     
+    # Lokale Liste öffnen - stellt nach einem Stromausfall den letzten Stand her
+    try:
+        eeprom_storage.open_store()
+    except Exception:
+        print("[EEPROM] WARNUNG: Lokale Liste nicht verfügbar")
+    
     # Zeige WLAN-Verbindungsstatus auf Display
     display.show_wlan_connecting()
     
     # WLAN-Verbindung mit 3 Versuchen
     wlan = try_wifi_connect()
     
-    if wlan:
+    if USE_ASYNC_CLIENT and client.USE_BINARY_PROTOCOL:
+        # Ohne WLAN startet der Client offline und verbindet sich im Hintergrund
+        if not wlan:
+            print("[STATUS] Kein WLAN - starte im Offline-Modus")
+            display.show_wlan_error()
+        client_async.run(server_ip, server_port, ap_ssid, ap_key)
+    elif wlan:
         # WLAN verbunden -> Starte TCP Client (wird Server-Verbindung versuchen)
         print("[STATUS] WLAN verbunden - starte Online-Modus")
         client.tcp_client(server_ip, server_port)
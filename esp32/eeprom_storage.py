@@ -1,49 +1,759 @@
 # EEPROM-ähnlicher Speicher für ESP32 (nutzt Flash-Dateisystem)
 # Speichert die lokale Zutrittsliste persistent
+#
+# Basisdatei (list_a.bin / list_b.bin):
+#   Header: Magic "ACL2" | Generation (u32) | Version (u32) | Hash (u64) |
+#           Anzahl (u32) | CRC32 der Daten (u32)
+#   danach die Personalnummern aufsteigend sortiert als u32 big-endian
+# Version und Hash stammen vom Server und werden beim nächsten SYNC
+# zurückgemeldet (0xFFFFFFFF = unbekannt). 50.000 Einträge sind 200 KB.
+#
+# Journal (list.journal): Header "ACJ1" + Generation der Basisdatei, danach
+# nur angehängte Datensätze:
+#   "+" UID (u32)   hinzugefügt
+#   "-" UID (u32)   entfernt
+#   "C" Version (u32) Hash (u64) CRC32 (u32) der Datensätze seit dem letzten "C"
+# Ein Delta vom Server kostet so nur ein kleines Anhängen statt die ganze
+# Liste neu zu schreiben. Nur Datensätze vor einem gültigen "C" zählen.
+#
+# Verdichten (und neue Gesamtliste): die Liste wird in die jeweils andere
+# Basisdatei geschrieben (Doppelpuffer) mit Generation + 1, danach ein neues
+# leeres Journal angelegt. Die alte Basisdatei bleibt bis zum nächsten Mal.
+#
+# Beim Start (Wiederherstellung nach Stromausfall):
+#   - gültig ist die Basisdatei mit der höchsten Generation, deren Länge und
+#     CRC stimmen - eine halb geschriebene fällt auf die andere zurück
+#   - ein Journal mit anderer Generation ist schon verdichtet und wird verworfen
+#   - ein abgeschnittenes Ende im Journal wird ignoriert, danach verdichtet
+#
+# Abfragen suchen binär in der Basisdatei (bis RAM_LIMIT Bytes im RAM,
+# sonst über die offene Datei im Flash) plus zwei kleinen Sets aus dem
+# Journal - ohne Strings anzulegen.
+#
+# Ältere Formate (local_list.bin ohne Doppelpuffer, local_list.json) werden
+# beim ersten Zugriff übernommen.
 
 import json
+import os
+import struct
 
-EEPROM_FILE = "local_list.json"
+try:
+    from binascii import crc32
+except ImportError:
+    crc32 = None
 
-def save_local_list(user_list):
-    """Speichert die Zutrittsliste im Flash-Speicher (EEPROM-Ersatz)"""
+SLOT_FILES = ("list_a.bin", "list_b.bin")
+JOURNAL_FILE = "list.journal"
+LEGACY_FILES = ("local_list.bin", "local_list.json")
+
+MAGIC = b"ACL2"
+HEADER_FORMAT = ">4sIIQII"
+HEADER_SIZE = 28
+JOURNAL_MAGIC = b"ACJ1"
+JOURNAL_HEADER_FORMAT = ">4sI"
+JOURNAL_HEADER_SIZE = 8
+OP_ADD = b"+"
+OP_REMOVE = b"-"
+OP_COMMIT = b"C"
+COMMIT_FORMAT = ">IQI"
+COMMIT_SIZE = 16
+NO_VERSION = 0xFFFFFFFF
+RAM_LIMIT = 32 * 1024      # bis 8192 Einträge komplett im RAM
+WRITE_BATCH = 64           # UIDs pro Schreib-/Lesevorgang
+COMPACT_RECORDS = 1024     # Journal-Einträge bis zum Verdichten (ca. 5 KB)
+
+def _checksum(data, value=0):
+    """CRC32 (falls binascii ihn kennt, sonst einfache Summe)"""
+    if crc32:
+        return crc32(data, value) & 0xFFFFFFFF
+    return (value + sum(data)) & 0xFFFFFFFF
+
+def _uid_int(uid):
+    return uid if isinstance(uid, int) else int(uid, 16)
+
+def _join(directory, name):
+    return directory + "/" + name if directory else name
+
+def _exists(path):
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class ListIndex:
+    """Sortierte, gepackte Basisdatei mit binärer Suche (im RAM oder direkt im Flash)"""
+
+    def __init__(self, path, ram_limit=RAM_LIMIT, verify=False):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            header = self._file.read(HEADER_SIZE)
+            if len(header) != HEADER_SIZE:
+                raise ValueError("Basisdatei ohne Header")
+            magic, self.generation, version, list_hash, count, check = struct.unpack(HEADER_FORMAT, header)
+            if magic != MAGIC:
+                raise ValueError("Ungültige Basisdatei")
+            if os.stat(path)[6] != HEADER_SIZE + 4 * count:
+                raise ValueError("Basisdatei unvollständig")
+            if verify and self._data_checksum(count) != check:
+                raise ValueError("Prüfsumme der Basisdatei falsch")
+        except:
+            self._file.close()
+            raise
+        self.version = None if version == NO_VERSION else version
+        self.hash = None if version == NO_VERSION else list_hash
+        self.count = count
+        self._buf = bytearray(4)
+        self.data = None
+        if count * 4 <= ram_limit:
+            self._file.seek(HEADER_SIZE)
+            self.data = self._file.read(count * 4)
+            self._file.close()
+            self._file = None
+
+    def _data_checksum(self, count):
+        check = 0
+        self._file.seek(HEADER_SIZE)
+        left = count * 4
+        while left:
+            chunk = self._file.read(min(left, 4 * WRITE_BATCH * 16))
+            if not chunk:
+                break
+            check = _checksum(chunk, check)
+            left -= len(chunk)
+        return check
+
+    def __len__(self):
+        return self.count
+
+    def _at(self, i):
+        if self.data is not None:
+            return struct.unpack_from(">I", self.data, i * 4)[0]
+        self._file.seek(HEADER_SIZE + i * 4)
+        self._file.readinto(self._buf)
+        return struct.unpack_from(">I", self._buf, 0)[0]
+
+    def __contains__(self, value):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            current = self._at(mid)
+            if current < value:
+                lo = mid + 1
+            elif current > value:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def values(self):
+        """Alle UIDs aufsteigend als Integer (blockweise gelesen)"""
+        if self.data is not None:
+            for i in range(self.count):
+                yield struct.unpack_from(">I", self.data, i * 4)[0]
+            return
+        with open(self.path, "rb") as f:
+            f.seek(HEADER_SIZE)
+            left = self.count
+            while left:
+                chunk = f.read(4 * min(left, WRITE_BATCH))
+                if not chunk:
+                    return
+                for i in range(0, len(chunk), 4):
+                    yield struct.unpack_from(">I", chunk, i)[0]
+                left -= len(chunk) // 4
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+class BaseWriter:
+    """Schreibt eine Basisdatei als Strom (fester Puffer, Speicherbedarf unabhängig von der Größe)
+
+    UIDs kommen entweder als int (add) oder schon gepackt als u32 big-endian
+    (write_packed, z. B. direkt aus dem Empfangspuffer). Sie müssen
+    aufsteigend sortiert und eindeutig sein.
+    """
+
+    def __init__(self, path, generation, version=None, list_hash=None):
+        self.path = path
+        self.generation = generation
+        self.version, self.hash = (NO_VERSION, 0) if version is None else (version, list_hash or 0)
+        self.count = 0
+        self._check = 0
+        self._last = -1
+        self._batch = bytearray(4 * WRITE_BATCH)
+        self._n = 0
+        self._file = open(path, "wb")
+        self._file.write(struct.pack(HEADER_FORMAT, MAGIC, 0, NO_VERSION, 0, 0, 0))
+
+    def add(self, value):
+        if value <= self._last:
+            raise ValueError("UIDs müssen aufsteigend sortiert und eindeutig sein")
+        self._last = value
+        struct.pack_into(">I", self._batch, self._n * 4, value)
+        self._n += 1
+        if self._n == WRITE_BATCH:
+            self._flush_batch()
+
+    def _flush_batch(self):
+        data = memoryview(self._batch)[:self._n * 4]
+        self._file.write(data)
+        self._check = _checksum(data, self._check)
+        self.count += self._n
+        self._n = 0
+
+    def write_packed(self, data):
+        """Übernimmt gepackte UIDs (Länge ein Vielfaches von 4)"""
+        if len(data) % 4:
+            raise ValueError("Gepackte UIDs müssen 4 Bytes lang sein")
+        if self._n:
+            self._flush_batch()
+        last = self._last
+        for i in range(0, len(data), 4):
+            value = struct.unpack_from(">I", data, i)[0]
+            if value <= last:
+                raise ValueError("UIDs müssen aufsteigend sortiert und eindeutig sein")
+            last = value
+        self._last = last
+        self._file.write(data)
+        self._check = _checksum(data, self._check)
+        self.count += len(data) // 4
+
+    def finish(self):
+        """Trägt Anzahl, Stand und Prüfsumme ein und schließt die Datei"""
+        if self._n:
+            self._flush_batch()
+        self._file.seek(0)
+        self._file.write(struct.pack(HEADER_FORMAT, MAGIC, self.generation, self.version,
+                                     self.hash, self.count, self._check))
+        self._file.close()
+        return self.count
+
+    def abort(self):
+        """Verwirft die halb geschriebene Datei"""
+        self._file.close()
+        _remove(self.path)
+
+def write_base_file(path, values, generation, version=None, list_hash=None):
+    """Schreibt aufsteigend sortierte, eindeutige UIDs (int) als Basisdatei"""
+    writer = BaseWriter(path, generation, version, list_hash)
+    try:
+        for value in values:
+            writer.add(value)
+    except:
+        writer.abort()
+        raise
+    return writer.finish()
+
+class ListWriter:
+    """Neue Gesamtliste, die beim Empfang direkt in die freie Basisdatei geht
+
+    Erst commit() schaltet auf die neue Liste um; bricht die Übertragung ab
+    (abort() oder Stromausfall), bleibt die bisherige Liste gültig.
+    """
+
+    def __init__(self, store, slot, generation, version, list_hash):
+        self.store = store
+        self.slot = slot
+        self.writer = BaseWriter(store.slots[slot], generation, version, list_hash)
+        self.add = self.writer.add
+        self.write_packed = self.writer.write_packed
+
+    def commit(self):
+        count = self.writer.finish()
+        self.store._activate(self.slot, self.writer.generation)
+        return count
+
+    def abort(self):
+        self.writer.abort()
+
+class ListStore:
+    """Basisdatei (Doppelpuffer) + Journal mit Wiederherstellung beim Öffnen"""
+
+    def __init__(self, directory="", ram_limit=RAM_LIMIT, compact_records=COMPACT_RECORDS):
+        self.slots = [_join(directory, name) for name in SLOT_FILES]
+        self.journal_path = _join(directory, JOURNAL_FILE)
+        self.directory = directory
+        self.ram_limit = ram_limit
+        self.compact_records = compact_records
+        self.base = None         # ListIndex oder None (keine Liste gespeichert)
+        self.added = set()       # seit der Basisdatei hinzugekommen (nicht in base)
+        self.removed = set()     # seit der Basisdatei entfernt (in base)
+        self.version = None
+        self.hash = None
+        self.records = 0         # Datensätze im Journal
+        self._journal = None
+        self._recover()
+
+    # --- Wiederherstellung ---
+
+    def _recover(self):
+        slot = None
+        for i, path in enumerate(self.slots):
+            try:
+                index = ListIndex(path, self.ram_limit, verify=True)
+            except (OSError, ValueError) as e:
+                if _exists(path):
+                    print("[EEPROM] Basisdatei", path, "verworfen:", e)
+                continue
+            if self.base is None or index.generation > self.base.generation:
+                if self.base is not None:
+                    self.base.close()
+                self.base, slot = index, i
+            else:
+                index.close()
+        self._slot = slot
+        if self.base is None:
+            self._migrate_legacy()
+            return
+        self.version, self.hash = self.base.version, self.base.hash
+        if not self._replay():
+            print("[EEPROM] Journal mit abgeschnittenem Ende - verdichte")
+            self.compact()
+
+    def _replay(self):
+        """Spielt das Journal ein, False wenn das Ende unvollständig war"""
+        try:
+            f = open(self.journal_path, "rb")
+        except OSError:
+            self._reset_journal()
+            return True
+        clean = True
+        with f:
+            header = f.read(JOURNAL_HEADER_SIZE)
+            if len(header) != JOURNAL_HEADER_SIZE or \
+                    struct.unpack(JOURNAL_HEADER_FORMAT, header) != (JOURNAL_MAGIC, self.base.generation):
+                # Journal gehört zu einer älteren (schon verdichteten) Basisdatei
+                f.close()
+                self._reset_journal()
+                return True
+            pending = []
+            check = 0
+            while True:
+                op = f.read(1)
+                if not op:
+                    break
+                if op == OP_ADD or op == OP_REMOVE:
+                    body = f.read(4)
+                    if len(body) != 4:
+                        clean = False
+                        break
+                    pending.append((op, struct.unpack(">I", body)[0]))
+                    check = _checksum(op + body, check)
+                elif op == OP_COMMIT:
+                    body = f.read(COMMIT_SIZE)
+                    if len(body) != COMMIT_SIZE:
+                        clean = False
+                        break
+                    version, list_hash, expected = struct.unpack(COMMIT_FORMAT, body)
+                    if expected != check:
+                        clean = False
+                        break
+                    for record in pending:
+                        self._apply_record(*record)
+                    self.records += len(pending)
+                    self._set_version(version, list_hash)
+                    pending = []
+                    check = 0
+                else:
+                    clean = False
+                    break
+            if pending:
+                clean = False
+        if clean:
+            self._journal = open(self.journal_path, "ab")
+        return clean
+
+    def _migrate_legacy(self):
+        """Übernimmt eine Liste in einem älteren Format (falls vorhanden)"""
+        old_bin, old_json = (_join(self.directory, name) for name in LEGACY_FILES)
+        try:
+            if _exists(old_bin):
+                with open(old_bin, "rb") as f:
+                    magic, version, list_hash, count = struct.unpack(">4sIQI", f.read(20))
+                    data = f.read(4 * count)
+                values = [struct.unpack_from(">I", data, i)[0] for i in range(0, len(data), 4)]
+                version = None if version == NO_VERSION else version
+                old = old_bin
+            elif _exists(old_json):
+                with open(old_json, "r") as f:
+                    data = json.load(f)
+                if isinstance(data, list):
+                    # Ganz altes Format ohne Version
+                    data = {"version": None, "hash": None, "uids": data}
+                values = sorted(set(_uid_int(uid) for uid in data["uids"]))
+                version, list_hash = data.get("version"), data.get("hash")
+                old = old_json
+            else:
+                return
+        except Exception as e:
+            print("[EEPROM] Alte Liste nicht lesbar:", e)
+            return
+        self.replace(values, version, list_hash)
+        os.remove(old)
+        print("[EEPROM] Alte Liste übernommen:", len(values), "Einträge")
+
+    # --- Zustand im RAM ---
+
+    def _set_version(self, version, list_hash):
+        self.version = None if version == NO_VERSION else version
+        self.hash = None if version == NO_VERSION else list_hash
+
+    def _apply_record(self, op, value):
+        if op == OP_ADD:
+            if value in self.removed:
+                self.removed.discard(value)
+            elif value not in self.base:
+                self.added.add(value)
+        else:
+            if value in self.added:
+                self.added.discard(value)
+            elif value in self.base:
+                self.removed.add(value)
+
+    def __contains__(self, value):
+        if value in self.added:
+            return True
+        if value in self.removed or self.base is None:
+            return False
+        return value in self.base
+
+    def __len__(self):
+        if self.base is None:
+            return 0
+        return len(self.base) + len(self.added) - len(self.removed)
+
+    def values(self):
+        """Alle UIDs aufsteigend: Basisdatei und Journal zusammengeführt, als Strom"""
+        if self.base is None:
+            return
+        extra = sorted(self.added)
+        removed = self.removed
+        i = 0
+        for value in self.base.values():
+            while i < len(extra) and extra[i] < value:
+                yield extra[i]
+                i += 1
+            if value not in removed:
+                yield value
+        while i < len(extra):
+            yield extra[i]
+            i += 1
+
+    # --- Schreiben ---
+
+    def _reset_journal(self):
+        """Legt ein leeres Journal für die aktuelle Basisdatei an"""
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+        if self.base is None:
+            _remove(self.journal_path)
+            return
+        with open(self.journal_path, "wb") as f:
+            f.write(struct.pack(JOURNAL_HEADER_FORMAT, JOURNAL_MAGIC, self.base.generation))
+        self._journal = open(self.journal_path, "ab")
+
+    def _next_slot(self):
+        """(freie Basisdatei, nächste Generation)"""
+        slot = 0 if self._slot is None else 1 - self._slot
+        return slot, (self.base.generation + 1 if self.base is not None else 1)
+
+    def _activate(self, slot, generation):
+        """Schaltet auf die fertig geschriebene Basisdatei slot um"""
+        if self.base is not None and self.base.generation >= generation:
+            raise ValueError("Liste wurde während des Schreibens geändert")
+        # Ab hier gilt die neue Datei (höhere Generation) - auch nach einem Absturz
+        if self.base is not None:
+            self.base.close()
+        self.base = ListIndex(self.slots[slot], self.ram_limit)
+        self._slot = slot
+        self.added = set()
+        self.removed = set()
+        self.records = 0
+        self.version, self.hash = self.base.version, self.base.hash
+        self._reset_journal()
+
+    def _install(self, values, version, list_hash):
+        """Schreibt values in die freie Basisdatei und schaltet auf sie um"""
+        slot, generation = self._next_slot()
+        count = write_base_file(self.slots[slot], values, generation, version, list_hash)
+        self._activate(slot, generation)
+        return count
+
+    def begin_replace(self, version=None, list_hash=None):
+        """Neue Gesamtliste als Strom schreiben (siehe ListWriter)"""
+        slot, generation = self._next_slot()
+        return ListWriter(self, slot, generation, version, list_hash)
+
+    def replace(self, values, version=None, list_hash=None):
+        """Ersetzt die ganze Liste (values aufsteigend sortiert, eindeutig)"""
+        return self._install(values, version, list_hash)
+
+    def apply(self, added, removed, version=None, list_hash=None):
+        """Hängt ein Delta ans Journal an (ein Schreibvorgang), gibt (hinzu, entfernt) zurück"""
+        if self.base is None:
+            # Noch keine Basisdatei - Delta ist die ganze Liste
+            self.replace(sorted(set(added)), version, list_hash)
+            return len(self), 0
+        present = {}   # Zustand nach den bisherigen Einträgen dieses Deltas
+        records = bytearray()
+        n_added = n_removed = 0
+        for value in removed:
+            if present[value] if value in present else value in self:
+                records += OP_REMOVE + struct.pack(">I", value)
+                present[value] = False
+                n_removed += 1
+        for value in added:
+            if not (present[value] if value in present else value in self):
+                records += OP_ADD + struct.pack(">I", value)
+                present[value] = True
+                n_added += 1
+        if version is None:
+            version, list_hash = NO_VERSION, 0
+        # Ein Schreibvorgang: Datensätze + Abschluss mit Prüfsumme
+        commit = OP_COMMIT + struct.pack(COMMIT_FORMAT, version, list_hash or 0, _checksum(records))
+        self._journal.write(records + commit)
+        self._journal.flush()
+        for i in range(0, len(records), 5):
+            self._apply_record(records[i:i + 1], struct.unpack_from(">I", records, i + 1)[0])
+        self.records += len(records) // 5
+        self._set_version(version, list_hash)
+        if self.records >= self.compact_records:
+            self.compact()
+        return n_added, n_removed
+
+    def compact(self):
+        """Schreibt Basisdatei und Journal zu einer neuen Basisdatei zusammen (Doppelpuffer)"""
+        version = NO_VERSION if self.version is None else self.version
+        # values() liest die alte Basisdatei, geschrieben wird in die andere
+        self._install(self.values(), version, self.hash)
+
+    def clear(self):
+        """Löscht Basisdateien und Journal"""
+        self.close()
+        for path in self.slots + [self.journal_path]:
+            _remove(path)
+        self.base = None
+        self._slot = None
+        self.added = set()
+        self.removed = set()
+        self.version = self.hash = None
+        self.records = 0
+
+    def close(self):
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+        if self.base is not None:
+            self.base.close()
+
+_store = None   # geöffneter Speicher, None = noch nicht geladen
+
+def open_store():
+    """Öffnet den Speicher (mit Wiederherstellung) beim ersten Aufruf"""
+    global _store
+    if _store is None:
+        try:
+            _store = ListStore()
+            print("[EEPROM] Liste geöffnet:", len(_store), "Einträge, Version", _store.version,
+                  "(%d im Journal)" % _store.records)
+        except Exception as e:
+            print("[EEPROM] Fehler beim Laden:", e)
+            raise
+    return _store
+
+def invalidate_cache():
+    """Schließt den Speicher, der nächste Zugriff liest den Flash neu"""
+    global _store
+    if _store is not None:
+        _store.close()
+    _store = None
+
+def save_local_list(user_list, version=None, list_hash=None):
+    """Speichert eine komplette Zutrittsliste im Flash-Speicher (EEPROM-Ersatz)"""
     try:
-        with open(EEPROM_FILE, "w") as f:
-            json.dump(user_list, f)
-        print("[EEPROM] Liste gespeichert:", user_list)
+        count = open_store().replace(sorted(set(_uid_int(uid) for uid in user_list)), version, list_hash)
+        print("[EEPROM] Liste gespeichert:", count, "Einträge, Version", version)
         return True
     except Exception as e:
         print("[EEPROM] Fehler beim Speichern:", e)
+        invalidate_cache()
         return False
 
+def begin_local_list(version=None, list_hash=None):
+    """Startet eine neue Gesamtliste, die in Blöcken geschrieben wird
+
+    writer.write_packed(bytes) / writer.add(int), danach writer.commit()
+    oder writer.abort() - der Speicherbedarf hängt nicht von der Listengröße ab.
+    """
+    return open_store().begin_replace(version, list_hash)
+
 def load_local_list():
-    """Lädt die Zutrittsliste aus dem Flash-Speicher"""
-    try:
-        with open(EEPROM_FILE, "r") as f:
-            user_list = json.load(f)
-        print("[EEPROM] Liste geladen:", user_list)
-        return user_list
-    except OSError:
-        # Datei existiert noch nicht
+    """Lädt die Zutrittsliste aus dem Flash-Speicher (als Personalnummern)"""
+    store = open_store()
+    if store.base is None:
         print("[EEPROM] Keine gespeicherte Liste gefunden")
         return []
+    return ["%08X" % value for value in store.values()]
+
+def load_list_version():
+    """Gibt (Version, Hash) der gespeicherten Liste zurück, (None, None) falls unbekannt"""
+    try:
+        store = open_store()
+    except Exception:
+        return None, None
+    return store.version, store.hash
+
+def apply_delta(added, removed, version, list_hash):
+    """Wendet Änderungen vom Server an (Anhängen ans Journal)
+
+    Gibt False zurück, wenn das Delta nicht gespeichert werden konnte oder
+    nicht zum lokalen Stand passt (z. B. nach einem verlorenen Delta) - dann
+    muss die komplette Liste neu geholt werden.
+    """
+    try:
+        store = open_store()
+        n_added, n_removed = store.apply([_uid_int(uid) for uid in added],
+                                         [_uid_int(uid) for uid in removed],
+                                         version, list_hash)
+        print("[EEPROM] Delta gespeichert: +%d -%d, Version %s" % (n_added, n_removed, version))
+        # Jede UID des Deltas muss wirken: schon vorhanden bzw. schon entfernt
+        # heißt, die lokale Liste war nicht auf dem Stand, den der Server annimmt
+        if (n_added, n_removed) != (len(added), len(removed)) or \
+                (store.version, store.hash) != (version, list_hash):
+            print("[EEPROM] Delta passt nicht zur lokalen Liste - Stand unbekannt")
+            store.apply((), ())   # Version unbekannt - der nächste Abgleich holt alles
+            return False
+        return True
     except Exception as e:
-        print("[EEPROM] Fehler beim Laden:", e)
-        return []
+        print("[EEPROM] Fehler beim Speichern:", e)
+        invalidate_cache()
+        return False
 
 def check_local_access(personalnummer):
     """Prüft ob Personalnummer in lokaler Liste (für Offline-Betrieb)"""
-    local_list = load_local_list()
-    if personalnummer in local_list:
-        return True
-    return False
+    try:
+        return int(personalnummer, 16) in open_store()
+    except Exception:
+        return False
+
+def local_list_size():
+    """Anzahl der Einträge der lokalen Liste"""
+    try:
+        return len(open_store())
+    except Exception:
+        return 0
 
 def clear_local_list():
     """Löscht die gespeicherte Liste"""
     try:
-        import os
-        os.remove(EEPROM_FILE)
+        open_store().clear()
         print("[EEPROM] Liste gelöscht")
         return True
     except:
         return False
+
+def _timer():
+    import time
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us, time.ticks_diff
+    return (lambda: int(time.perf_counter() * 1000000)), (lambda a, b: a - b)
+
+def benchmark(entries=50000, taps=500, deltas=20):
+    """Misst Abfragen und Deltas: ganze Datei neu schreiben vs. Journal anhängen
+
+    Läuft auf dem ESP32 (ticks_us) und auf dem PC (perf_counter).
+    Achtung: überschreibt die gespeicherte Liste.
+    """
+    now, diff = _timer()
+    values = sorted(set(i * 2654435761 & 0xFFFFFFFF for i in range(entries)))
+    probes = [values[i * 7 % len(values)] if i % 2 else i for i in range(taps)]
+
+    def measure(fn, items):
+        started = now()
+        for item in items:
+            fn(item)
+        return diff(now(), started) / len(items)
+
+    clear_local_list()
+    invalidate_cache()
+    store = open_store()
+    store.replace(values, 1, 0)
+    print("Basisdatei: %d Bytes" % os.stat(store.slots[store._slot])[6])
+    for name, ram_limit in (("RAM", entries * 4), ("Flash", 0)):
+        index = ListIndex(store.slots[store._slot], ram_limit)
+        print("Binärsuche %-5s:           %8.0f µs" % (name, measure(lambda v: v in index, probes)))
+        index.close()
+
+    # Bisher: jedes Delta schreibt die komplette Liste neu
+    print("Delta durch Neuschreiben:   %8.0f µs" % measure(
+        lambda i: write_base_file("bench.tmp", values, 1, 2 + i, 0), range(3)))
+    _remove("bench.tmp")
+    version = [2]
+
+    def delta(i):
+        version[0] += 1
+        store.apply([0xFFFFFF00 - i], [values[i]], version[0], 0)
+    print("Delta ins Journal:          %8.0f µs" % measure(delta, range(deltas)))
+    print("Abfrage mit Journal:        %8.0f µs" % measure(lambda v: v in store, probes))
+    started = now()
+    store.compact()
+    print("Verdichten:                 %8.0f µs" % diff(now(), started))
+    clear_local_list()
+
+def recovery_test():
+    """Simuliert Stromausfälle an den kritischen Stellen und prüft die Wiederherstellung"""
+    clear_local_list()
+    invalidate_cache()
+    store = ListStore(compact_records=1000000)
+    store.replace([1, 2, 3], 1, 11)
+    store.apply([4], [1], 2, 22)
+    expected = [2, 3, 4]
+
+    # 1. Abgeschnittener Datensatz am Ende des Journals
+    store.close()
+    with open(store.journal_path, "ab") as f:
+        f.write(OP_ADD + b"\x00\x00")
+    store = ListStore()
+    assert list(store.values()) == expected and store.version == 2, "abgeschnittenes Journal"
+
+    # 2. Delta ohne Abschluss (Strom weg vor dem "C")
+    store.close()
+    with open(store.journal_path, "ab") as f:
+        f.write(OP_ADD + struct.pack(">I", 99))
+    store = ListStore()
+    assert 99 not in store and store.version == 2, "Delta ohne Abschluss"
+
+    # 3. Halb geschriebene neue Basisdatei beim Verdichten
+    slot = 1 - store._slot
+    store.close()
+    with open(store.slots[slot], "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, 99, 5, 0, 1000, 0) + b"\x00" * 40)
+    store = ListStore()
+    assert list(store.values()) == expected and store.version == 2, "halbe Basisdatei"
+
+    # 4. Neue Basisdatei fertig, Journal noch das alte (gehört zur alten Generation)
+    old_journal = open(store.journal_path, "rb").read()
+    store.compact()
+    store.close()
+    with open(store.journal_path, "wb") as f:
+        f.write(old_journal)
+    store = ListStore()
+    assert list(store.values()) == expected and store.version == 2, "altes Journal nach Verdichten"
+
+    store.clear()
+    print("Wiederherstellung: alle 4 Fälle OK")
+
+if __name__ == "__main__":
+    recovery_test()
+    benchmark()
@@ -0,0 +1,199 @@
+# Bildspeicher für das ST7735-Display (RGB565 im RAM)
+#
+# Die Anzeige-Funktionen zeichnen zuerst hier hinein, flush() schickt danach
+# nur geänderte Zeilen zum Display. Direkt gezeichnet geht jedes clear() mit
+# dem ganzen Bildschirm über SPI und jede Schrift in Größe 2 mit einem
+# eigenen Fenster (CASET/RASET/RAMWR) pro Pixel.
+#
+# Zeichenfunktionen merken sich die berührten Rechtecke. flush() prüft nur
+# deren Zeilen: pro Zeile ist die CRC32 des zuletzt gesendeten Inhalts
+# gespeichert (160 Zahlen statt eines zweiten Bildspeichers mit 40 KB).
+# Geänderte Zeilen werden zu Bändern zusammengefasst (Lücken bis MERGE_GAP
+# Zeilen werden mitgeschickt), jedes Band ist ein Fenster, das direkt aus
+# dem Puffer geschrieben wird - ohne Kopie.
+#
+# Schnittstelle wie TFT (fill, fillrect, text, char), damit tft_display mit
+# und ohne Bildspeicher gleich zeichnet.
+
+from binascii import crc32
+
+MERGE_GAP = 2        # so viele unveränderte Zeilen werden mitgesendet statt ein neues Fenster
+MAX_DIRTY = 16       # mehr Rechtecke werden zu einem zusammengefasst
+
+class ScreenBuffer:
+    """RGB565-Bildspeicher (Big-Endian wie das Display) mit Dirty-Rechtecken"""
+
+    def __init__(self, tft):
+        self.tft = tft
+        self.width, self.height = tft.size()
+        self.stride = self.width * 2
+        self.buf = bytearray(self.stride * self.height)
+        self.mv = memoryview(self.buf)
+        self._sent = [None] * self.height    # CRC32 je Zeile auf dem Display, None = unbekannt
+        self._dirty = []                     # (x0, y0, x1, y1) inklusive
+
+    def size(self):
+        return (self.width, self.height)
+
+    def _mark(self, x0, y0, x1, y1):
+        dirty = self._dirty
+        dirty.append((x0, y0, x1, y1))
+        if len(dirty) > MAX_DIRTY:
+            self._dirty = [(min(r[0] for r in dirty), min(r[1] for r in dirty),
+                            max(r[2] for r in dirty), max(r[3] for r in dirty))]
+
+    def _block(self, x, y, w, h, pixel):
+        """Füllt ein Rechteck mit einer Farbe (2 Bytes), abgeschnitten am Rand"""
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return False
+        row = pixel * (x1 - x0)
+        buf = self.buf
+        start = y0 * self.stride + 2 * x0
+        end = start + len(row)
+        for _ in range(y1 - y0):
+            buf[start:end] = row
+            start += self.stride
+            end += self.stride
+        return True
+
+    def fill(self, aColor=0):
+        self.fillrect((0, 0), (self.width, self.height), aColor)
+
+    def fillrect(self, aStart, aSize, aColor):
+        x, y = aStart
+        w, h = aSize
+        if self._block(x, y, w, h, bytes((aColor >> 8 & 0xFF, aColor & 0xFF))):
+            self._mark(max(x, 0), max(y, 0), min(x + w, self.width) - 1, min(y + h, self.height) - 1)
+
+    def text(self, aPos, aString, aColor, aFont, aSize=1, nowrap=False, aBackground=None):
+        """Wie TFT.text, inklusive Zeilenumbruch am rechten Rand"""
+        if aFont is None:
+            return
+        if type(aSize) == int or type(aSize) == float:
+            wh = (aSize, aSize)
+        else:
+            wh = aSize
+        px, py = aPos
+        width = wh[0] * aFont["Width"] + 1
+        for c in aString:
+            self.char((px, py), c, aColor, aFont, wh, aBackground)
+            px += width
+            if px + width > self.width:
+                if nowrap:
+                    break
+                py += aFont["Height"] * wh[1] + 1
+                px = aPos[0]
+
+    def char(self, aPos, aChar, aColor, aFont, aSizes, aBackground=None):
+        """Wie TFT.char: Größe 1 mit schwarzem Hintergrund, sonst aBackground oder nur gesetzte Pixel"""
+        if aFont is None:
+            return
+        ci = ord(aChar)
+        if not aFont["Start"] <= ci <= aFont["End"]:
+            return
+        fontw = aFont["Width"]
+        fonth = aFont["Height"]
+        ci = (ci - aFont["Start"]) * fontw
+        columns = aFont["Data"][ci:ci + fontw]
+        sx, sy = aSizes
+        x, y = aPos
+        pixel = bytes((aColor >> 8 & 0xFF, aColor & 0xFF))
+        if sx <= 1 and sy <= 1:
+            sx = sy = 1
+            self._block(x, y, fontw, fonth, b"\x00\x00")
+        elif aBackground is not None and self.tft._fits(aPos, fontw * sx, fonth * sy):
+            # Fertige Glyphe aus dem Cache des Treibers Zeile für Zeile kopieren
+            key = (id(aFont), ci, sx, sy, aColor, aBackground)
+            glyph = self.tft._glyph(key, columns, fonth, aSizes, aColor, aBackground)
+            length = 2 * fontw * sx
+            start = y * self.stride + 2 * x
+            for offset in range(0, len(glyph), length):
+                self.buf[start:start + length] = glyph[offset:offset + length]
+                start += self.stride
+            self._mark(x, y, x + fontw * sx - 1, y + fonth * sy - 1)
+            return
+        elif aBackground is not None:
+            self._block(x, y, fontw * sx, fonth * sy, bytes((aBackground >> 8 & 0xFF, aBackground & 0xFF)))
+        for q in range(fontw):
+            c = columns[q]
+            r = 0
+            while c:
+                if c & 1:
+                    # Senkrechte Folge gesetzter Pixel als ein Rechteck
+                    run = 0
+                    while c & 1:
+                        run += 1
+                        c >>= 1
+                    self._block(x + q * sx, y + r * sy, sx, run * sy, pixel)
+                    r += run
+                else:
+                    c >>= 1
+                    r += 1
+        x1 = min(x + fontw * sx, self.width) - 1
+        y1 = min(y + fonth * sy, self.height) - 1
+        if x1 >= max(x, 0) and y1 >= max(y, 0):
+            self._mark(max(x, 0), max(y, 0), x1, y1)
+
+    def invalidate(self):
+        """Display-Inhalt unbekannt (z. B. direkt gezeichnet) - nächstes flush sendet alles"""
+        self._sent = [None] * self.height
+        self._mark(0, 0, self.width - 1, self.height - 1)
+
+    def flush(self):
+        """Sendet geänderte Zeilen, gibt die Zahl der SPI-Fenster zurück"""
+        if not self._dirty:
+            return 0
+        width = self.width
+        lo = [width] * self.height
+        hi = [-1] * self.height
+        for x0, y0, x1, y1 in self._dirty:
+            for y in range(y0, y1 + 1):
+                if x0 < lo[y]:
+                    lo[y] = x0
+                if x1 > hi[y]:
+                    hi[y] = x1
+        self._dirty = []
+
+        # Geänderte Zeilen zu Bändern zusammenfassen: [y0, y1, x0, x1]
+        bands = []
+        mv = self.mv
+        stride = self.stride
+        for y in range(self.height):
+            if hi[y] < 0:
+                continue
+            sig = crc32(mv[y * stride:(y + 1) * stride])
+            if sig == self._sent[y]:
+                continue
+            self._sent[y] = sig
+            band = bands[-1] if bands else None
+            if band and y - band[1] <= MERGE_GAP + 1:
+                band[1] = y
+                band[2] = min(band[2], lo[y])
+                band[3] = max(band[3], hi[y])
+            else:
+                bands.append([y, y, lo[y], hi[y]])
+        for y0, y1, x0, x1 in bands:
+            self._send(y0, y1, x0, x1)
+        return len(bands)
+
+    def _send(self, y0, y1, x0, x1):
+        tft = self.tft
+        mv = self.mv
+        stride = self.stride
+        if x0 == 0 and x1 == self.width - 1:
+            # Volle Breite: Zeilen liegen am Stück im Puffer
+            tft.image(0, y0, x1, y1, mv[y0 * stride:(y1 + 1) * stride])
+            return
+        tft._setwindowloc((x0, y0), (x1, y1))
+        tft.dc(1)
+        tft.cs(0)
+        start = y0 * stride + 2 * x0
+        length = 2 * (x1 - x0 + 1)
+        for _ in range(y1 - y0 + 1):
+            tft.spi.write(mv[start:start + length])
+            start += stride
+        tft.cs(1)
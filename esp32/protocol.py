@@ -0,0 +1,151 @@
+# Binäres Übertragungsprotokoll - Client-Seite (MicroPython)
+# Gleiches Frame-Format wie protocol.py auf dem Server:
+#   Marker (u8, 0xAC) | Typ (u8) | Request-ID (u16) | Payload-Länge (u32)
+# UIDs werden als u32 big-endian übertragen.
+# Listen-Frames (UPDATE_LIST, LIST_DELTA, LIST_CURRENT) beginnen mit
+# LIST_INFO = Version (u32) + Inhalts-Hash (u64).
+
+import struct
+
+MARKER = 0xAC
+HEADER_FORMAT = ">BBHI"
+HEADER_SIZE = 8
+LIST_INFO_FORMAT = ">IQ"
+LIST_INFO_SIZE = 12
+DELTA_INFO_FORMAT = ">IQI"
+DELTA_INFO_SIZE = 16
+MAX_PAYLOAD = 1024 * 1024   # Mehr passt ohnehin nicht in den RAM des ESP32
+
+MSG_CHECK = 0x01
+MSG_ALLOW = 0x02
+MSG_DENY = 0x03
+MSG_UPDATE_LIST = 0x04
+MSG_SYNC = 0x05
+MSG_LIST_DELTA = 0x06
+MSG_LIST_CURRENT = 0x07
+MSG_ERROR = 0x7F
+
+PUSH_REQUEST_ID = 0
+
+_next_request_id = 0
+
+def next_request_id():
+    """Liefert die nächste Request-ID (1..65535, 0 ist für Push-Nachrichten reserviert)"""
+    global _next_request_id
+    _next_request_id = _next_request_id % 0xFFFF + 1
+    return _next_request_id
+
+def uid_to_bytes(uid):
+    """Wandelt eine Personalnummer (8 Hex-Zeichen) in 4 Bytes um"""
+    return struct.pack(">I", int(uid, 16))
+
+def encode_frame(msg_type, request_id, payload=b""):
+    return struct.pack(HEADER_FORMAT, MARKER, msg_type, request_id, len(payload)) + payload
+
+def encode_check(uid, request_id):
+    """Baut eine Zutrittsanfrage für eine Personalnummer"""
+    return encode_frame(MSG_CHECK, request_id, uid_to_bytes(uid))
+
+def encode_sync(version, list_hash, request_id):
+    """Meldet den eigenen Listenstand, ohne Stand wird die ganze Liste angefordert"""
+    if version is None:
+        return encode_frame(MSG_SYNC, request_id)
+    return encode_frame(MSG_SYNC, request_id, struct.pack(LIST_INFO_FORMAT, version, list_hash))
+
+def recv_exact(sock, size):
+    """Liest genau size Bytes, egal wie TCP die Daten segmentiert"""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1024))
+        if not chunk:
+            raise OSError("Verbindung verloren")
+        buf.extend(chunk)
+    return buf
+
+def recv_into_exact(sock, buf):
+    """Füllt buf (memoryview) komplett aus dem Socket - ohne neue Objekte pro Block"""
+    read_into = getattr(sock, "readinto", None) or sock.recv_into
+    got = 0
+    while got < len(buf):
+        n = read_into(buf[got:])
+        if not n:
+            raise OSError("Verbindung verloren")
+        got += n
+
+def recv_header(sock):
+    """Liest einen Frame-Header und gibt (Typ, Request-ID, Payload-Länge) zurück"""
+    marker, msg_type, request_id, length = struct.unpack(HEADER_FORMAT, recv_exact(sock, HEADER_SIZE))
+    if marker != MARKER:
+        raise OSError("Ungültiger Frame-Marker")
+    return msg_type, request_id, length
+
+def recv_payload(sock, length):
+    """Liest die Payload eines Frames komplett in den RAM"""
+    if length > MAX_PAYLOAD:
+        raise OSError("Frame zu groß: " + str(length))
+    return recv_exact(sock, length) if length else b""
+
+def recv_frame(sock):
+    """Liest einen kompletten Frame und gibt (Typ, Request-ID, Payload) zurück"""
+    msg_type, request_id, length = recv_header(sock)
+    return msg_type, request_id, recv_payload(sock, length)
+
+# Asynchrone Varianten für asyncio-Streams (client_async.py)
+
+async def read_into(reader, buf):
+    """Füllt buf (memoryview) komplett aus einem StreamReader"""
+    if not hasattr(reader, "readinto"):
+        # CPython-asyncio kennt kein readinto
+        try:
+            buf[:] = await reader.readexactly(len(buf))
+        except EOFError:
+            raise OSError("Verbindung verloren")
+        return
+    got = 0
+    while got < len(buf):
+        n = await reader.readinto(buf[got:])
+        if not n:
+            raise OSError("Verbindung verloren")
+        got += n
+
+async def read_exact(reader, size):
+    buf = bytearray(size)
+    if size:
+        await read_into(reader, memoryview(buf))
+    return buf
+
+async def read_header(reader):
+    """Liest einen Frame-Header und gibt (Typ, Request-ID, Payload-Länge) zurück"""
+    marker, msg_type, request_id, length = struct.unpack(HEADER_FORMAT, await read_exact(reader, HEADER_SIZE))
+    if marker != MARKER:
+        raise OSError("Ungültiger Frame-Marker")
+    return msg_type, request_id, length
+
+async def read_payload(reader, length):
+    """Liest die Payload eines Frames komplett in den RAM"""
+    if length > MAX_PAYLOAD:
+        raise OSError("Frame zu groß: " + str(length))
+    return await read_exact(reader, length)
+
+def decode_uid_list(payload, start=0, end=None):
+    """Wandelt gepackte u32 UIDs in Personalnummern (Hex-Strings) um"""
+    if end is None:
+        end = len(payload)
+    return ["%08X" % struct.unpack_from(">I", payload, i)[0] for i in range(start, end, 4)]
+
+def decode_list_info(payload):
+    """Liest (Version, Hash) vom Anfang eines Listen-Frames"""
+    return struct.unpack_from(LIST_INFO_FORMAT, payload, 0)
+
+def decode_full_list(payload):
+    """Zerlegt UPDATE_LIST in (Version, Hash, Personalnummern)"""
+    version, list_hash = decode_list_info(payload)
+    return version, list_hash, decode_uid_list(payload, LIST_INFO_SIZE)
+
+def decode_delta(payload):
+    """Zerlegt LIST_DELTA in (Version, Hash, hinzugefügt, entfernt)"""
+    version, list_hash, n_added = struct.unpack_from(DELTA_INFO_FORMAT, payload, 0)
+    split = DELTA_INFO_SIZE + 4 * n_added
+    return (version, list_hash,
+            decode_uid_list(payload, DELTA_INFO_SIZE, split),
+            decode_uid_list(payload, split))
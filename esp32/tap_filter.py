@@ -0,0 +1,65 @@
+# Filter für Mehrfachlesungen derselben Karte
+#
+# Eine aufgelegte Karte meldet der Leser bei jedem Poll erneut. Statt nach
+# jeder Karte pauschal zu warten (das sperrt auch die nächste Person), merkt
+# sich TapFilter pro Personalnummer, wann sie zuletzt gelesen wurde, und
+# unterdrückt nur Wiederholungen derselben Karte innerhalb von HOLD_OFF_MS.
+# Jede Lesung verlängert das Fenster: eine liegen gelassene Karte zählt
+# einmal, erst nach Abnehmen und erneutem Auflegen wieder.
+#
+# Tests auf dem PC: python -m pytest esp32/test_tap_filter.py
+
+import time
+
+HOLD_OFF_MS = 2000   # gleiche Karte wird so lange nach der letzten Lesung ignoriert
+MAX_ENTRIES = 16     # so viele verschiedene Karten werden höchstens gemerkt
+
+if hasattr(time, "ticks_ms"):
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+else:
+    # PC: gleiches Verhalten wie MicroPython (30-Bit-Zähler mit Überlauf)
+    TICKS_PERIOD = 1 << 30
+
+    def ticks_ms():
+        return int(time.monotonic() * 1000) & (TICKS_PERIOD - 1)
+
+    def ticks_diff(a, b):
+        return ((a - b + TICKS_PERIOD // 2) & (TICKS_PERIOD - 1)) - TICKS_PERIOD // 2
+
+class TapFilter:
+    """Unterdrückt Wiederholungen derselben Karte innerhalb von hold_off_ms"""
+
+    def __init__(self, hold_off_ms=HOLD_OFF_MS, max_entries=MAX_ENTRIES, clock=ticks_ms):
+        self.hold_off_ms = hold_off_ms
+        self.max_entries = max_entries
+        self.clock = clock
+        self.seen = {}    # Personalnummer -> ticks_ms der letzten Lesung
+
+    def accept(self, personalnummer, now=None):
+        """True = neue Karte (verarbeiten), False = Wiederholung (ignorieren)"""
+        if now is None:
+            now = self.clock()
+        last = self.seen.get(personalnummer)
+        self.seen[personalnummer] = now
+        if last is not None and ticks_diff(now, last) < self.hold_off_ms:
+            return False
+        if len(self.seen) > self.max_entries:
+            self._prune(now)
+        return True
+
+    def restart(self, personalnummer, now=None):
+        """Startet das Fenster neu - nach blockierender Verarbeitung, in der nicht gelesen wurde"""
+        self.seen[personalnummer] = self.clock() if now is None else now
+
+    def _prune(self, now):
+        """Entfernt abgelaufene Einträge, notfalls die ältesten"""
+        for personalnummer, last in list(self.seen.items()):
+            if ticks_diff(now, last) >= self.hold_off_ms:
+                del self.seen[personalnummer]
+        while len(self.seen) > self.max_entries:
+            oldest = max(self.seen, key=lambda k: ticks_diff(now, self.seen[k]))
+            del self.seen[oldest]
+
+    def clear(self):
+        self.seen.clear()
@@ -0,0 +1,77 @@
+# Tests für tap_filter.py auf dem PC (nicht auf den ESP32 kopieren)
+#
+# Schnelle Kartenfolgen mit einer künstlichen Uhr: python -m pytest esp32/test_tap_filter.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tap_filter import TapFilter
+
+class FakeClock:
+    """Künstliche ticks_ms-Uhr mit 30-Bit-Überlauf wie auf dem ESP32"""
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def set(self, ms):
+        self.now = ms & 0x3FFFFFFF
+
+def make_filter(now=0):
+    clock = FakeClock(now)
+    return TapFilter(hold_off_ms=2000, max_entries=4, clock=clock), clock
+
+def run(taps, clock, sequence):
+    """sequence: (ms seit Start, Personalnummer) - gibt die akzeptierten zurück"""
+    start = clock.now
+    accepted = []
+    for at, personalnummer in sequence:
+        clock.set(start + at)
+        if taps.accept(personalnummer):
+            accepted.append((at, personalnummer))
+    return accepted
+
+def test_liegende_karte_zaehlt_einmal():
+    # Karte bleibt 5 s liegen, Leser meldet sie alle 100 ms
+    taps, clock = make_filter()
+    assert run(taps, clock, [(t, "A") for t in range(0, 5000, 100)]) == [(0, "A")]
+
+def test_erneut_aufgelegt():
+    # Nach dem Abnehmen (Pause > Hold-off) zählt sie wieder
+    taps, clock = make_filter()
+    run(taps, clock, [(t, "A") for t in range(0, 5000, 100)])
+    assert run(taps, clock, [(2100, "A")]) == [(2100, "A")]
+
+def test_verschiedene_karten_nicht_blockiert():
+    taps, clock = make_filter()
+    assert run(taps, clock, [(0, "B"), (150, "C"), (300, "B"), (400, "D")]) == \
+        [(0, "B"), (150, "C"), (400, "D")]
+
+def test_abwechselnd_zwei_karten():
+    taps, clock = make_filter()
+    assert run(taps, clock, [(t * 100, "AB"[t % 2]) for t in range(20)]) == \
+        [(0, "A"), (100, "B")]
+
+def test_speicher_begrenzt():
+    taps, clock = make_filter()
+    accepted = run(taps, clock, [(t * 10, "%08X" % t) for t in range(100)])
+    assert len(accepted) == 100
+    assert len(taps.seen) <= 4
+
+def test_ueberlauf_des_zaehlers():
+    # 30-Bit-Zähler läuft mitten in einer liegenden Karte über
+    taps, clock = make_filter(now=(1 << 30) - 500)
+    assert run(taps, clock, [(t, "E") for t in range(0, 1500, 100)]) == [(0, "E")]
+    assert run(taps, clock, [(3000, "E")]) == [(3000, "E")]
+
+def test_restart_nach_blockierender_anzeige():
+    # 3 s ohne Lesung, Karte liegt noch - restart() verhindert eine doppelte Lesung
+    taps, clock = make_filter()
+    assert taps.accept("F")
+    clock.set(3000)
+    taps.restart("F")
+    assert run(taps, clock, [(t, "F") for t in range(0, 1000, 100)]) == []
@@ -2,6 +2,7 @@
 
 from ST7735 import TFT
 from sysfont import sysfont
+from framebuffer import ScreenBuffer
 from machine import SPI, Pin
 import time
 
@@ -38,6 +39,16 @@ tft.rgb(True)
 tft.fill(TFT.BLACK)
 tft.text((0, 40), "Starte...", TFT.WHITE, sysfont, 2)
 
+# Bildschirme erst im RAM zusammensetzen und nur Geändertes senden
+# (framebuffer.py, 40 KB RAM). False = direkt auf das Display zeichnen.
+USE_FRAMEBUFFER = True
+screen = ScreenBuffer(tft) if USE_FRAMEBUFFER else tft
+
+# True = show_*-Funktionen warten selbst (time.sleep) und schalten die LEDs
+# wieder aus. Der asynchrone Client (client_async.py) setzt False und
+# übernimmt Anzeigedauer und LEDs selbst, ohne die Schleife zu blockieren.
+BLOCKING = True
+
 # Farben
 COLOR_BG = TFT.BLACK
 COLOR_TEXT = TFT.WHITE
@@ -47,97 +58,124 @@ COLOR_INFO = TFT.YELLOW
 COLOR_OFFLINE = TFT.BLUE
 
 def clear():
-    tft.fill(COLOR_BG)
+    screen.fill(COLOR_BG)
+
+def flush():
+    """Bringt den Bildspeicher aufs Display (ohne Bildspeicher: nichts zu tun)"""
+    if screen is not tft:
+        screen.flush()
+
+def _hold(seconds):
+    """Wartet nur im blockierenden Betrieb"""
+    if BLOCKING:
+        time.sleep(seconds)
+
+def leds_off():
+    LED_GREEN.value(0)
+    LED_RED.value(0)
 
 def show_waiting(sperrzeit_start=None, sperrzeit_end=None, offline=False):
     clear()
     
     if offline:
-        tft.text((0, 0), "OFFLINE", COLOR_OFFLINE, sysfont, 1)
+        screen.text((0, 0), "OFFLINE", COLOR_OFFLINE, sysfont, 1)
     else:
-        tft.text((0, 0), "ONLINE", COLOR_ALLOW, sysfont, 1)
+        screen.text((0, 0), "ONLINE", COLOR_ALLOW, sysfont, 1)
     
-    tft.text((0, 30), "Bitte Karte", COLOR_TEXT, sysfont, 2)
-    tft.text((0, 55), "auflegen", COLOR_TEXT, sysfont, 2)
+    screen.text((0, 30), "Bitte Karte", COLOR_TEXT, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 55), "auflegen", COLOR_TEXT, sysfont, 2, aBackground=COLOR_BG)
     
     if sperrzeit_start and sperrzeit_end:
-        tft.text((0, 90), "Sperrzeit:", COLOR_INFO, sysfont, 1)
+        screen.text((0, 90), "Sperrzeit:", COLOR_INFO, sysfont, 1)
         sperrzeit_text = str(sperrzeit_start) + " - " + str(sperrzeit_end)
-        tft.text((0, 105), sperrzeit_text, COLOR_INFO, sysfont, 1)
+        screen.text((0, 105), sperrzeit_text, COLOR_INFO, sysfont, 1)
+    flush()
 
 def show_access_granted():
     clear()
     # LEDs: Gruen an, Rot aus
     LED_GREEN.value(1)
     LED_RED.value(0)
-    tft.fillrect((0, 30), (128, 60), COLOR_ALLOW)
-    tft.text((10, 45), "ZUTRITT", TFT.BLACK, sysfont, 2)
-    tft.text((10, 70), "GEWAEHRT", TFT.BLACK, sysfont, 2)
-    time.sleep(2)
-    # LED wieder aus
-    LED_GREEN.value(0)
+    screen.fillrect((0, 30), (128, 60), COLOR_ALLOW)
+    screen.text((10, 45), "ZUTRITT", TFT.BLACK, sysfont, 2, aBackground=COLOR_ALLOW)
+    screen.text((10, 70), "GEWAEHRT", TFT.BLACK, sysfont, 2, aBackground=COLOR_ALLOW)
+    flush()
+    if BLOCKING:
+        time.sleep(2)
+        # LED wieder aus
+        LED_GREEN.value(0)
 
 def show_access_denied(reason=""):
     clear()
     # LEDs: Rot an, Gruen aus
     LED_RED.value(1)
     LED_GREEN.value(0)
-    tft.fillrect((0, 30), (128, 60), COLOR_DENY)
-    tft.text((5, 45), "ZUTRITT", TFT.WHITE, sysfont, 2)
-    tft.text((5, 70), "VERWEIGERT", TFT.WHITE, sysfont, 2)
+    screen.fillrect((0, 30), (128, 60), COLOR_DENY)
+    screen.text((5, 45), "ZUTRITT", TFT.WHITE, sysfont, 2, aBackground=COLOR_DENY)
+    screen.text((5, 70), "VERWEIGERT", TFT.WHITE, sysfont, 2, aBackground=COLOR_DENY)
     if reason:
-        tft.text((0, 110), reason[:20], COLOR_TEXT, sysfont, 1)
-    time.sleep(2)
-    # LED wieder aus
-    LED_RED.value(0)
+        screen.text((0, 110), reason[:20], COLOR_TEXT, sysfont, 1)
+    flush()
+    if BLOCKING:
+        time.sleep(2)
+        # LED wieder aus
+        LED_RED.value(0)
 
 def show_connecting():
     clear()
-    tft.text((0, 40), "Verbinde...", COLOR_INFO, sysfont, 2)
+    screen.text((0, 40), "Verbinde...", COLOR_INFO, sysfont, 2, aBackground=COLOR_BG)
+    flush()
 
 def show_connection_status(attempt, max_attempts):
     clear()
-    tft.text((0, 30), "Verbinde mit", COLOR_TEXT, sysfont, 1)
-    tft.text((0, 45), "Server...", COLOR_TEXT, sysfont, 1)
-    tft.text((0, 70), "Versuch " + str(attempt) + "/" + str(max_attempts), COLOR_INFO, sysfont, 2)
+    screen.text((0, 30), "Verbinde mit", COLOR_TEXT, sysfont, 1)
+    screen.text((0, 45), "Server...", COLOR_TEXT, sysfont, 1)
+    screen.text((0, 70), "Versuch " + str(attempt) + "/" + str(max_attempts), COLOR_INFO, sysfont, 2, aBackground=COLOR_BG)
+    flush()
 
 def show_offline_mode():
     clear()
-    tft.text((0, 30), "OFFLINE", COLOR_OFFLINE, sysfont, 2)
-    tft.text((0, 60), "MODUS", COLOR_OFFLINE, sysfont, 2)
-    tft.text((0, 90), "Nutze lokale", COLOR_TEXT, sysfont, 1)
-    tft.text((0, 105), "Liste", COLOR_TEXT, sysfont, 1)
-    time.sleep(2)
+    screen.text((0, 30), "OFFLINE", COLOR_OFFLINE, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 60), "MODUS", COLOR_OFFLINE, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 90), "Nutze lokale", COLOR_TEXT, sysfont, 1)
+    screen.text((0, 105), "Liste", COLOR_TEXT, sysfont, 1)
+    flush()
+    _hold(2)
 
 def show_reconnected():
     clear()
-    tft.text((0, 40), "SERVER", COLOR_ALLOW, sysfont, 2)
-    tft.text((0, 65), "VERBUNDEN", COLOR_ALLOW, sysfont, 2)
-    time.sleep(1)
+    screen.text((0, 40), "SERVER", COLOR_ALLOW, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 65), "VERBUNDEN", COLOR_ALLOW, sysfont, 2, aBackground=COLOR_BG)
+    flush()
+    _hold(1)
 
 def show_list_updated():
     clear()
-    tft.text((0, 40), "Liste", COLOR_INFO, sysfont, 2)
-    tft.text((0, 65), "aktualisiert", COLOR_INFO, sysfont, 1)
-    time.sleep(1)
+    screen.text((0, 40), "Liste", COLOR_INFO, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 65), "aktualisiert", COLOR_INFO, sysfont, 1)
+    flush()
+    _hold(1)
 
 def show_wlan_connecting():
     clear()
-    tft.text((0, 30), "WLAN", COLOR_INFO, sysfont, 2)
-    tft.text((0, 55), "Verbinde...", COLOR_TEXT, sysfont, 1)
+    screen.text((0, 30), "WLAN", COLOR_INFO, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 55), "Verbinde...", COLOR_TEXT, sysfont, 1)
+    flush()
 
 def show_wlan_connected():
     clear()
-    tft.text((0, 30), "WLAN", COLOR_ALLOW, sysfont, 2)
-    tft.text((0, 55), "Verbunden!", COLOR_ALLOW, sysfont, 1)
-    time.sleep(1)
+    screen.text((0, 30), "WLAN", COLOR_ALLOW, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 55), "Verbunden!", COLOR_ALLOW, sysfont, 1)
+    flush()
+    _hold(1)
 
 def show_wlan_error():
     clear()
-    tft.text((0, 30), "WLAN", COLOR_DENY, sysfont, 2)
-    tft.text((0, 55), "FEHLER", COLOR_DENY, sysfont, 2)
-    tft.text((0, 90), "Neustart...", COLOR_TEXT, sysfont, 1)
-    time.sleep(3)
+    screen.text((0, 30), "WLAN", COLOR_DENY, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 55), "FEHLER", COLOR_DENY, sysfont, 2, aBackground=COLOR_BG)
+    screen.text((0, 90), "Neustart...", COLOR_TEXT, sysfont, 1)
+    flush()
+    _hold(3)
 
 def test_display():
     show_connecting()
@@ -156,5 +194,28 @@ def test_display():
     show_reconnected()
     show_waiting(offline=False)
 
+def benchmark_transitions(rounds=5):
+    """Misst Bildschirmwechsel direkt und mit Bildspeicher (auf dem ESP32)"""
+    global screen, BLOCKING
+    blocking, current = BLOCKING, screen
+    BLOCKING = False
+    buffered = current if current is not tft else ScreenBuffer(tft)
+    for name, target in (("direkt", tft), ("Bildspeicher", buffered)):
+        screen = target
+        if target is not tft:
+            target.invalidate()
+        show_waiting()
+        started = time.ticks_ms()
+        for _ in range(rounds):
+            show_access_granted()
+            show_waiting()
+        elapsed = time.ticks_diff(time.ticks_ms(), started) / (2 * rounds)
+        print("%-12s Wechsel warten <-> gewaehrt: %d ms" % (name, elapsed))
+    leds_off()
+    screen, BLOCKING = current, blocking
+    if screen is not tft:
+        screen.invalidate()
+        show_waiting()
+
 if __name__ == "__main__":
     test_display()
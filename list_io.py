@@ -0,0 +1,407 @@
+# Import und Export großer Zutrittslisten (z. B. HR-Exporte)
+#
+# Formate (nach Dateiendung, sonst "txt"):
+#   txt   - eine Personalnummer pro Zeile, Kommentare mit #; jede ungültige
+#           Zeile ist ein Fehler (keine Kopfzeile)
+#   csv   - Personalnummer in einer Spalte (Index oder Name, Standard: erste),
+#           Trennzeichen wird erkannt, eine Kopfzeile wird übersprungen
+#   jsonl - ein JSON-Objekt pro Zeile, Feld "uid" oder "personalnummer"
+#
+# Alles läuft als Strom mit fester Speichergrenze: die Datei wird in Blöcken
+# zu CHUNK_SIZE UIDs gelesen, jeder Block sortiert und in eine temporäre
+# Datei geschrieben, danach werden die Blöcke mit heapq.merge zusammengeführt
+# (externes Sortieren). Doppelte Einträge fallen dabei auf und werden gezählt.
+# Das Ergebnis wird direkt als neue Basisdatei geschrieben und mit
+# AccessStore.install() übernommen.
+#
+# Kommandozeile (Server vorher beenden - oder im Server import_list verwenden;
+# --dry-run prüft nur und geht auch bei laufendem Server):
+#   python list_io.py import hr_export.csv [--mode replace|add|remove] [--column 2]
+#   python list_io.py export liste.jsonl
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from array import array
+from heapq import merge
+
+from access_list import uid_to_int
+from access_store import AccessReader, AccessStore, write_base_file
+
+FORMATS = ("txt", "csv", "jsonl")
+MODES = ("replace", "add", "remove")
+CHUNK_SIZE = 1 << 20         # UIDs pro sortiertem Block (4 MB)
+READ_BLOCK = 1 << 16         # UIDs pro Lesevorgang beim Zusammenführen
+PROGRESS_EVERY = 250000      # Zeilen zwischen zwei Fortschrittsmeldungen
+MAX_REPORTED_ERRORS = 5
+JSON_FIELDS = ("uid", "personalnummer")
+
+class ImportResult:
+    """Ergebnis eines Imports (wird auch zwischen Prozessen übergeben)"""
+
+    def __init__(self, path, mode="replace"):
+        self.path = path
+        self.mode = mode
+        self.rows = 0              # gelesene Datensätze (ohne Kopfzeile/Kommentare)
+        self.count = 0             # Einträge der Liste danach
+        self.unique = 0            # verschiedene gültige UIDs in der Datei
+        self.duplicates = 0        # doppelt in der Datei
+        self.errors = []           # (Zeilennummer, Text) der ersten Fehler
+        self.error_count = 0
+        self.version = None        # Listenversion, auf der der Import beruht
+        self.base_file = None      # gebaute Basisdatei (bis zu install)
+        self.changed = False       # False wenn die Liste schon so aussah
+        self.duration = 0.0
+        self.finished = None       # Zeitpunkt der Übernahme (time.time())
+
+    @property
+    def ok(self):
+        return not self.error_count
+
+    def error(self, number, text):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((number, text.strip()[:40]))
+
+    def summary(self):
+        return (f"{self.rows} Zeilen, {self.unique} verschiedene UIDs, {self.duplicates} doppelt, "
+                f"{self.error_count} ungültig -> {self.count} Einträge in {self.duration:.2f} s")
+
+def detect_format(path):
+    """Format anhand der Dateiendung"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    return "txt"
+
+class _ProgressFile:
+    """Zählt gelesene Zeichen für die Fortschrittsanzeige"""
+
+    def __init__(self, f):
+        self.f = f
+        self.position = 0
+
+    def __iter__(self):
+        for line in self.f:
+            self.position += len(line)
+            yield line
+
+def read_uids(path, result, fmt=None, column=None, progress=None):
+    """Liefert die UIDs der Datei (unsortiert) als Integer, Fehler landen in result"""
+    fmt = fmt or detect_format(path)
+    total = os.path.getsize(path) or 1
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as raw:
+        f = _ProgressFile(raw)
+        if fmt == "csv":
+            rows = _csv_rows(f, column)
+        elif fmt == "jsonl":
+            rows = _jsonl_rows(f, column)
+        else:
+            rows = _txt_rows(f)
+        # Nur bei CSV darf die erste Zeile eine Kopfzeile sein (mit Spaltennamen
+        # schon in _csv_rows) - in txt/jsonl ist jede ungültige Zeile ein Fehler
+        header_allowed = fmt == "csv" and (column is None or str(column).isdigit())
+        for number, text in rows:
+            try:
+                value = uid_to_int(text)
+            except (ValueError, TypeError, AttributeError):
+                if header_allowed and number == 1:
+                    continue   # Kopfzeile
+                result.rows += 1
+                result.error(number, str(text))
+                continue
+            result.rows += 1
+            if progress and result.rows % PROGRESS_EVERY == 0:
+                progress(result.rows, f.position / total)
+            yield value
+
+def _txt_rows(f):
+    for number, line in enumerate(f, 1):
+        if "#" in line:
+            line = line.split("#", 1)[0]
+        line = line.strip()
+        if not line:
+            continue
+        if "," in line or ";" in line:
+            # CSV-Zeile in einer .txt-Datei: erste Spalte
+            line = line.replace(";", ",").split(",", 1)[0].strip().strip('"')
+        yield number, line
+
+def _csv_rows(f, column):
+    lines = iter(f)
+    first = next(lines, "")
+    try:
+        dialect = csv.Sniffer().sniff(first, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(_chain(first, lines), dialect)
+    index = 0
+    for number, row in enumerate(reader, 1):
+        if number == 1 and column is not None and not str(column).isdigit():
+            # Spalte per Name aus der Kopfzeile
+            names = [name.strip().lower() for name in row]
+            if column.lower() not in names:
+                raise ValueError(f"Spalte {column!r} nicht in der Kopfzeile")
+            index = names.index(column.lower())
+            continue
+        if number == 1 and column is not None:
+            index = int(column)
+        if not row or (len(row) == 1 and not row[0].strip()):
+            continue
+        yield number, row[index].strip() if index < len(row) else ""
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+def _jsonl_rows(f, field):
+    fields = (field,) if field else JSON_FIELDS
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, line
+            continue
+        value = None
+        if isinstance(record, dict):
+            value = next((record[name] for name in fields if name in record), None)
+        yield number, value if value is not None else line
+
+def sorted_runs(values, tmpdir, chunk_size=CHUNK_SIZE):
+    """Teilt den Strom in sortierte Blöcke; alle bis auf den letzten landen in Dateien"""
+    runs = []
+    chunk = array("I")
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= chunk_size:
+            runs.append(_spill(array("I", sorted(chunk)), tmpdir))
+            chunk = array("I")
+    if chunk or not runs:
+        # Letzter Block bleibt im Speicher
+        runs.append(array("I", sorted(chunk)))
+    return runs
+
+def _spill(chunk, tmpdir):
+    f = tempfile.TemporaryFile(dir=tmpdir)
+    chunk.tofile(f)
+    f.seek(0)
+    return f
+
+def _read_run(run):
+    if isinstance(run, array):
+        yield from run
+        return
+    while True:
+        block = array("I")
+        try:
+            block.fromfile(run, READ_BLOCK)
+        except EOFError:
+            pass   # letzter, kürzerer Block ist trotzdem gefüllt
+        if not block:
+            run.close()
+            return
+        yield from block
+
+def merge_unique(runs, result):
+    """Führt sortierte Blöcke zusammen und lässt doppelte UIDs weg"""
+    last = -1
+    for value in merge(*(_read_run(run) for run in runs)):
+        if value == last:
+            result.duplicates += 1
+            continue
+        last = value
+        result.unique += 1
+        yield value
+
+def _union(a, b):
+    """Vereinigung zweier aufsteigender Folgen ohne doppelte Einträge"""
+    last = -1
+    for value in merge(a, b):
+        if value != last:
+            last = value
+            yield value
+
+def _difference(a, b):
+    """Alle Werte aus a, die nicht in b vorkommen (beide aufsteigend)"""
+    b = iter(b)
+    current = next(b, None)
+    for value in a:
+        while current is not None and current < value:
+            current = next(b, None)
+        if value != current:
+            yield value
+
+def temp_base_file(directory):
+    """Legt eine eindeutige temporäre Basisdatei im Datenordner an
+
+    Jeder Import bekommt seine eigene - gleichzeitige Importe (Admin-Socket,
+    Terminal, Kommandozeile) überschreiben sich nicht gegenseitig.
+    """
+    fd, path = tempfile.mkstemp(dir=directory, prefix="import-", suffix=".bin")
+    os.close(fd)
+    return path
+
+def build_import(path, directory, mode="replace", dst=None, fmt=None, column=None,
+                 strict=True, chunk_size=CHUNK_SIZE, progress=None):
+    """Baut aus einer Datei eine neue Basisdatei dst (Standard: temp_base_file im Datenordner)
+
+    Läuft auch in einem Hilfsprozess: die bestehende Liste wird für "add" und
+    "remove" über einen AccessReader gelesen. result.version hält fest, auf
+    welchem Stand die Datei beruht (für AccessStore.install).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unbekannter Modus: {mode}")
+    started = time.monotonic()
+    result = ImportResult(path, mode)
+    reader = AccessReader(directory) if mode != "replace" else None
+    if reader is not None:   # leere Liste ist falsy
+        result.version = reader.version
+    try:
+        with tempfile.TemporaryDirectory(dir=directory) as tmpdir:
+            runs = sorted_runs(read_uids(path, result, fmt, column, progress), tmpdir, chunk_size)
+            if strict and result.error_count:
+                for run in runs:
+                    if not isinstance(run, array):
+                        run.close()
+                result.duration = time.monotonic() - started
+                return result
+            values = merge_unique(runs, result)
+            if mode == "add":
+                values = _union(reader.values(), values)
+            elif mode == "remove":
+                values = _difference(reader.values(), values)
+            result.base_file = dst or temp_base_file(directory)
+            result.count = write_base_file(result.base_file, values)
+    finally:
+        if reader is not None:
+            reader.close()
+    result.duration = time.monotonic() - started
+    return result
+
+def import_into_store(store, path, mode="replace", executor=None, **options):
+    """Importiert eine Datei in einen geöffneten AccessStore
+
+    Mit executor (z. B. ProcessPoolExecutor) läuft das Einlesen in einem
+    anderen Prozess - der Server rechnet dann nicht mit (siehe server.py).
+    """
+    started = time.monotonic()
+    tmp_path = temp_base_file(store.directory)
+    try:
+        if executor:
+            result = executor.submit(build_import, os.path.abspath(path), store.directory,
+                                     mode, tmp_path, **options).result()
+        else:
+            result = build_import(path, store.directory, mode, tmp_path, **options)
+        if result.ok or not options.get("strict", True):
+            result.changed = store.install(tmp_path, result.version)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    result.duration = time.monotonic() - started
+    result.finished = time.time()
+    return result
+
+def export_store(store, path, fmt=None, progress=None):
+    """Schreibt die Zutrittsliste als Datei (als Strom), gibt die Anzahl zurück"""
+    fmt = fmt or detect_format(path)
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            f.write("personalnummer\n")
+            line = "%08X\n"
+        elif fmt == "jsonl":
+            line = '{"uid": "%08X"}\n'
+        else:
+            line = "%08X\n"
+        batch = []
+        for value in store.values():
+            batch.append(line % value)
+            if len(batch) >= READ_BLOCK:
+                f.write("".join(batch))
+                count += len(batch)
+                batch = []
+                if progress and count % PROGRESS_EVERY < READ_BLOCK:
+                    progress(count, count / max(1, len(store)))
+        f.write("".join(batch))
+        count += len(batch)
+    os.replace(tmp_path, path)
+    return count
+
+def log_progress(rows, fraction):
+    """Fortschritt als eigene Zeile (Serverterminal, läuft im Hilfsprozess)"""
+    print(f"[IMPORT] {rows} Zeilen gelesen ({fraction * 100:.0f}%)", flush=True)
+
+def print_progress(rows, fraction):
+    """Fortschrittsanzeige für die Kommandozeile"""
+    sys.stderr.write(f"\r[IMPORT] {rows} Zeilen ({fraction * 100:.0f}%)")
+    sys.stderr.flush()
+
+def main():
+    default_dir = os.environ.get("ACCESS_DATA_DIR") or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    parser = argparse.ArgumentParser(description="Import/Export der Zutrittsliste")
+    parser.add_argument("--data", default=default_dir, help="Datenordner des Servers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Datei in die Zutrittsliste übernehmen")
+    imp.add_argument("file")
+    imp.add_argument("--mode", choices=MODES, default="replace",
+                     help="replace = Liste ersetzen, add = hinzufügen, remove = entfernen")
+    imp.add_argument("--format", choices=FORMATS)
+    imp.add_argument("--column", help="CSV-Spalte (Index oder Name) bzw. JSON-Feld")
+    imp.add_argument("--lenient", action="store_true", help="Ungültige Zeilen überspringen statt abbrechen")
+    imp.add_argument("--dry-run", action="store_true", help="Nur prüfen, nichts übernehmen")
+    exp = sub.add_parser("export", help="Zutrittsliste in eine Datei schreiben")
+    exp.add_argument("file")
+    exp.add_argument("--format", choices=FORMATS)
+    args = parser.parse_args()
+
+    if args.command == "import" and args.dry_run:
+        # Nur lesen - geht auch, während der Server läuft
+        try:
+            store = AccessReader(args.data)
+        except OSError as e:
+            raise SystemExit(f"[ERROR] {e}")
+    else:
+        try:
+            store = AccessStore(args.data)
+        except RuntimeError as e:
+            raise SystemExit(f"[ERROR] {e} - Server beenden oder dort import_list/export_list verwenden")
+    try:
+        if args.command == "export":
+            count = export_store(store, args.file, args.format)
+            print(f"[INFO] {count} Einträge nach {args.file} exportiert")
+            return
+        options = dict(fmt=args.format, column=args.column, strict=not args.lenient,
+                       progress=print_progress)
+        if args.dry_run:
+            tmp_path = temp_base_file(store.directory)
+            try:
+                result = build_import(args.file, store.directory, args.mode, tmp_path, **options)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        else:
+            result = import_into_store(store, args.file, args.mode, **options)
+        sys.stderr.write("\n")
+        for number, text in result.errors:
+            print(f"[ERROR] Zeile {number}: {text}")
+        if not result.ok and not args.lenient:
+            raise SystemExit(f"[ERROR] Import abgebrochen: {result.error_count} ungültige Zeile(n)")
+        print(f"[INFO] {result.summary()}")
+        if not args.dry_run:
+            print(f"[INFO] Listenversion {store.version}" + ("" if result.changed else " (unverändert)"))
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
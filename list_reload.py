@@ -0,0 +1,183 @@
+# Zutrittsliste aus einer Datei neu laden, ohne den Server neu zu starten
+#
+# Format der Listendatei: eine Personalnummer (8 Hex-Zeichen) pro Zeile.
+# CSV ist erlaubt - dann zählt die erste Spalte, eine Kopfzeile wird nur bei
+# Dateien mit Endung .csv erkannt.
+# Leere Zeilen und Kommentare (#) werden übersprungen. Eingelesen wird wie
+# beim Import (list_io.py) als Strom mit externem Sortieren.
+#
+# Ablauf eines Reloads:
+#   1. ListWatcher bemerkt eine geänderte Datei (mtime/Größe, erst wenn sie
+#      zwei Abfragen lang gleich bleibt - halb geschriebene Dateien zählen nicht)
+#   2. Ein eigener Prozess liest, prüft, sortiert und schreibt daraus eine
+#      fertige Basisdatei - das kostet im Server keine Rechenzeit (kein GIL)
+#   3. Der Server übernimmt die Datei mit AccessStore.install(): Header
+#      anpassen, umbenennen, neue Sicht einblenden - unabhängig von der Größe
+#
+# Enthält die Datei ungültige Zeilen, wird sie komplett abgelehnt: eine
+# abgeschnittene Exportdatei soll nicht alle Mitarbeiter aussperren.
+
+import concurrent.futures
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
+import os
+import threading
+import time
+
+from list_io import ImportResult, build_import, temp_base_file
+
+def new_executor():
+    """Ein Hilfsprozess (spawn - erbt keine Threads und Sockets des Servers)"""
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+def load_into_store(path, store, executor=None):
+    """Baut die Basisdatei in einem Hilfsprozess und übernimmt sie in den Speicher
+
+    Jeder Fehler landet im Ergebnis. Nur ein kaputter, vom Aufrufer
+    übergebener Prozess-Pool (BrokenProcessPool) wird weitergereicht - der
+    Aufrufer muss ihn ersetzen.
+    """
+    started = time.monotonic()
+    tmp_path = None
+    own_executor = executor is None
+    if own_executor:
+        executor = new_executor()
+    try:
+        tmp_path = temp_base_file(store.directory)
+        result = executor.submit(build_import, os.path.abspath(path), store.directory,
+                                 "replace", tmp_path).result()
+        if result.ok:
+            result.changed = store.install(tmp_path)
+    except BrokenProcessPool:
+        if not own_executor:
+            raise
+        result = ImportResult(path)
+        result.error(0, "Hilfsprozess abgestürzt")
+    except Exception as e:
+        result = ImportResult(path)
+        result.error(0, str(e) or type(e).__name__)
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if own_executor:
+            executor.shutdown()
+    result.duration = time.monotonic() - started
+    result.finished = time.time()
+    return result
+
+class ListWatcher:
+    """Beobachtet eine Listendatei und lädt sie bei Änderungen im Hintergrund neu"""
+
+    def __init__(self, path, store, on_reloaded=None, interval=2.0):
+        self.path = os.path.abspath(path)
+        self.store = store
+        self.on_reloaded = on_reloaded
+        self.interval = interval
+        self.last_result = None
+        self._stat = None          # (mtime, Größe) der zuletzt geladenen Datei
+        self._candidate = None     # zuletzt gesehene, noch nicht stabile Änderung
+        self._lock = threading.Lock()
+        self._executor = new_executor()
+        self._thread = threading.Thread(target=self._run, name="list-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _run(self):
+        while True:
+            stat = self._file_stat()
+            if stat is not None and stat != self._stat:
+                if stat == self._candidate:
+                    # Seit der letzten Abfrage unverändert - fertig geschrieben
+                    try:
+                        self.reload(stat)
+                    except Exception as e:
+                        # Der Thread darf nicht sterben - sonst kein Reload mehr bis zum Neustart
+                        print(f"[ERROR] Reload von {self.path} fehlgeschlagen: {e!r}")
+                self._candidate = stat
+            time.sleep(self.interval)
+
+    def reload(self, stat=None):
+        """Lädt die Datei jetzt neu (blockiert den aufrufenden Thread, nicht den Server)"""
+        with self._lock:
+            stat = stat or self._file_stat()
+            try:
+                result = load_into_store(self.path, self.store, self._executor)
+            except BrokenProcessPool:
+                # Hilfsprozess abgestürzt - neuen Pool anlegen und einmal wiederholen
+                self._executor.shutdown(wait=False)
+                self._executor = new_executor()
+                try:
+                    result = load_into_store(self.path, self.store, self._executor)
+                except BrokenProcessPool:
+                    result = ImportResult(self.path)
+                    result.error(0, "Hilfsprozess abgestürzt")
+            # Auch abgelehnte Dateien nicht erneut versuchen, bis sie sich ändern
+            self._stat = stat
+            self.last_result = result
+        if self.on_reloaded:
+            self.on_reloaded(result)
+        return result
+
+def benchmark(entries=1000000):
+    """Misst Zutrittsabfragen während eine Liste mit entries Einträgen neu geladen wird"""
+    import random
+    import tempfile
+
+    from access_store import AccessStore
+
+    def report(name, samples):
+        samples.sort()
+        n = len(samples)
+        print(f"{name:>14}: {n} Abfragen, p50 {samples[n // 2] * 1e6:6.2f} µs, "
+              f"p99 {samples[int(n * 0.99)] * 1e6:6.2f} µs, max {samples[-1] * 1000:6.2f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        list_path = os.path.join(directory, "liste.csv")
+        with open(list_path, "w") as f:
+            f.write("personalnummer,name\n")
+            for value in random.sample(range(1 << 32), entries):
+                f.write("%08X,Mitarbeiter\n" % value)
+        store = AccessStore(os.path.join(directory, "data"), ["F39A370E"])
+        watcher = ListWatcher(list_path, store)
+        probes = [random.getrandbits(32) for _ in range(1000)]
+
+        def measure(seconds=None, until=None):
+            clock = time.perf_counter
+            samples = []
+            end = clock() + (seconds or 0)
+            i = 0
+            while (clock() < end) if until is None else not until.done():
+                t0 = clock()
+                probes[i % 1000] in store
+                samples.append(clock() - t0)
+                i += 1
+            return samples
+
+        report("ohne Reload", measure(1.0))
+        # Erster Reload startet auch den Hilfsprozess - nicht mitmessen
+        watcher.reload()
+        with open(list_path, "a") as f:
+            f.write("F39A370E\n")
+        with concurrent.futures.ThreadPoolExecutor(1) as pool:
+            future = pool.submit(watcher.reload)
+            samples = measure(until=future)
+            result = future.result()
+        report("während Reload", samples)
+        print(f"Reload: {result.count} Einträge, {result.duplicates} doppelt, "
+              f"{result.duration:.2f} s, Version {store.version}")
+        store.close()
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,329 @@
+# Lastgenerator für server.py - simuliert viele ESP32-Türen gleichzeitig
+#
+# Jede simulierte Tür hält eine TCP-Verbindung wie TCP_client.py (Text- oder
+# Binärprotokoll) und "tippt" Karten mit einer zufälligen Rate (Poisson-Prozess).
+# Gemessen wird die Zeit vom Senden der Personalnummer bis zur Antwort.
+#
+# Beispiele:
+#   python loadgen.py --doors 1000 --rate 0.5 --duration 30
+#   python loadgen.py --spawn --doors 2000 --broadcast-every 5 --save baseline.json
+#   python loadgen.py --spawn --doors 2000 --baseline baseline.json
+#
+# Mit --spawn startet der Lastgenerator server.py selbst (mit leerem Datenordner),
+# misst dessen Speicherverbrauch und kann über stdin Listen-Updates auslösen.
+# Mit --processes verteilt er die Türen auf mehrere Prozesse, damit der
+# Generator nicht selbst zum Flaschenhals wird.
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+
+import protocol
+from access_list import int_to_uid
+from broadcast import percentile
+
+DEFAULT_UIDS = ['F39A370E', '20047935', '00220394', '72349395']
+
+class DoorStats:
+    """Messwerte aller Türen eines Prozesses"""
+
+    def __init__(self):
+        self.latencies = array("d")
+        self.allow = 0
+        self.deny = 0
+        self.errors = 0
+        self.connect_failures = 0
+        self.pushes = 0
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        self.allow += other.allow
+        self.deny += other.deny
+        self.errors += other.errors
+        self.connect_failures += other.connect_failures
+        self.pushes += other.pushes
+
+def pick_uid(hit_ratio):
+    """Berechtigte oder zufällige Personalnummer"""
+    if random.random() < hit_ratio:
+        return random.choice(DEFAULT_UIDS)
+    return int_to_uid(random.getrandbits(32))
+
+async def binary_door(args, stats, stop_at):
+    """Tür mit Binärprotokoll: SYNC nach dem Verbinden, danach CHECK-Frames"""
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    decoder = protocol.FrameDecoder()
+    pending = {}
+    request_id = 0
+    got_reply = asyncio.Event()
+
+    async def receive():
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            for msg_type, rid, payload in decoder.feed(data):
+                if rid == protocol.PUSH_REQUEST_ID:
+                    stats.pushes += 1
+                elif rid in pending:
+                    sent = pending.pop(rid)
+                    if msg_type == protocol.MSG_ALLOW:
+                        stats.allow += 1
+                    elif msg_type == protocol.MSG_DENY:
+                        stats.deny += 1
+                    else:
+                        continue   # Antwort auf SYNC
+                    stats.latencies.append(time.perf_counter() - sent)
+                    got_reply.set()
+
+    receiver = asyncio.ensure_future(receive())
+    try:
+        pending[0xFFFF] = time.perf_counter()
+        writer.write(protocol.encode_frame(protocol.MSG_SYNC, 0xFFFF))
+        while time.monotonic() < stop_at and not receiver.done():
+            await asyncio.sleep(random.expovariate(args.rate))
+            request_id = request_id % 0xFFFE + 1
+            payload = protocol.UID.pack(int(pick_uid(args.hit_ratio), 16))
+            got_reply.clear()
+            pending[request_id] = time.perf_counter()
+            writer.write(protocol.encode_frame(protocol.MSG_CHECK, request_id, payload))
+            # Wie der ESP32: auf die Antwort warten, bevor die nächste Karte kommt
+            await asyncio.wait_for(got_reply.wait(), args.timeout)
+    finally:
+        receiver.cancel()
+        writer.close()
+
+async def text_door(args, stats, stop_at):
+    """Tür mit Textprotokoll: Personalnummer senden, ALLOW/DENY lesen"""
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        while time.monotonic() < stop_at:
+            await asyncio.sleep(random.expovariate(args.rate))
+            sent = time.perf_counter()
+            writer.write(pick_uid(args.hit_ratio).encode("utf-8"))
+            while True:
+                data = await asyncio.wait_for(reader.read(65536), args.timeout)
+                if not data:
+                    return
+                # Ein Listen-Update kann vor der Antwort im selben Segment stecken
+                if data.startswith(b"UPDATE_LIST:"):
+                    stats.pushes += 1
+                if data.endswith(b"ALLOW"):
+                    stats.allow += 1
+                    break
+                if data.endswith(b"DENY"):
+                    stats.deny += 1
+                    break
+            stats.latencies.append(time.perf_counter() - sent)
+    finally:
+        writer.close()
+
+async def run_doors(args, doors, stats):
+    door = binary_door if args.protocol == "binary" else text_door
+    stop_at = time.monotonic() + args.duration
+
+    async def one(index):
+        # Verbindungsaufbau über die erste Sekunde verteilen
+        await asyncio.sleep(random.random() * min(1.0, args.duration / 10))
+        try:
+            await door(args, stats, stop_at)
+        except OSError:
+            stats.connect_failures += 1
+        except asyncio.TimeoutError:
+            stats.errors += 1
+
+    await asyncio.gather(*(one(i) for i in range(doors)))
+
+def worker(args, doors, queue):
+    """Ein Generator-Prozess - schickt seine Messwerte am Ende zurück"""
+    stats = DoorStats()
+    asyncio.run(run_doors(args, doors, stats))
+    queue.put((stats.latencies.tobytes(), stats.allow, stats.deny, stats.errors,
+               stats.connect_failures, stats.pushes))
+
+def read_rss(pid):
+    """Resident Set Size eines Prozesses samt Kindprozessen (Worker) in Bytes, nur Linux"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = f.read().split()
+    except (OSError, StopIteration):
+        return None
+    for child in children:
+        rss += read_rss(int(child)) or 0
+    return rss
+
+def wait_for_port(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), 0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def spawn_server(args, data_dir):
+    """Startet server.py mit eigenem Datenordner, Befehle gehen über stdin"""
+    env = dict(os.environ, ACCESS_DATA_DIR=data_dir, ACCESS_WORKERS=str(args.server_workers),
+               ACCESS_PORT=str(args.port))
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")],
+        stdin=subprocess.PIPE, stdout=log, stderr=subprocess.STDOUT, env=env, text=True)
+    if not wait_for_port("127.0.0.1", args.port):
+        server.kill()
+        raise SystemExit("[ERROR] Server ist nicht gestartet")
+    return server
+
+def send_command(server, command):
+    server.stdin.write(command + "\n")
+    server.stdin.flush()
+
+def run(args):
+    """Führt einen Lauf aus und gibt das Ergebnis als dict zurück"""
+    server = None
+    tmp = None
+    if args.spawn:
+        tmp = tempfile.TemporaryDirectory()
+        server = spawn_server(args, tmp.name)
+        if args.list_size:
+            for _ in range(args.list_size):
+                send_command(server, f"add_user({int_to_uid(random.getrandbits(32))})")
+
+    queue = multiprocessing.Queue()
+    shares = [args.doors // args.processes + (i < args.doors % args.processes)
+              for i in range(args.processes)]
+    procs = [multiprocessing.Process(target=worker, args=(args, n, queue)) for n in shares if n]
+    started = time.monotonic()
+    for p in procs:
+        p.start()
+
+    rss = []
+    broadcasts = 0
+    next_broadcast = started + args.broadcast_every if args.broadcast_every else None
+    while time.monotonic() - started < args.duration:
+        time.sleep(0.2)
+        if server:
+            value = read_rss(server.pid)
+            if value:
+                rss.append(value)
+            if next_broadcast and time.monotonic() >= next_broadcast:
+                # Liste ändern, damit die Clients ein Delta bekommen
+                send_command(server, f"add_user({int_to_uid(random.getrandbits(32))})")
+                send_command(server, "update_local_list")
+                broadcasts += 1
+                next_broadcast += args.broadcast_every
+
+    stats = DoorStats()
+    for _ in procs:
+        latencies, allow, deny, errors, connect_failures, pushes = queue.get()
+        part = DoorStats()
+        part.latencies.frombytes(latencies)
+        part.allow, part.deny, part.errors = allow, deny, errors
+        part.connect_failures, part.pushes = connect_failures, pushes
+        stats.merge(part)
+    for p in procs:
+        p.join()
+    elapsed = time.monotonic() - started
+
+    if server:
+        send_command(server, "exit")
+        try:
+            server.wait(5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        tmp.cleanup()
+
+    values = sorted(stats.latencies)
+    return {
+        "protocol": args.protocol,
+        "server_workers": args.server_workers,
+        "doors": args.doors,
+        "rate_per_door": args.rate,
+        "duration": args.duration,
+        "elapsed": round(elapsed, 2),
+        "decisions": len(values),
+        "throughput": round(len(values) / args.duration, 1),
+        "allow": stats.allow,
+        "deny": stats.deny,
+        "errors": stats.errors,
+        "connect_failures": stats.connect_failures,
+        "broadcasts": broadcasts,
+        "pushes_received": stats.pushes,
+        "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "p999_ms": round(percentile(values, 0.999) * 1000, 3),
+        "max_ms": round((values[-1] if values else 0) * 1000, 3),
+        "server_rss_mb": round(max(rss) / 2**20, 1) if rss else None,
+    }
+
+# Kennzahlen für den Vergleich: True = größer ist besser
+COMPARE = [("throughput", True), ("p50_ms", False), ("p99_ms", False),
+           ("p999_ms", False), ("max_ms", False), ("server_rss_mb", False)]
+
+def print_result(result, baseline=None):
+    print(f"\n=== Lastlauf: {result['doors']} Türen ({result['protocol']}), "
+          f"{result['rate_per_door']}/s je Tür, {result['duration']} s ===")
+    print(f"Entscheidungen: {result['decisions']} ({result['allow']} ALLOW, {result['deny']} DENY), "
+          f"{result['errors']} Timeouts, {result['connect_failures']} Verbindungsfehler")
+    print(f"Broadcasts: {result['broadcasts']} ausgelöst, {result['pushes_received']} Push-Nachrichten empfangen")
+    for key, higher_is_better in COMPARE:
+        value = result[key]
+        line = f"  {key:<14} {value if value is not None else '-':>10}"
+        if baseline and baseline.get(key) and value is not None:
+            change = (value - baseline[key]) / baseline[key] * 100
+            better = (change > 0) == higher_is_better
+            line += f"   Baseline {baseline[key]:>10}  {change:+6.1f}% {'besser' if better else 'schlechter'}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Lastgenerator für server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--doors", type=int, default=100, help="Anzahl simulierter Türen")
+    parser.add_argument("--rate", type=float, default=1.0, help="Karten pro Sekunde je Tür")
+    parser.add_argument("--duration", type=float, default=10.0, help="Laufzeit in Sekunden")
+    parser.add_argument("--protocol", choices=("binary", "text"), default="binary")
+    parser.add_argument("--hit-ratio", type=float, default=0.5, help="Anteil berechtigter Karten")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Sekunden bis eine Antwort als verloren gilt")
+    parser.add_argument("--processes", type=int, default=1, help="Generator-Prozesse")
+    parser.add_argument("--spawn", action="store_true", help="server.py selbst starten")
+    parser.add_argument("--server-workers", type=int, default=1, help="Worker-Prozesse des gestarteten Servers")
+    parser.add_argument("--server-log", help="Ausgabe des gestarteten Servers in diese Datei")
+    parser.add_argument("--list-size", type=int, default=0, help="Zusätzliche UIDs vor dem Lauf (nur --spawn)")
+    parser.add_argument("--broadcast-every", type=float, default=0, help="Sekunden zwischen Listen-Updates (nur --spawn)")
+    parser.add_argument("--save", help="Ergebnis als JSON speichern (z. B. als Baseline)")
+    parser.add_argument("--baseline", help="Ergebnis mit einer gespeicherten Baseline vergleichen")
+    args = parser.parse_args()
+
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    result = run(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_result(result, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[INFO] Ergebnis gespeichert in {args.save}")
+
+if __name__ == "__main__":
+    main()
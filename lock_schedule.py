@@ -0,0 +1,239 @@
+# Wochenplan für Sperrzeiten
+#
+# Mehrere Sperrfenster pro Wochentag, Feiertage (ganztägig gesperrt) und
+# Ausnahmen an einzelnen Tagen (Zeitraum offen oder gesperrt). Der Plan wird
+# in eine Minuten-Bitmap über die ganze Woche (7 x 1440 Minuten) kompiliert.
+#
+# is_locked() merkt sich den aktuellen Zustand und den Zeitpunkt des nächsten
+# Wechsels - bis dahin kostet eine Abfrage nur einen Zeitvergleich, ohne
+# datetime-Rechnung. Erst beim Wechsel wird der nächste Abschnitt berechnet.
+#
+# Ein LockSchedule wird nach dem Erstellen nicht mehr verändert; Änderungen
+# erzeugen einen neuen Plan, der dann als Ganzes ausgetauscht wird.
+#
+# Fenster gelten von start (einschließlich) bis end (ausschließlich). Ist
+# end <= start, läuft das Fenster über Mitternacht; start == end sperrt
+# den ganzen Tag. Ausnahme: das alte tägliche Fenster (set_lock_start/end)
+# sperrt bei start == end wie bisher nie.
+
+import time as _time
+from datetime import date, datetime, timedelta
+
+MINUTES_PER_DAY = 1440
+DAYS = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
+
+OPEN = 0
+LOCKED = 1
+
+def parse_hhmm(text):
+    """Wandelt "HH:MM" in Minuten seit Mitternacht um"""
+    hour, minute = text.strip().split(":")
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"Ungültige Uhrzeit: {text}")
+    return hour * 60 + minute
+
+def format_hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def parse_days(text):
+    """Wandelt "Mo-Fr", "Sa+So", "Mi" oder "*" in eine Liste von Wochentagen (0=Mo) um"""
+    text = text.strip()
+    if text in ("*", "taeglich", "täglich"):
+        return list(range(7))
+    days = []
+    for part in text.split("+"):
+        part = part.strip()
+        if "-" in part:
+            first, last = (DAYS.index(p.strip().capitalize()) for p in part.split("-"))
+            day = first
+            days.append(day)
+            while day != last:
+                day = (day + 1) % 7
+                days.append(day)
+        else:
+            days.append(DAYS.index(part.capitalize()))
+    return sorted(set(days))
+
+def format_days(days):
+    if len(days) == 7:
+        return "täglich"
+    return "+".join(DAYS[d] for d in days)
+
+def parse_date(text):
+    """Wandelt "JJJJ-MM-TT" in die ISO-Form für den Plan um"""
+    return date.fromisoformat(text.strip()).isoformat()
+
+def make_window(days, start, end):
+    """Sperrfenster für den Plan aus Texteingaben ("Mo-Fr", "22:00", "05:00")"""
+    return {"days": parse_days(days) if isinstance(days, str) else sorted(set(days)),
+            "start": format_hhmm(parse_hhmm(start)), "end": format_hhmm(parse_hhmm(end))}
+
+def make_exception(day, start, end, state):
+    """Ausnahme für den Plan, state ist offen oder gesperrt"""
+    state = state.strip().lower()
+    if state not in ("offen", "gesperrt"):
+        raise ValueError("Zustand muss 'offen' oder 'gesperrt' sein")
+    return {"date": parse_date(day), "start": format_hhmm(parse_hhmm(start)),
+            "end": format_hhmm(parse_hhmm(end)), "locked": state == "gesperrt"}
+
+def _fill(bitmap, offset, start, end, value):
+    """Setzt [start, end) ab offset, Fenster über Mitternacht laufen in den nächsten Tag"""
+    length = len(bitmap)
+    if end <= start:
+        end += MINUTES_PER_DAY
+    for minute in range(offset + start, offset + end):
+        bitmap[minute % length] = value
+
+class LockSchedule:
+    """Kompilierter, unveränderlicher Sperrzeitenplan"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.daily = config.get("daily")
+        self.windows = [dict(w) for w in config.get("windows", [])]
+        self.holidays = sorted(set(config.get("holidays", [])))
+        self.exceptions = [dict(e) for e in config.get("exceptions", [])]
+
+        # Minuten-Bitmap der Woche: Index = Wochentag * 1440 + Minute
+        week = bytearray(7 * MINUTES_PER_DAY)
+        if self.daily:
+            start, end = parse_hhmm(self.daily["start"]), parse_hhmm(self.daily["end"])
+            for day in range(7 if start != end else 0):
+                _fill(week, day * MINUTES_PER_DAY, start, end, LOCKED)
+        for window in self.windows:
+            start, end = parse_hhmm(window["start"]), parse_hhmm(window["end"])
+            for day in window["days"]:
+                _fill(week, day * MINUTES_PER_DAY, start, end, LOCKED)
+        self._week = bytes(week)
+
+        self._holidays = {date.fromisoformat(d) for d in self.holidays}
+        self._exceptions = {}
+        for exception in self.exceptions:
+            day = date.fromisoformat(exception["date"])
+            self._exceptions.setdefault(day, []).append((
+                parse_hhmm(exception["start"]), parse_hhmm(exception["end"]),
+                LOCKED if exception["locked"] else OPEN))
+
+        self._empty = not any(self._week) and not self._holidays and \
+            not any(state == LOCKED for e in self._exceptions.values() for _, _, state in e)
+
+        # Zwischengespeicherter Abschnitt: (gültig ab, gültig bis, gesperrt)
+        # als ein Tupel, damit Leser nie einen halb aktualisierten Stand sehen
+        self._cache = (0.0, 0.0, False)
+
+    def to_config(self):
+        """Plan als JSON-taugliches dict (für settings.json)"""
+        return {
+            "daily": self.daily,
+            "windows": self.windows,
+            "holidays": self.holidays,
+            "exceptions": self.exceptions,
+        }
+
+    @property
+    def empty(self):
+        """True wenn der Plan nie sperrt"""
+        return self._empty
+
+    def is_locked(self, now=None):
+        """Prüft ob zum Zeitpunkt now (Unix-Zeit, Standard: jetzt) gesperrt ist"""
+        if now is None:
+            now = _time.time()
+        # Schneller Pfad: Zeitpunkt liegt im bereits berechneten Abschnitt
+        valid_from, valid_until, state = self._cache
+        if valid_from <= now < valid_until:
+            return state
+        return self._recompute(now)
+
+    def next_transition(self, now=None):
+        """Unix-Zeit des nächsten echten Wechsels ab now (inf wenn keiner in 8 Tagen)"""
+        if now is None:
+            now = _time.time()
+        _, until, locked = self._section(now)
+        for _ in range(8):
+            if until == float("inf"):
+                break
+            _, next_until, next_locked = self._section(until)
+            if next_locked != locked:
+                return until
+            until = next_until
+        return float("inf")
+
+    def day_profile(self, day):
+        """Sperrzustand jeder Minute eines Kalendertags (1440 Bytes)"""
+        offset = day.weekday() * MINUTES_PER_DAY
+        profile = bytearray(self._week[offset:offset + MINUTES_PER_DAY])
+        if day in self._holidays:
+            profile[:] = bytes([LOCKED]) * MINUTES_PER_DAY
+        for start, end, state in self._exceptions.get(day, ()):
+            # Ausnahmen gelten nur für diesen Tag, auch wenn end < start
+            end = end if end > start else MINUTES_PER_DAY
+            profile[start:end] = bytes([state]) * (end - start)
+        return profile
+
+    def _recompute(self, now):
+        """Berechnet den Abschnitt um now und merkt ihn sich für den schnellen Pfad"""
+        self._cache = self._section(now)
+        return self._cache[2]
+
+    def _section(self, now):
+        """(gültig ab, gültig bis, gesperrt) für den gleichbleibenden Abschnitt um now"""
+        if self._empty:
+            return (float("-inf"), float("inf"), False)
+
+        current = datetime.fromtimestamp(now)
+        day = current.date()
+        profile = self.day_profile(day)
+        minute = current.hour * 60 + current.minute
+        state = profile[minute]
+
+        # Nächster Wechsel am selben Tag - sonst spätestens um Mitternacht neu rechnen
+        other = bytes([OPEN if state == LOCKED else LOCKED])
+        change = profile.find(other, minute + 1)
+        midnight = datetime.combine(day, datetime.min.time())
+        if change == -1:
+            until = midnight + timedelta(days=1)
+        else:
+            until = midnight + timedelta(minutes=change)
+
+        return (current.replace(second=0, microsecond=0).timestamp(),
+                until.timestamp(), state == LOCKED)
+
+    def describe(self):
+        """Lesbare Zeilen für die Statusanzeige"""
+        lines = []
+        if self.daily:
+            lines.append(f"täglich {self.daily['start']} - {self.daily['end']}")
+        for window in self.windows:
+            lines.append(f"{format_days(window['days'])} {window['start']} - {window['end']}")
+        for holiday in self.holidays:
+            lines.append(f"Feiertag {holiday} (ganztägig gesperrt)")
+        for exception in self.exceptions:
+            state = "gesperrt" if exception["locked"] else "offen"
+            lines.append(f"Ausnahme {exception['date']} {exception['start']} - {exception['end']} {state}")
+        return lines
+
+def benchmark(lookups=1000000):
+    """Vergleicht is_locked() des Plans mit der alten datetime-Prüfung"""
+    import timeit
+    from datetime import time as dtime
+
+    schedule = LockSchedule({"windows": [
+        {"days": [0, 1, 2, 3, 4], "start": "22:00", "end": "05:00"},
+        {"days": [5, 6], "start": "00:00", "end": "00:00"}]})
+    lock_start, lock_end = dtime(22, 0), dtime(5, 0)
+
+    def legacy():
+        jetzt = datetime.now().time()
+        if lock_start <= lock_end:
+            return lock_start <= jetzt <= lock_end
+        return jetzt >= lock_start or jetzt <= lock_end
+
+    t_legacy = timeit.timeit(legacy, number=lookups)
+    t_schedule = timeit.timeit(schedule.is_locked, number=lookups)
+    print(f"datetime-Prüfung: {t_legacy / lookups * 1e9:6.0f} ns")
+    print(f"LockSchedule:     {t_schedule / lookups * 1e9:6.0f} ns")
+
+if __name__ == "__main__":
+    benchmark()
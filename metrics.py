@@ -0,0 +1,160 @@
+# Kennzahlen des Servers (Zähler, Latenz-Histogramme, Raten)
+#
+# Alle Werte werden nur im Event-Loop verändert und gelesen - keine Locks.
+# Export im OpenMetrics-Textformat über einen kleinen HTTP-Endpunkt
+# (GET /metrics), z. B. für Prometheus:
+#   curl http://127.0.0.1:9150/metrics
+#
+# Histogramme haben feste Bucket-Grenzen (in Sekunden); ein observe() kostet
+# eine binäre Suche und zwei Additionen. Quantile werden aus den Buckets
+# geschätzt (obere Grenze des Buckets, in dem das Quantil liegt).
+
+import asyncio
+import collections
+import time
+from bisect import bisect_left
+
+# Zutrittsentscheidungen: 10 µs .. 10 s
+LATENCY_BUCKETS = (10e-6, 25e-6, 50e-6, 100e-6, 250e-6, 500e-6,
+                   1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3, 100e-3,
+                   250e-3, 500e-3, 1.0, 2.5, 5.0, 10.0)
+# Broadcasts an viele Clients: 1 ms .. 60 s
+BROADCAST_BUCKETS = (1e-3, 5e-3, 10e-3, 50e-3, 100e-3, 250e-3, 500e-3,
+                     1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+class Counter:
+    """Monoton steigender Zähler"""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Histogram:
+    """Verteilung von Messwerten in festen Buckets"""
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # letzter Bucket = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Schätzt das Quantil q (0..1) aus den Buckets"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self):
+        """Kurzfassung für show_status"""
+        return (f"p50 {self.quantile(0.5) * 1000:.2f} ms, "
+                f"p99 {self.quantile(0.99) * 1000:.2f} ms, "
+                f"max {self.max * 1000:.2f} ms ({self.count} Messungen)")
+
+class RateMeter:
+    """Ereignisse pro Sekunde über ein gleitendes Fenster"""
+
+    def __init__(self, window=10):
+        self.window = window
+        self._seconds = collections.deque()   # [Sekunde, Anzahl]
+
+    def mark(self, amount=1):
+        now = int(time.monotonic())
+        seconds = self._seconds
+        if seconds and seconds[-1][0] == now:
+            seconds[-1][1] += amount
+        else:
+            seconds.append([now, amount])
+            while seconds[0][0] <= now - self.window:
+                seconds.popleft()
+
+    def rate(self):
+        """Durchschnitt der letzten window Sekunden"""
+        cutoff = int(time.monotonic()) - self.window
+        return sum(n for second, n in self._seconds if second > cutoff) / self.window
+
+def _labels(labels, extra=None):
+    items = list(labels.items()) if labels else []
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+def render(families):
+    """Erzeugt den OpenMetrics-Text
+
+    families: Liste von (Name, Typ, Hilfetext, Samples) mit Typ "counter",
+    "gauge" oder "histogram" und Samples als Liste von (Labels-dict, Wert).
+    Bei Histogrammen ist der Wert ein Histogram, bei Zählern eine Zahl oder Counter.
+    """
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"# HELP {name} {help_text}")
+        for labels, value in samples:
+            if kind == "histogram":
+                cumulative = 0
+                for bound, n in zip(value.bounds + (float("inf"),), value.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_labels(labels, ('le', _number(float(bound))))} {cumulative}")
+                lines.append(f"{name}_count{_labels(labels)} {value.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value.sum)}")
+            elif kind == "counter":
+                if isinstance(value, Counter):
+                    value = value.value
+                lines.append(f"{name}_total{_labels(labels)} {_number(value)}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+async def start_metrics_server(host, port, collect):
+    """Startet den HTTP-Endpunkt, collect() liefert den OpenMetrics-Text"""
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5.0)
+            # Header überspringen - werden nicht gebraucht
+            while (await asyncio.wait_for(reader.readline(), 5.0)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+                status, content_type, body = "200 OK", CONTENT_TYPE, collect().encode("utf-8")
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"nicht gefunden\n"
+            writer.write((f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                          f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port, reuse_address=True)
@@ -0,0 +1,118 @@
+# Binäres Übertragungsprotokoll (läuft neben dem alten Textprotokoll)
+#
+# Jede Nachricht ist ein Frame mit festem 8-Byte Header (big-endian):
+#   Marker (u8, 0xAC) | Typ (u8) | Request-ID (u16) | Payload-Länge (u32)
+# danach folgt die Payload. UIDs werden als u32 übertragen (4 statt 8 Byte).
+#
+# Der Marker 0xAC kann nie am Anfang einer Text-Personalnummer stehen,
+# daran erkennt der Server am ersten Byte welches Protokoll ein Client spricht.
+# Antworten tragen die Request-ID der Anfrage - ein Client darf also mehrere
+# Anfragen gleichzeitig offen haben (Pipelining).
+#
+# Listen-Synchronisation: der Client meldet mit SYNC seine Listenversion und
+# den Inhalts-Hash. Der Server antwortet mit LIST_CURRENT (nichts zu tun),
+# LIST_DELTA (nur Änderungen) oder UPDATE_LIST (komplette Liste).
+# Alle drei beginnen mit LIST_INFO = neue Version (u32) + Hash (u64).
+
+import struct
+import sys
+from array import array
+
+MARKER = 0xAC
+HEADER = struct.Struct(">BBHI")
+UID = struct.Struct(">I")
+LIST_INFO = struct.Struct(">IQ")
+DELTA_INFO = struct.Struct(">IQI")   # LIST_INFO + Anzahl hinzugefügter UIDs
+MAX_PAYLOAD = 64 * 1024 * 1024   # Schutz gegen unsinnige Längenangaben
+
+# Nachrichtentypen
+MSG_CHECK = 0x01         # Client -> Server: Payload = UID (u32)
+MSG_ALLOW = 0x02         # Server -> Client: Zutritt erlaubt
+MSG_DENY = 0x03          # Server -> Client: Zutritt verweigert
+MSG_UPDATE_LIST = 0x04   # Server -> Client: LIST_INFO + n x UID (u32), sortiert
+MSG_SYNC = 0x05          # Client -> Server: LIST_INFO des Clients (leer = unbekannt)
+MSG_LIST_DELTA = 0x06    # Server -> Client: DELTA_INFO + hinzugefügte + entfernte UIDs
+MSG_LIST_CURRENT = 0x07  # Server -> Client: LIST_INFO, Client ist bereits aktuell
+MSG_ERROR = 0x7F         # Server -> Client: Payload = Fehlertext (utf-8)
+
+PUSH_REQUEST_ID = 0      # Request-ID für Nachrichten ohne vorherige Anfrage
+
+class ProtocolError(Exception):
+    """Ungültiger Frame im Datenstrom"""
+
+def encode_frame(msg_type, request_id=PUSH_REQUEST_ID, payload=b""):
+    """Baut einen kompletten Frame aus Typ, Request-ID und Payload"""
+    return HEADER.pack(MARKER, msg_type, request_id, len(payload)) + payload
+
+def decode_header(header):
+    """Zerlegt einen 8-Byte Header in (Typ, Request-ID, Payload-Länge)"""
+    marker, msg_type, request_id, length = HEADER.unpack(header)
+    if marker != MARKER:
+        raise ProtocolError(f"Ungültiger Marker 0x{marker:02X}")
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"Payload zu groß: {length} Bytes")
+    return msg_type, request_id, length
+
+def encode_uid_list(values):
+    """Packt aufsteigende UIDs (int) als u32 big-endian hintereinander"""
+    uids = values[:] if isinstance(values, array) else array("I", values)
+    if sys.byteorder == "little":
+        uids.byteswap()
+    return uids.tobytes()
+
+def decode_uid_list(payload):
+    """Entpackt eine UPDATE_LIST-Payload in ein array von UIDs (int)"""
+    if len(payload) % UID.size:
+        raise ProtocolError("UID-Liste hat ungültige Länge")
+    uids = array("I")
+    uids.frombytes(payload)
+    if sys.byteorder == "little":
+        uids.byteswap()
+    return uids
+
+def encode_list_payload(version, list_hash, values):
+    """Payload für UPDATE_LIST - kann für alle Clients wiederverwendet werden"""
+    return LIST_INFO.pack(version, list_hash) + encode_uid_list(values)
+
+def encode_list_full(request_id, payload):
+    """Frame mit der kompletten Liste (Payload aus encode_list_payload)"""
+    return encode_frame(MSG_UPDATE_LIST, request_id, payload)
+
+def encode_list_delta(request_id, version, list_hash, added, removed):
+    """Frame mit den Änderungen seit dem Stand des Clients"""
+    payload = (DELTA_INFO.pack(version, list_hash, len(added))
+               + encode_uid_list(added) + encode_uid_list(removed))
+    return encode_frame(MSG_LIST_DELTA, request_id, payload)
+
+def encode_list_current(request_id, version, list_hash):
+    """Frame für einen Client, dessen Liste bereits aktuell ist"""
+    return encode_frame(MSG_LIST_CURRENT, request_id, LIST_INFO.pack(version, list_hash))
+
+def decode_list_info(payload):
+    """Liest (Version, Hash) aus einer SYNC-Payload, None wenn der Client keinen Stand hat"""
+    if len(payload) != LIST_INFO.size:
+        return None
+    return LIST_INFO.unpack(payload)
+
+class FrameDecoder:
+    """Zerlegt einen beliebig segmentierten Bytestrom in vollständige Frames"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Nimmt empfangene Bytes auf und liefert alle fertigen Frames"""
+        self._buffer += data
+        frames = []
+        offset = 0
+        buffer = self._buffer
+        while len(buffer) - offset >= HEADER.size:
+            msg_type, request_id, length = decode_header(buffer[offset:offset + HEADER.size])
+            end = offset + HEADER.size + length
+            if len(buffer) < end:
+                break
+            frames.append((msg_type, request_id, bytes(buffer[offset + HEADER.size:end])))
+            offset = end
+        if offset:
+            del buffer[:offset]
+        return frames
@@ -1,187 +1,783 @@
 #IMPORTS
 
-import socket
+import asyncio
+import concurrent.futures
+import multiprocessing
+import signal
 import threading
 import sys
 import os
+import time as _time
 from datetime import datetime, time
 
+import protocol
+from broadcast import Outbox, BroadcastTracker
+from access_store import AccessStore, AccessReader, GEN_SETTINGS, GEN_BROADCAST
+from audit_log import AuditLog
+from list_reload import ListWatcher, load_into_store
+from admin_api import start_admin_server
+from list_io import MODES, import_into_store, export_store, log_progress
+from metrics import (Counter, Histogram, RateMeter, BROADCAST_BUCKETS,
+                     render as render_metrics, start_metrics_server)
+from lock_schedule import LockSchedule, DAYS, format_days, make_window, make_exception, parse_date
+
+try:
+    import resource  # nur Unix - Limit für offene Dateien anheben
+except ImportError:
+    resource = None
+
 #KONFIGURATION
 
 HOST = "0.0.0.0"   # auf allen Netzwerk-Interfaces lauschen
-PORT = 5050        # Port >1024 wg. Admin-Rechten
+PORT = int(os.environ.get("ACCESS_PORT", "5050"))   # Port >1024 wg. Admin-Rechten, ACCESS_PORT überschreibt ihn
+LISTEN_BACKLOG = 1024  # Warteschlange für gleichzeitige Verbindungsaufbauten
+
+# Worker-Prozesse, die sich den Port per SO_REUSEPORT teilen (nur Linux/BSD).
+# 1 = alles in einem Prozess. Bei mehr Workern bleibt dieser Prozess der
+# Admin-Prozess: er schreibt Liste und Einstellungen, die Worker lesen sie
+# über dieselben mmap-Dateien (siehe AccessReader in access_store.py).
+WORKERS = int(os.environ.get("ACCESS_WORKERS", "1"))
+WATCH_INTERVAL = 0.05   # Sekunden zwischen zwei Blicken der Worker auf Änderungen
+# Datenordner, ACCESS_DATA_DIR überschreibt ihn (z. B. für loadgen.py)
+DATA_DIR = os.environ.get("ACCESS_DATA_DIR") or \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Listendatei, die beobachtet und bei Änderungen live übernommen wird
+# (siehe list_reload.py), None = keine. ACCESS_LIST_FILE überschreibt sie.
+LIST_FILE = os.environ.get("ACCESS_LIST_FILE") or None
+LIST_FILE_INTERVAL = 2.0   # Sekunden zwischen zwei Blicken auf die Datei
+LIST_FILE_PUSH = False     # nach dem Laden sofort update_local_list an alle Clients
+
+# Audit-Log der Zutrittsversuche (siehe audit_log.py)
+AUDIT_DIR = os.path.join(DATA_DIR, "audit")
+AUDIT_MAX_BYTES = 10 * 1024 * 1024   # Rotation ab dieser Dateigröße
+AUDIT_BACKUPS = 5                    # Anzahl aufbewahrter alter Logdateien
+AUDIT_ECHO = True                    # Zutrittsversuche zusätzlich im Terminal ausgeben
+
+# Ausgangswarteschlange je Client für Broadcasts (siehe broadcast.py)
+OUTBOX_MAX_MESSAGES = 8              # wartende Nachrichten pro Client
+OUTBOX_MAX_BYTES = 16 * 1024 * 1024  # wartende Bytes pro Client
+OUTBOX_POLICY = "drop_oldest"        # "drop_oldest", "drop_new" oder "disconnect"
+SEND_TIMEOUT = 10.0                  # Sekunden bis ein hängender Client getrennt wird
+
+# Lokale Admin-Schnittstelle für Batches (siehe admin_api.py), False = deaktiviert
+ADMIN_API = True
+
+# Kennzahlen im OpenMetrics-Format (siehe metrics.py), None = deaktiviert
+METRICS_HOST = "127.0.0.1"   # nur lokal erreichbar
+METRICS_PORT = 9150
+METRICS_PER_CLIENT = True    # Latenz-Histogramm je Verbindung exportieren
 
 #Zutrittsliste (Personalnummern)
 
-userID = ['F39A370E', '20047935', '00220394', '72349395']
-# userID = ['F39A370E', '20047935', '00220394', '72349395']
-# userID = ['20047935', '00220394', '72349395']
+# Standardliste - wird nur beim allerersten Start in den Speicher übernommen
+DEFAULT_USER_IDS = ['F39A370E', '20047935', '00220394', '72349395']
+# DEFAULT_USER_IDS = ['20047935', '00220394', '72349395']
+
+# Persistente Zutrittsliste (AccessStore), wird in main() geöffnet
+userID = None
+
+# Audit-Log (AuditLog), wird in main() geöffnet
+audit_log = None
+
+# Beobachter der Listendatei (ListWatcher), nur wenn LIST_FILE gesetzt ist
+list_watcher = None
+
+# Entscheidungen lesen userID und lock_schedule ohne Sperre: beide sind
+# unveränderliche Stände, die bei Änderungen als Ganzes ersetzt werden.
 
 #Sperrzeitfenster (Standardwerte: kein Sperrzeitfenster aktiv)
-lock_start = None  # Beginn des Sperr-Zeitfensters
-lock_end = None    # Ende des Sperr-Zeitfensters
+lock_start = None  # Beginn des täglichen Sperr-Zeitfensters
+lock_end = None    # Ende des täglichen Sperr-Zeitfensters
+
+# Kompilierter Wochenplan (tägliches Fenster + Wochenfenster, Feiertage, Ausnahmen)
+lock_schedule = LockSchedule()
+
+# Aktive Client-Verbindungen für update_local_list: StreamWriter -> Client
+# Wird nur im Event-Loop verändert; andere Threads lesen über run_in_loop()
+PROTO_TEXT = "text"
+PROTO_BINARY = "binary"
+connected_clients = {}
+
+# Letzter Broadcast (BroadcastTracker) für show_status
+last_broadcast = None
 
-# Aktive Client-Verbindungen für update_local_list
-connected_clients = []
+# Kennzahlen - werden nur im Event-Loop verändert
+decision_counts = {"allow": Counter(), "deny": Counter(), "locked": Counter()}
+decision_rate = RateMeter()
+latency_decision = Histogram()   # Empfang -> Entscheidung
+latency_send = Histogram()       # Entscheidung -> an Socket übergeben
+latency_total = Histogram()      # Empfang -> an Socket übergeben
+broadcast_duration = Histogram(BROADCAST_BUCKETS)   # Broadcast bis zum letzten Client
+broadcast_delivery = Histogram(BROADCAST_BUCKETS)   # Zustelldauer je Client
+broadcast_failures = Counter()
 
-# Server-Socket Referenz für sauberes Beenden
-server_socket_ref = None
+class Client:
+    """Zustand einer Client-Verbindung"""
+
+    def __init__(self, writer, proto):
+        self.writer = writer
+        self.proto = proto
+        self.peer = "%s:%s" % writer.get_extra_info("peername")[:2]
+        self.latency = Histogram()   # Empfang -> an Socket übergeben
+        # Zuletzt an den Client zugestellter Listenstand (None = unbekannt)
+        self.list_version = None
+        self.list_hash = None
+        # Ausgangswarteschlange für Broadcasts - läuft als eigener Task
+        self.outbox = Outbox(writer, OUTBOX_MAX_MESSAGES, OUTBOX_MAX_BYTES,
+                             OUTBOX_POLICY, SEND_TIMEOUT)
+
+    def list_delivered(self, version, list_hash):
+        """Wird aufgerufen sobald ein Listen-Frame beim Client angekommen ist"""
+        self.list_version, self.list_hash = version, list_hash
+
+# Event-Loop und Server Referenz für Befehle aus dem Eingabe-Thread
+server_loop = None
+server_ref = None
 shutdown_flag = False
+admin_lock = threading.Lock()   # ein Admin-Batch nach dem anderen (admin_api.py)
+
+# Mehrprozessbetrieb: Nummer dieses Workers (None = kein Worker) bzw.
+# die gestarteten Worker-Prozesse im Admin-Prozess
+worker_index = None
+worker_processes = []
+_settings_seen = None   # zuletzt übernommene Einstellungs-Generation
 
 #Sperrzeitfenster prüfen - gibt True zurück wenn GESPERRT
 
 def is_locked():
     """Prüft ob aktuell ein Sperrzeitfenster aktiv ist"""
-    if lock_start is None or lock_end is None:
-        return False
-    
-    jetzt = datetime.now().time()
-    
-    # Fall 1: Sperrzeitfenster liegt am selben Tag (z. B. 08:00–17:00)
-    if lock_start <= lock_end:
-        return lock_start <= jetzt <= lock_end
-    # Fall 2: Sperrzeitfenster geht über Mitternacht (z. B. 22:00–05:00)
-    else:
-        return jetzt >= lock_start or jetzt <= lock_end
+    # Bis zum nächsten Wechsel nur ein Zeitvergleich (siehe lock_schedule.py)
+    return lock_schedule.is_locked()
 
 def log_access_attempt(personalnummer, result, reason=""):
-    """Gibt alle Zutrittsversuche im Terminal aus"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    if reason:
-        print(f"[{timestamp}] Personalnummer: {personalnummer} -> {result} ({reason})")
-    else:
-        print(f"[{timestamp}] Personalnummer: {personalnummer} -> {result}")
+    """Protokolliert einen Zutrittsversuch (Datei + Terminal erledigt der Audit-Thread)"""
+    audit_log.log(personalnummer, result, reason)
 
-def handle_client(conn, addr):
-    """Behandelt eine Client-Verbindung"""
-    global shutdown_flag
+def check_access(personalnummer):
+    """Trifft die Zutrittsentscheidung und gibt ALLOW oder DENY zurück"""
+    # Prüflogik gemäß Lastenheft
+    decision_rate.mark()
+    if worker_index is not None and (userID.stale() or userID.generation(GEN_SETTINGS) != _settings_seen):
+        # Nur zwei Zähler vergleichen - nachgeladen wird lediglich nach einer
+        # Änderung des Admin-Prozesses, die watch_admin noch nicht übernommen hat
+        sync_shared_state()
+    if is_locked():
+        # Sperrzeitfenster aktiv - niemand hat Zutritt
+        decision_counts["locked"].inc()
+        log_access_attempt(personalnummer, "DENY", "Sperrzeitfenster aktiv")
+        return "DENY"
+    if personalnummer in userID:
+        # Personalnummer in Zutrittsliste gefunden
+        decision_counts["allow"].inc()
+        log_access_attempt(personalnummer, "ALLOW")
+        return "ALLOW"
+    # Personalnummer nicht in Zutrittsliste
+    decision_counts["deny"].inc()
+    log_access_attempt(personalnummer, "DENY", "Personalnummer nicht berechtigt")
+    return "DENY"
+
+def record_latency(client, received, decided, sent):
+    """Trägt die Zeiten einer Anfrage in die Histogramme ein"""
+    latency_decision.observe(decided - received)
+    latency_send.observe(sent - decided)
+    latency_total.observe(sent - received)
+    client.latency.observe(sent - received)
+
+async def handle_text_client(client, reader, writer, data):
+    """Textprotokoll: jede empfangene Nachricht ist eine Personalnummer"""
+    clock = _time.perf_counter
+    while data:
+        received = clock()
+        personalnummer = data.decode('utf-8').strip()
+        response = check_access(personalnummer)
+        decided = clock()
+        writer.write(response.encode('utf-8'))
+        await writer.drain()
+        record_latency(client, received, decided, clock())
+        # Kein Timeout nötig - die Coroutine schläft bis Daten ankommen
+        data = await reader.read(1024)
+
+# Zuletzt kodierte komplette Liste: (Version, Hash, Payload)
+_full_list_cache = (None, None, None)
+
+def full_list_payload():
+    """UPDATE_LIST-Payload der aktuellen Liste, wird nur einmal pro Version kodiert"""
+    global _full_list_cache
+    version, list_hash = userID.version, userID.hash
+    if _full_list_cache[:2] != (version, list_hash):
+        payload = protocol.encode_list_payload(version, list_hash, userID.values_array())
+        _full_list_cache = (version, list_hash, payload)
+    return _full_list_cache[2]
+
+def build_list_frame(request_id, list_info):
+    """Wählt für einen Client-Stand LIST_CURRENT, LIST_DELTA oder die ganze Liste"""
+    version, list_hash = userID.version, userID.hash
+    diff = userID.diff_since(*list_info) if list_info else None
+    if diff is None:
+        return protocol.encode_list_full(request_id, full_list_payload())
+    added, removed = diff
+    if not added and not removed:
+        return protocol.encode_list_current(request_id, version, list_hash)
+    return protocol.encode_list_delta(request_id, version, list_hash, added, removed)
+
+def handle_frame(client, msg_type, request_id, payload):
+    """Beantwortet einen Frame des Binärprotokolls"""
+    if msg_type == protocol.MSG_CHECK:
+        if len(payload) != protocol.UID.size:
+            return protocol.encode_frame(
+                protocol.MSG_ERROR, request_id,
+                f"CHECK erwartet {protocol.UID.size} Bytes, erhalten {len(payload)}".encode('utf-8'))
+        # UID direkt als Integer prüfen - keine String-Umwandlung
+        personalnummer = protocol.UID.unpack(payload)[0]
+        if check_access(personalnummer) == "ALLOW":
+            return protocol.encode_frame(protocol.MSG_ALLOW, request_id)
+        return protocol.encode_frame(protocol.MSG_DENY, request_id)
+    if msg_type == protocol.MSG_SYNC:
+        # Client meldet seinen Listenstand - nur die Differenz schicken
+        frame = build_list_frame(request_id, protocol.decode_list_info(payload))
+        # Noch wartender Push ist durch diese Antwort überholt
+        client.outbox.cancel("list")
+        client.list_version, client.list_hash = userID.version, userID.hash
+        return frame
+    return protocol.encode_frame(
+        protocol.MSG_ERROR, request_id,
+        f"Unbekannte Nachricht 0x{msg_type:02X}".encode('utf-8'))
+
+async def handle_binary_client(client, reader, writer, data):
+    """Binärprotokoll: Frames mit Request-ID, mehrere Anfragen dürfen offen sein"""
+    decoder = protocol.FrameDecoder()
+    clock = _time.perf_counter
+    while data:
+        received = clock()
+        decided = []
+        # Ein Segment kann mehrere oder nur Teile von Frames enthalten
+        for msg_type, request_id, payload in decoder.feed(data):
+            writer.write(handle_frame(client, msg_type, request_id, payload))
+            if msg_type == protocol.MSG_CHECK and len(payload) == protocol.UID.size:
+                decided.append(clock())
+        await writer.drain()
+        sent = clock()
+        for t in decided:
+            record_latency(client, received, t, sent)
+        data = await reader.read(65536)
+
+async def handle_client(reader, writer):
+    """Behandelt eine Client-Verbindung als Coroutine im Event-Loop"""
+    addr = writer.get_extra_info("peername")
     print(f"[INFO] Verbunden mit {addr}")
-    connected_clients.append(conn)
-    
-    try:
-        while not shutdown_flag:
-            conn.settimeout(1.0)  # Timeout für regelmäßige Shutdown-Prüfung
-            try:
-                data = conn.recv(1024)
-            except socket.timeout:
-                continue
-            
-            if not data:
-                print(f"[INFO] Client {addr} beendet Verbindung")
-                break
+    # drain() erst zurückgeben wenn alles an den Socket übergeben ist
+    writer.transport.set_write_buffer_limits(high=0)
 
-            personalnummer = data.decode('utf-8').strip()
-            
-            # Prüflogik gemäß Lastenheft
-            if is_locked():
-                # Sperrzeitfenster aktiv - niemand hat Zutritt
-                response = "DENY"
-                log_access_attempt(personalnummer, "DENY", "Sperrzeitfenster aktiv")
-            elif personalnummer in userID:
-                # Personalnummer in Zutrittsliste gefunden
-                response = "ALLOW"
-                log_access_attempt(personalnummer, "ALLOW")
-            else:
-                # Personalnummer nicht in Zutrittsliste
-                response = "DENY"
-                log_access_attempt(personalnummer, "DENY", "Personalnummer nicht berechtigt")
-            
-            conn.sendall(response.encode('utf-8'))
-    except ConnectionResetError:
+    try:
+        data = await reader.read(1024)
+        # Erstes Byte entscheidet über das Protokoll
+        if data and data[0] == protocol.MARKER:
+            client = connected_clients[writer] = Client(writer, PROTO_BINARY)
+            await handle_binary_client(client, reader, writer, data)
+        else:
+            client = connected_clients[writer] = Client(writer, PROTO_TEXT)
+            await handle_text_client(client, reader, writer, data)
+        print(f"[INFO] Client {addr} beendet Verbindung")
+    except (ConnectionResetError, BrokenPipeError):
         print(f"[INFO] Verbindung zu {addr} wurde zurückgesetzt")
+    except protocol.ProtocolError as e:
+        print(f"[ERROR] Protokollfehler bei Client {addr}: {e}")
+    except asyncio.CancelledError:
+        pass
     except Exception as e:
         if not shutdown_flag:
             print(f"[ERROR] Fehler bei Client {addr}: {e}")
     finally:
-        if conn in connected_clients:
-            connected_clients.remove(conn)
+        client = connected_clients.pop(writer, None)
+        if client:
+            client.outbox.close()
         try:
-            conn.close()
+            writer.close()
         except:
             pass
 
-def send_update_local_list():
-    """Sendet die aktuelle Zutrittsliste an alle verbundenen ESP32s"""
+def _report_broadcast(tracker):
+    broadcast_duration.observe(tracker.finished - tracker.started)
+    for latency in tracker.latencies:
+        broadcast_delivery.observe(latency)
+    broadcast_failures.inc(sum(tracker.failures.values()))
+    print(f"[BROADCAST] {tracker.summary()}")
+
+def _broadcast():
+    """Reiht für jeden Client die Änderungen seit seinem Stand ein (läuft im Event-Loop)"""
+    global last_broadcast
     if not connected_clients:
         print("[INFO] Keine Clients verbunden")
         return
-    
-    # Format: UPDATE_LIST:id1,id2,id3,...
-    list_data = "UPDATE_LIST:" + ",".join(userID)
-    
-    for client in connected_clients[:]:  # Kopie der Liste iterieren
+    version, list_hash = userID.version, userID.hash
+    frames = {}   # Client-Stand -> fertiger Frame, wird für gleiche Stände geteilt
+    text_message = None
+    sent = {"komplett": 0, "delta": 0, "aktuell": 0}
+    tracker = BroadcastTracker(f"Liste v{version}", _report_broadcast)
+
+    for client in list(connected_clients.values()):  # Kopie iterieren
+        if client.proto == PROTO_TEXT:
+            # Textprotokoll kennt keine Versionen - immer komplette Liste
+            # Format: UPDATE_LIST:id1,id2,id3,...
+            if text_message is None:
+                text_message = ("UPDATE_LIST:" + ",".join(userID)).encode('utf-8')
+            frame = text_message
+            sent["komplett"] += 1
+        elif client.list_hash == list_hash:
+            client.outbox.cancel("list")
+            sent["aktuell"] += 1
+            continue
+        else:
+            key = (client.list_version, client.list_hash)
+            if key not in frames:
+                list_info = key if client.list_version is not None else None
+                frames[key] = build_list_frame(protocol.PUSH_REQUEST_ID, list_info)
+            frame = frames[key]
+            msg_type = frame[1]  # Typ-Byte im Frame-Header
+            sent["delta" if msg_type == protocol.MSG_LIST_DELTA else "komplett"] += 1
+
+        # Nur einreihen - der Sende-Task des Clients schreibt, niemand wartet hier
+        tracker.add_target()
+        client.outbox.push(
+            frame, key="list", tracker=tracker,
+            on_delivered=lambda c=client: c.list_delivered(version, list_hash))
+
+    print(f"[INFO] Lokale Liste v{version} eingereiht: {sent['delta']} Delta, "
+          f"{sent['komplett']} komplett, {sent['aktuell']} bereits aktuell")
+    last_broadcast = tracker
+    tracker.seal()
+
+def send_update_local_list():
+    """Sendet die Änderungen der Zutrittsliste an alle verbundenen ESP32s"""
+    if worker_processes:
+        # Die Clients hängen an den Workern - die senden selbst
+        userID.request_broadcast()
+        print(f"[INFO] Listen-Update an {len(worker_processes)} Worker angefordert")
+        return
+    # Sockets gehören dem Event-Loop - Senden dort einplanen
+    server_loop.call_soon_threadsafe(_broadcast)
+
+def add_user(personalnummer):
+    """Fügt eine Personalnummer zur Zutrittsliste hinzu"""
+    with admin_lock:
         try:
-            client.sendall(list_data.encode('utf-8'))
-            print(f"[INFO] Lokale Liste an Client gesendet")
-        except Exception as e:
-            print(f"[ERROR] Fehler beim Senden: {e}")
-            if client in connected_clients:
-                connected_clients.remove(client)
+            if userID.add(personalnummer):
+                print(f"[INFO] Personalnummer {personalnummer} hinzugefügt")
+            else:
+                print(f"[INFO] Personalnummer {personalnummer} bereits vorhanden")
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+
+def remove_user(personalnummer):
+    """Entfernt eine Personalnummer aus der Zutrittsliste"""
+    with admin_lock:
+        try:
+            if userID.remove(personalnummer):
+                print(f"[INFO] Personalnummer {personalnummer} entfernt")
+            else:
+                print(f"[INFO] Personalnummer {personalnummer} nicht in der Liste")
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+
+def list_reloaded(result):
+    """Meldung nach dem Neuladen der Listendatei (läuft im Beobachter-Thread)"""
+    if not result.ok:
+        print(f"[ERROR] Listendatei {result.path} abgelehnt: {result.error_count} ungültige Zeile(n)")
+        for number, text in result.errors:
+            print(f"  Zeile {number}: {text}")
+        return
+    if not result.changed:
+        print(f"[INFO] Listendatei {result.path} unverändert ({result.count} Einträge)")
+        return
+    print(f"[INFO] Listendatei geladen: {result.count} Einträge "
+          f"({result.duplicates} doppelt) in {result.duration:.2f} s, Version {userID.version}")
+    if LIST_FILE_PUSH:
+        send_update_local_list()
+
+def reload_list(path=None):
+    """Lädt die Listendatei sofort (optional eine andere Datei einmalig)"""
+    if path:
+        target = lambda: list_reloaded(load_into_store(path, userID))
+    elif list_watcher:
+        target = list_watcher.reload
+    else:
+        print("[ERROR] Keine Listendatei konfiguriert (LIST_FILE). Verwende: reload_list(pfad)")
+        return
+    # Eigener Thread - der Eingabe-Thread bleibt für weitere Befehle frei
+    threading.Thread(target=target, daemon=True).start()
+
+def import_list(path, mode="replace"):
+    """Importiert eine CSV/JSON-Lines/Text-Datei (Einlesen im Hilfsprozess)"""
+    mode = mode.strip().lower() or "replace"
+    if mode not in MODES:
+        print(f"[ERROR] Unbekannter Modus '{mode}'. Erlaubt: {', '.join(MODES)}")
+        return
+
+    def run():
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            result = import_into_store(userID, path, mode, executor, progress=log_progress)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Import von {path} fehlgeschlagen: {e}")
+            return
+        finally:
+            executor.shutdown()
+        if not result.ok:
+            print(f"[ERROR] Import von {path} abgelehnt: {result.error_count} ungültige Zeile(n)")
+            for number, text in result.errors:
+                print(f"  Zeile {number}: {text}")
+            return
+        print(f"[INFO] Import ({mode}): {result.summary()}, Version {userID.version}"
+              + ("" if result.changed else " (unverändert)"))
+        if result.changed and LIST_FILE_PUSH:
+            send_update_local_list()
+
+    threading.Thread(target=run, daemon=True).start()
+
+def export_list(path):
+    """Schreibt die Zutrittsliste in eine Datei (Format nach Endung)"""
+
+    def run():
+        try:
+            count = export_store(userID, path)
+        except OSError as e:
+            print(f"[ERROR] Export nach {path} fehlgeschlagen: {e}")
+            return
+        print(f"[INFO] {count} Einträge nach {path} exportiert")
+
+    threading.Thread(target=run, daemon=True).start()
+
+def load_lock_window():
+    """Lädt das gespeicherte Sperrzeitfenster und den Wochenplan aus dem Speicher"""
+    global lock_start, lock_end
+    settings = userID.load_settings()
+    try:
+        lock_start = time.fromisoformat(settings["lock_start"]) if settings.get("lock_start") else None
+        lock_end = time.fromisoformat(settings["lock_end"]) if settings.get("lock_end") else None
+        rebuild_schedule(settings.get("schedule"), save=False)
+    except (ValueError, KeyError) as e:
+        print(f"[ERROR] Gespeichertes Sperrzeitfenster ungültig: {e}")
+
+def save_lock_window():
+    """Speichert Sperrzeitfenster und Wochenplan, damit sie einen Neustart überstehen"""
+    settings = userID.load_settings()
+    settings["lock_start"] = lock_start.strftime('%H:%M') if lock_start else None
+    settings["lock_end"] = lock_end.strftime('%H:%M') if lock_end else None
+    config = lock_schedule.to_config()
+    del config["daily"]  # steckt schon in lock_start/lock_end
+    settings["schedule"] = config
+    userID.save_settings(settings)
+
+def build_schedule(config, start, end):
+    """Kompiliert einen Wochenplan mit täglichem Fenster, ohne ihn zu übernehmen"""
+    config = dict(config)
+    if start and end:
+        config["daily"] = {"start": start.strftime('%H:%M'), "end": end.strftime('%H:%M')}
+    else:
+        config["daily"] = None
+    return LockSchedule(config)
+
+def rebuild_schedule(config=None, save=True):
+    """Kompiliert den Wochenplan neu und tauscht ihn in einem Schritt aus"""
+    global lock_schedule
+    lock_schedule = build_schedule(config if config is not None else lock_schedule.to_config(),
+                                   lock_start, lock_end)
+    if save:
+        save_lock_window()
+
+def add_lock_window(days, start, end):
+    """Fügt ein Sperrfenster für bestimmte Wochentage hinzu"""
+    with admin_lock:
+        window = make_window(days, start, end)
+        config = lock_schedule.to_config()
+        config["windows"] = config["windows"] + [window]
+        rebuild_schedule(config)
+        print(f"[INFO] Sperrfenster hinzugefügt: {format_days(window['days'])} {window['start']} - {window['end']}")
+
+def add_holiday(day):
+    """Sperrt einen Kalendertag ganztägig"""
+    with admin_lock:
+        day = parse_date(day)
+        config = lock_schedule.to_config()
+        config["holidays"] = config["holidays"] + [day]
+        rebuild_schedule(config)
+        print(f"[INFO] Feiertag {day} hinzugefügt")
+
+def remove_holiday(day):
+    """Entfernt einen Feiertag"""
+    with admin_lock:
+        day = parse_date(day)
+        config = lock_schedule.to_config()
+        if day not in config["holidays"]:
+            print(f"[INFO] Feiertag {day} nicht vorhanden")
+            return
+        config["holidays"] = [d for d in config["holidays"] if d != day]
+        rebuild_schedule(config)
+        print(f"[INFO] Feiertag {day} entfernt")
+
+def add_exception(day, start, end, state):
+    """Legt für einen Kalendertag einen Zeitraum als offen oder gesperrt fest"""
+    with admin_lock:
+        exception = make_exception(day, start, end, state)
+        config = lock_schedule.to_config()
+        config["exceptions"] = config["exceptions"] + [exception]
+        rebuild_schedule(config)
+        print(f"[INFO] Ausnahme {exception['date']} {exception['start']} - {exception['end']} "
+              f"{'gesperrt' if exception['locked'] else 'offen'} hinzugefügt")
 
 def set_lock_start_time(hour, minute):
     """Setzt den Beginn des Sperr-Zeitfensters"""
     global lock_start
-    try:
-        lock_start = time(hour, minute)
-        print(f"[INFO] Sperrzeitfenster-Beginn gesetzt auf {hour:02d}:{minute:02d} Uhr")
-    except ValueError as e:
-        print(f"[ERROR] Ungültige Zeit: {e}")
+    with admin_lock:
+        try:
+            lock_start = time(hour, minute)
+            rebuild_schedule()
+            print(f"[INFO] Sperrzeitfenster-Beginn gesetzt auf {hour:02d}:{minute:02d} Uhr")
+        except ValueError as e:
+            print(f"[ERROR] Ungültige Zeit: {e}")
 
 def set_lock_end_time(hour, minute):
     """Setzt das Ende des Sperr-Zeitfensters"""
     global lock_end
-    try:
-        lock_end = time(hour, minute)
-        print(f"[INFO] Sperrzeitfenster-Ende gesetzt auf {hour:02d}:{minute:02d} Uhr")
-    except ValueError as e:
-        print(f"[ERROR] Ungültige Zeit: {e}")
+    with admin_lock:
+        try:
+            lock_end = time(hour, minute)
+            rebuild_schedule()
+            print(f"[INFO] Sperrzeitfenster-Ende gesetzt auf {hour:02d}:{minute:02d} Uhr")
+        except ValueError as e:
+            print(f"[ERROR] Ungültige Zeit: {e}")
+
+def clear_lock_window():
+    """Entfernt das tägliche Sperrzeitfenster"""
+    global lock_start, lock_end
+    with admin_lock:
+        lock_start = None
+        lock_end = None
+        rebuild_schedule()
+    print("[INFO] Sperrzeitfenster entfernt")
+
+def clear_schedule():
+    """Entfernt alle Sperrzeiten (Fenster, Feiertage, Ausnahmen)"""
+    global lock_start, lock_end
+    with admin_lock:
+        lock_start = None
+        lock_end = None
+        rebuild_schedule({})
+    print("[INFO] Alle Sperrzeiten entfernt")
+
+def apply_batch(batch):
+    """Führt einen geprüften Batch der Admin-Schnittstelle als eine Änderung aus
+
+    Alle Listenänderungen gehen mit einem apply() in den Speicher (ein neuer
+    Stand statt tausender einzelner), alle Sperrzeiten in einen neuen Plan.
+    Der Plan wird vor der Liste kompiliert - scheitert er, bleibt auch die
+    Liste unverändert. Läuft im Thread der Verbindung, wie Befehle aus dem
+    Eingabe-Thread.
+    """
+    global lock_start, lock_end, lock_schedule
+    with admin_lock:
+        added = removed = 0
+        schedule = None
+        if batch.schedule:
+            daily = tuple(t.hour * 60 + t.minute if t else None for t in (lock_start, lock_end))
+            config, daily = batch.apply_schedule(lock_schedule.to_config(), daily)
+            start, end = (time(m // 60, m % 60) if m is not None else None for m in daily)
+            schedule = build_schedule(config, start, end)
+        if batch.uids:
+            added, removed = userID.apply(batch.adds, batch.removes)
+        if schedule is not None:
+            lock_start, lock_end, lock_schedule = start, end, schedule
+            save_lock_window()
+        if added or removed or batch.schedule:
+            print(f"[INFO] Admin-Batch: {added} hinzugefügt, {removed} entfernt, "
+                  f"{len(batch.schedule)} Sperrzeiten-Änderung(en), Version {userID.version}")
+        if batch.sync:
+            send_update_local_list()
+    return {"ok": True, "added": added, "removed": removed, "schedule": len(batch.schedule),
+            "synced": batch.sync, "version": userID.version, "count": len(userID)}
+
+def run_in_loop(fn):
+    """Führt fn im Event-Loop aus und wartet auf das Ergebnis (für den Eingabe-Thread)"""
+    if server_loop is None or not server_loop.is_running():
+        return fn()
+
+    async def call():
+        return fn()
+
+    return asyncio.run_coroutine_threadsafe(call(), server_loop).result(5)
 
 def show_status():
     """Zeigt aktuellen Serverstatus an"""
     print("\n=== Server Status ===")
-    print(f"Zutrittsliste: {userID}")
-    if lock_start and lock_end:
-        print(f"Sperrzeitfenster: {lock_start.strftime('%H:%M')} - {lock_end.strftime('%H:%M')}")
-        print(f"Aktuell gesperrt: {'JA' if is_locked() else 'NEIN'}")
+    if len(userID) <= 20:
+        print(f"Zutrittsliste: {list(userID)}")
+    else:
+        print(f"Zutrittsliste: {len(userID)} Einträge")
+    print(f"Listenversion: {userID.version} (Hash {userID.hash:016X})")
+    if list_watcher:
+        result = list_watcher.last_result
+        if result and result.finished:
+            loaded = datetime.fromtimestamp(result.finished).strftime('%H:%M:%S')
+            state = f"{result.count} Einträge" if result.ok else f"abgelehnt ({result.error_count} Fehler)"
+            print(f"Listendatei: {list_watcher.path} (zuletzt {loaded}, {state})")
+        else:
+            print(f"Listendatei: {list_watcher.path} (noch nicht geladen)")
+    schedule = lock_schedule
+    lines = schedule.describe()
+    if lines:
+        print("Sperrzeitfenster:")
+        for line in lines:
+            print(f"  {line}")
+        print(f"Aktuell gesperrt: {'JA' if schedule.is_locked() else 'NEIN'}")
+        transition = schedule.next_transition()
+        if transition != float("inf"):
+            moment = datetime.fromtimestamp(transition)
+            print(f"Nächster Wechsel: {DAYS[moment.weekday()]} {moment.strftime('%d.%m. %H:%M')}")
     else:
         print("Sperrzeitfenster: Nicht konfiguriert")
-    print(f"Verbundene Clients: {len(connected_clients)}")
+    if worker_processes:
+        alive = sum(p.is_alive() for p in worker_processes)
+        print(f"Worker-Prozesse: {alive}/{len(worker_processes)} aktiv "
+              f"(Kennzahlen je Worker auf Port {METRICS_PORT} - {METRICS_PORT + len(worker_processes) - 1})")
+        print("=====================\n")
+        return
+    clients = run_in_loop(lambda: list(connected_clients.values()))
+    print(f"Verbundene Clients: {len(clients)}")
+    if clients:
+        depths = [c.outbox.depth for c in clients]
+        dropped = sum(c.outbox.dropped for c in clients)
+        print(f"Outbox: max {max(depths)} wartend, {dropped} verworfen")
+    counts = {name: c.value for name, c in decision_counts.items()}
+    print(f"Entscheidungen: {counts['allow']} ALLOW, {counts['deny'] + counts['locked']} DENY "
+          f"(davon {counts['locked']} Sperrzeit), {decision_rate.rate():.1f}/s")
+    if latency_total.count:
+        print(f"Latenz Empfang->Entscheidung: {latency_decision.summary()}")
+        print(f"Latenz Empfang->Antwort: {latency_total.summary()}")
+    if broadcast_duration.count:
+        print(f"Broadcast-Dauer: {broadcast_duration.summary()}")
+    print(f"Audit-Log: {audit_log.written} geschrieben, {audit_log.pending} wartend, "
+          f"{audit_log.dropped} verworfen (letzter Schreibvorgang {audit_log.last_flush * 1000:.1f} ms)")
+    if last_broadcast:
+        state = "fertig" if last_broadcast.done else "läuft"
+        print(f"Letzter Broadcast ({state}): {last_broadcast.summary()}")
     print("=====================\n")
 
+def collect_metrics():
+    """Alle Kennzahlen im OpenMetrics-Textformat (läuft im Event-Loop)"""
+    clients = list(connected_clients.values())
+    protos = {PROTO_TEXT: 0, PROTO_BINARY: 0}
+    for client in clients:
+        protos[client.proto] += 1
+    families = [
+        ("accesscontrol_decisions", "counter", "Zutrittsentscheidungen nach Ergebnis",
+         [({"result": "allow"}, decision_counts["allow"]),
+          ({"result": "deny", "reason": "not_listed"}, decision_counts["deny"]),
+          ({"result": "deny", "reason": "locked"}, decision_counts["locked"])]),
+        ("accesscontrol_decisions_per_second", "gauge", "Entscheidungen pro Sekunde (Mittel über 10 s)",
+         [({}, decision_rate.rate())]),
+        ("accesscontrol_decision_latency_seconds", "histogram", "Empfang bis Entscheidung",
+         [({}, latency_decision)]),
+        ("accesscontrol_send_latency_seconds", "histogram", "Entscheidung bis Übergabe an den Socket",
+         [({}, latency_send)]),
+        ("accesscontrol_request_latency_seconds", "histogram", "Empfang bis Übergabe an den Socket",
+         [({}, latency_total)]),
+        ("accesscontrol_clients", "gauge", "Verbundene Clients",
+         [({"protocol": proto}, n) for proto, n in protos.items()]),
+        ("accesscontrol_outbox_depth", "gauge", "Wartende Nachrichten in allen Outboxen",
+         [({}, sum(c.outbox.depth for c in clients))]),
+        ("accesscontrol_outbox_depth_max", "gauge", "Längste Outbox",
+         [({}, max((c.outbox.depth for c in clients), default=0))]),
+        ("accesscontrol_outbox_bytes", "gauge", "Wartende Bytes in allen Outboxen",
+         [({}, sum(c.outbox.queued_bytes for c in clients))]),
+        ("accesscontrol_outbox_dropped", "gauge", "Verworfene Nachrichten der verbundenen Clients",
+         [({}, sum(c.outbox.dropped for c in clients))]),
+        ("accesscontrol_audit_pending", "gauge", "Noch nicht geschriebene Audit-Einträge",
+         [({}, audit_log.pending)]),
+        ("accesscontrol_audit_written", "counter", "Geschriebene Audit-Einträge",
+         [({}, audit_log.written)]),
+        ("accesscontrol_audit_dropped", "counter", "Verworfene Audit-Einträge",
+         [({}, audit_log.dropped)]),
+        ("accesscontrol_list_entries", "gauge", "Einträge in der Zutrittsliste",
+         [({}, len(userID))]),
+        ("accesscontrol_list_version", "gauge", "Version der Zutrittsliste",
+         [({}, userID.version)]),
+        ("accesscontrol_broadcast_duration_seconds", "histogram", "Dauer eines Broadcasts bis zum letzten Client",
+         [({}, broadcast_duration)]),
+        ("accesscontrol_broadcast_delivery_seconds", "histogram", "Zustelldauer eines Broadcasts je Client",
+         [({}, broadcast_delivery)]),
+        ("accesscontrol_broadcast_failures", "counter", "Nicht zugestellte Broadcast-Nachrichten",
+         [({}, broadcast_failures)]),
+    ]
+    if METRICS_PER_CLIENT:
+        families.append(
+            ("accesscontrol_client_request_latency_seconds", "histogram",
+             "Empfang bis Übergabe an den Socket je Verbindung",
+             [({"peer": c.peer, "protocol": c.proto}, c.latency) for c in clients]))
+    return render_metrics(families)
+
 def show_help():
     """Zeigt verfügbare Befehle an"""
     print("\n=== Verfügbare Befehle ===")
     print("update_local_list          - Synchronisiert die lokale Liste auf dem ESP32 EEPROM")
     print("set_lock_start(x, y)       - Setzt Beginn des Sperr-Zeitfensters (z.B. set_lock_start(8, 45))")
     print("set_lock_end(x, y)         - Setzt Ende des Sperr-Zeitfensters (z.B. set_lock_end(17, 15))")
+    print("add_user(ID)               - Fügt Personalnummer hinzu (z.B. add_user(F39A370E))")
+    print("remove_user(ID)            - Entfernt Personalnummer (z.B. remove_user(F39A370E))")
+    print("add_lock_window(T, a, b)   - Sperrfenster für Wochentage (z.B. add_lock_window(Mo-Fr, 22:00, 05:00))")
+    print("add_holiday(datum)         - Sperrt einen Tag ganztägig (z.B. add_holiday(2026-12-24))")
+    print("remove_holiday(datum)      - Entfernt einen Feiertag")
+    print("add_exception(d, a, b, z)  - Ausnahme an einem Tag (z.B. add_exception(2026-12-24, 08:00, 12:00, offen))")
+    print("clear_schedule             - Entfernt alle Sperrzeiten (Fenster, Feiertage, Ausnahmen)")
+    print("reload_list                - Lädt die Listendatei (LIST_FILE) sofort neu")
+    print("reload_list(pfad)          - Ersetzt die Zutrittsliste durch den Inhalt einer Datei")
+    print("import_list(pfad[, modus]) - Importiert CSV/JSONL/TXT, Modus replace|add|remove (z.B. import_list(hr.csv, add))")
+    print("export_list(pfad)          - Exportiert die Zutrittsliste (z.B. export_list(liste.csv))")
     print("status                     - Zeigt aktuellen Serverstatus")
     print("clear_lock                 - Entfernt das Sperrzeitfenster")
     print("help                       - Zeigt diese Hilfe")
     print("exit                       - Beendet den Server")
     print("==========================\n")
 
-def shutdown_server():
-    """Fährt den Server sauber herunter"""
-    global shutdown_flag, server_socket_ref
-    print("[INFO] Server wird beendet...")
-    shutdown_flag = True
-    
-    # Alle Client-Verbindungen schließen
-    for client in connected_clients[:]:
+def _close_all():
+    """Schließt Server und alle Client-Verbindungen (läuft im Event-Loop)"""
+    if server_ref:
+        server_ref.close()
+    for writer in list(connected_clients):
         try:
-            client.close()
+            writer.close()
         except:
             pass
     connected_clients.clear()
+
+def shutdown_server():
+    """Fährt den Server sauber herunter"""
+    global shutdown_flag
+    print("[INFO] Server wird beendet...")
+    shutdown_flag = True
+
+    for process in worker_processes:
+        process.terminate()
+    for process in worker_processes:
+        process.join(5)
+
+    if list_watcher:
+        list_watcher.close()
+
+    # Noch nicht geschriebene Zutrittsversuche nicht verlieren
+    if audit_log:
+        audit_log.close()
     
-    # Server-Socket schließen um accept() zu unterbrechen
-    if server_socket_ref:
+    # Alle Verbindungen im Event-Loop schließen
+    if server_loop and server_loop.is_running():
         try:
-            server_socket_ref.close()
-        except:
+            server_loop.call_soon_threadsafe(_close_all)
+        except RuntimeError:
             pass
     
     print("[INFO] Server beendet.")
+    sys.stdout.flush()  # os._exit leert die Puffer nicht
     os._exit(0)
 
 def command_input_handler():
@@ -215,14 +811,56 @@ def command_input_handler():
                 else:
                     print("[ERROR] Ungültiges Format. Verwende: set_lock_end(x, y)")
             
+            elif cmd.startswith("add_user(") and cmd.endswith(")"):
+                add_user(cmd[9:-1].strip())  # Entferne "add_user(" und ")"
+            
+            elif cmd.startswith("remove_user(") and cmd.endswith(")"):
+                remove_user(cmd[12:-1].strip())  # Entferne "remove_user(" und ")"
+            
             elif cmd == "status":
                 show_status()
             
+            elif cmd == "reload_list":
+                reload_list()
+            
+            elif cmd.startswith("reload_list(") and cmd.endswith(")"):
+                reload_list(cmd[12:-1].strip())  # Entferne "reload_list(" und ")"
+            
+            elif cmd.startswith("import_list(") and cmd.endswith(")"):
+                parts = cmd[12:-1].split(",")  # Entferne "import_list(" und ")"
+                if 1 <= len(parts) <= 2 and parts[0].strip():
+                    import_list(*(part.strip() for part in parts))
+                else:
+                    print("[ERROR] Ungültiges Format. Verwende: import_list(pfad) oder import_list(pfad, add)")
+            
+            elif cmd.startswith("export_list(") and cmd.endswith(")"):
+                export_list(cmd[12:-1].strip())  # Entferne "export_list(" und ")"
+            
+            elif cmd.startswith("add_lock_window(") and cmd.endswith(")"):
+                parts = cmd[16:-1].split(",")  # Entferne "add_lock_window(" und ")"
+                if len(parts) == 3:
+                    add_lock_window(*parts)
+                else:
+                    print("[ERROR] Ungültiges Format. Verwende: add_lock_window(Mo-Fr, 22:00, 05:00)")
+            
+            elif cmd.startswith("add_holiday(") and cmd.endswith(")"):
+                add_holiday(cmd[12:-1])  # Entferne "add_holiday(" und ")"
+            
+            elif cmd.startswith("remove_holiday(") and cmd.endswith(")"):
+                remove_holiday(cmd[15:-1])  # Entferne "remove_holiday(" und ")"
+            
+            elif cmd.startswith("add_exception(") and cmd.endswith(")"):
+                parts = cmd[14:-1].split(",")  # Entferne "add_exception(" und ")"
+                if len(parts) == 4:
+                    add_exception(*parts)
+                else:
+                    print("[ERROR] Ungültiges Format. Verwende: add_exception(2026-12-24, 08:00, 12:00, offen)")
+            
             elif cmd == "clear_lock":
-                global lock_start, lock_end
-                lock_start = None
-                lock_end = None
-                print("[INFO] Sperrzeitfenster entfernt")
+                clear_lock_window()
+            
+            elif cmd == "clear_schedule":
+                clear_schedule()
             
             elif cmd == "help":
                 show_help()
@@ -241,10 +879,102 @@ def command_input_handler():
         except Exception as e:
             print(f"[ERROR] Fehler: {e}")
 
+def raise_file_limit():
+    """Hebt das Limit offener Dateien an, damit tausende Clients Platz haben"""
+    if resource is None:
+        return
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or hard > soft:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ValueError, OSError) as e:
+        print(f"[WARN] Datei-Limit konnte nicht angehoben werden: {e}")
+
 # TCP-Server Hauptfunktion
 
+async def run_server():
+    """Startet den TCP-Server im Event-Loop"""
+    global server_loop, server_ref
+    server_loop = asyncio.get_running_loop()
+
+    server_ref = await asyncio.start_server(
+        handle_client, HOST, PORT,
+        reuse_address=True, reuse_port=WORKERS > 1, backlog=LISTEN_BACKLOG)
+
+    name = "TCP-Server" if worker_index is None else f"Worker {worker_index} (PID {os.getpid()})"
+    print(f"{name} läuft auf {HOST}:{PORT}")
+    if METRICS_PORT is not None:
+        metrics_port = METRICS_PORT + (worker_index or 0)
+        await start_metrics_server(METRICS_HOST, metrics_port, collect_metrics)
+        print(f"Kennzahlen: http://{METRICS_HOST}:{metrics_port}/metrics")
+    if worker_index is None:
+        print("Gib 'help' ein für verfügbare Befehle.\n")
+    else:
+        server_loop.create_task(watch_admin())
+
+    # Ein Thread bedient alle Verbindungen - keine Polling-Timeouts
+    async with server_ref:
+        try:
+            await server_ref.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+def sync_shared_state():
+    """Übernimmt Liste und Sperrzeiten aus dem Admin-Prozess (nur in Workern)"""
+    global _settings_seen
+    userID.refresh()
+    generation = userID.generation(GEN_SETTINGS)
+    if generation != _settings_seen:
+        _settings_seen = generation
+        load_lock_window()
+
+async def watch_admin():
+    """Worker: schaut regelmäßig nach Änderungen und Broadcast-Anforderungen"""
+    broadcast_seen = userID.generation(GEN_BROADCAST)
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        sync_shared_state()
+        generation = userID.generation(GEN_BROADCAST)
+        if generation != broadcast_seen:
+            broadcast_seen = generation
+            if connected_clients:
+                _broadcast()
+
+def _stop_worker(signum, frame):
+    raise KeyboardInterrupt
+
+def worker_main(index):
+    """Einstieg eines Worker-Prozesses: nimmt Verbindungen an und entscheidet"""
+    global userID, audit_log, worker_index
+    worker_index = index
+    signal.signal(signal.SIGTERM, _stop_worker)
+    raise_file_limit()
+
+    # Nur lesen - geschrieben wird ausschließlich im Admin-Prozess
+    userID = AccessReader(DATA_DIR)
+    sync_shared_state()
+    audit_log = AuditLog(os.path.join(AUDIT_DIR, f"worker{index}"), max_bytes=AUDIT_MAX_BYTES,
+                         backups=AUDIT_BACKUPS, echo=AUDIT_ECHO)
+    try:
+        asyncio.run(run_server())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        audit_log.close()
+
+def start_workers():
+    """Startet WORKERS Prozesse, die sich den Port teilen"""
+    context = multiprocessing.get_context("spawn")
+    for index in range(WORKERS):
+        process = context.Process(target=worker_main, args=(index,),
+                                  name=f"worker{index}", daemon=True)
+        process.start()
+        worker_processes.append(process)
+    print(f"[INFO] {WORKERS} Worker-Prozesse gestartet (SO_REUSEPORT auf Port {PORT})")
+    print("Gib 'help' ein für verfügbare Befehle.\n")
+
 def main():
-    global server_socket_ref
+    global userID, audit_log, list_watcher
     
     print("=" * 50)
     print("  RFID-Zutrittskontrolle Server")
@@ -252,37 +982,47 @@ def main():
     print("=" * 50)
     print("\nStarte TCP-Server...")
 
+    raise_file_limit()
+
+    # Zutrittsliste öffnen - nur mmap + Journal, kein Einlesen der ganzen Liste
+    userID = AccessStore(DATA_DIR, DEFAULT_USER_IDS)
+    load_lock_window()
+    print(f"Zutrittsliste geladen: {len(userID)} Einträge")
+    if LIST_FILE:
+        # Nur der Admin-Prozess beobachtet die Datei, Worker sehen die neue Liste über den Speicher
+        list_watcher = ListWatcher(LIST_FILE, userID, list_reloaded, LIST_FILE_INTERVAL)
+        list_watcher.start()
+        print(f"Beobachte Listendatei: {list_watcher.path}")
+    if ADMIN_API:
+        _, address = start_admin_server(DATA_DIR, apply_batch)
+        print(f"Admin-Schnittstelle: {address}")
+
+    if WORKERS > 1:
+        # Admin-Prozess: Befehle annehmen, Verbindungen bedienen die Worker
+        start_workers()
+        cmd_thread = threading.Thread(target=command_input_handler, daemon=True)
+        cmd_thread.start()
+        try:
+            for process in worker_processes:
+                process.join()
+            # Bei 'exit' beendet shutdown_server() die Worker selbst - kein Fehler
+            if not shutdown_flag:
+                print("[ERROR] Alle Worker-Prozesse beendet")
+        except KeyboardInterrupt:
+            shutdown_server()
+        return
+
+    audit_log = AuditLog(AUDIT_DIR, max_bytes=AUDIT_MAX_BYTES,
+                         backups=AUDIT_BACKUPS, echo=AUDIT_ECHO)
+
     # Starte Befehlseingabe-Thread
     cmd_thread = threading.Thread(target=command_input_handler, daemon=True)
     cmd_thread.start()
 
-    # Server-Socket erstellen
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
-        server_socket_ref = server_socket  # Referenz für sauberes Beenden
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server_socket.bind((HOST, PORT))
-        server_socket.listen(5)  # Mehrere Clients möglich
-
-        print(f"TCP-Server läuft auf {HOST}:{PORT}")
-        print("Gib 'help' ein für verfügbare Befehle.\n")
-        
-        # Endlosschleife für Verbindungen
-        while not shutdown_flag:
-            try:
-                server_socket.settimeout(1.0)  # Timeout für Shutdown-Check
-                try:
-                    conn, addr = server_socket.accept()
-                except socket.timeout:
-                    continue
-                # Starte neuen Thread für jeden Client
-                client_thread = threading.Thread(target=handle_client, args=(conn, addr), daemon=True)
-                client_thread.start()
-            except OSError:
-                if shutdown_flag:
-                    break
-            except KeyboardInterrupt:
-                shutdown_server()
-                break
+    try:
+        asyncio.run(run_server())
+    except KeyboardInterrupt:
+        shutdown_server()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()